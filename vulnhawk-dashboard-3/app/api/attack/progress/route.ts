@@ -1,8 +1,15 @@
 import { NextResponse } from "next/server"
 import { prisma } from "@/lib/db"
+import { getLatestAttackProgress } from "@/lib/services/attack"
 
 export async function GET() {
   try {
+    // Scans started by this process report real per-module progress
+    const live = getLatestAttackProgress()
+    if (live) {
+      return NextResponse.json(live)
+    }
+
     // Get the most recent running attack
     const report = await prisma.report.findFirst({
       where: {
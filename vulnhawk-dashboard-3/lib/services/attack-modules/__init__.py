@@ -1,9 +1,6 @@
-from .attack_runner import AttackRunner
-from .recon import ReconModule
-from .auth import AuthModule
-from .client import ClientModule
-from .file import FileModule
-from .post import PostModule
+import importlib
+
+from .registry import registry
 
 __all__ = [
     'AttackRunner',
@@ -12,4 +9,17 @@ __all__ = [
     'ClientModule',
     'FileModule',
     'PostModule'
-] 
\ No newline at end of file
+]
+
+# Attack modules are imported on first attribute access so importing the
+# package does not pull in every module's dependencies (nmap, dnspython)
+_lazy = {spec['class']: spec['module'] for spec in registry.describe().values()}
+_lazy['AttackRunner'] = 'attack_runner'
+
+
+def __getattr__(name):
+    if name not in _lazy:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f'.{_lazy[name]}', __name__), name)
+    globals()[name] = value
+    return value
@@ -0,0 +1,180 @@
+import hashlib
+import json
+import logging
+import mmap
+import struct
+import threading
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger('archive')
+
+MAGIC = b'VHARC01\n'
+INDEX_MAGIC = b'VHIDX01\n'
+# Record length before each record; index offset before the trailing magic
+_LENGTH = struct.Struct('>I')
+_FOOTER = struct.Struct('>Q')
+COMPRESSION_LEVEL = 6
+
+
+def request_key(method: str, url: str, kwargs: Dict[str, Any]) -> str:
+    """Archive key of a request: method, URL, body and any byte cap of its own.
+
+    The timeout and the client's byte cap are left out, so a replay with
+    another ``--max-body`` still finds every answer; uploads count by file
+    name, type and a hash of the content.
+    """
+    body = {
+        name: kwargs[name]
+        for name in ('params', 'data', 'json', 'headers', 'allow_redirects', 'max_body')
+        if kwargs.get(name) is not None
+    }
+    if kwargs.get('files'):
+        body['files'] = {
+            field: [filename, content_type, hashlib.sha1(str(content).encode()).hexdigest()]
+            for field, (filename, content, content_type) in kwargs['files'].items()
+        }
+    canonical = json.dumps([method.upper(), url, body], sort_keys=True, default=str)
+    return hashlib.blake2b(canonical.encode(), digest_size=16).hexdigest()
+
+
+class ArchiveWriter:
+    """Appends every exchange of a scan to a compact archive file.
+
+    Each record is one zlib-compressed block: a JSON line describing the
+    answer (or the error the request failed with) followed by the body
+    bytes. Records are appended as answers arrive, from any thread, and
+    the index from request key to record offsets is written at the end by
+    ``close``. A request sent more than once (the brute-force logins) gets
+    one record per answer, in the order they came back. An archive whose
+    writer died before ``close`` is still readable: the reader rebuilds the
+    index from the records.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'wb')
+        self._file.write(MAGIC)
+        self._offset = len(MAGIC)
+        self._index: Dict[str, List[Tuple[int, int]]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, key: str, method: str, url: str, response=None, error: Optional[BaseException] = None):
+        """Archive the answer to a request, or the error it failed with"""
+        if response is not None:
+            meta = {
+                'key': key,
+                'method': method,
+                'url': response.url,
+                'status': response.status_code,
+                'headers': dict(response.headers),
+                'encoding': response.encoding,
+                'elapsed': response.elapsed,
+                'truncated': response.truncated
+            }
+            body = response.content
+        else:
+            meta = {'key': key, 'method': method, 'url': url, 'error': f'{type(error).__name__}: {error}'}
+            body = b''
+        block = zlib.compress(json.dumps(meta).encode() + b'\n' + body, COMPRESSION_LEVEL)
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.write(_LENGTH.pack(len(block)) + block)
+            self._index.setdefault(key, []).append((self._offset + _LENGTH.size, len(block)))
+            self._offset += _LENGTH.size + len(block)
+
+    def close(self):
+        """Write the index and close the file"""
+        with self._lock:
+            if self._file.closed:
+                return
+            index = zlib.compress(json.dumps(self._index).encode(), COMPRESSION_LEVEL)
+            self._file.write(index + _FOOTER.pack(self._offset) + INDEX_MAGIC)
+            self._file.close()
+            logger.info(f"Archived {sum(len(offsets) for offsets in self._index.values())} exchanges "
+                        f"to {self.path} ({self._offset + len(index) + _FOOTER.size + len(INDEX_MAGIC)} bytes)")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ArchiveReader:
+    """Answers requests from an archive written by ``ArchiveWriter``.
+
+    The file is mapped into memory and only the records asked for are
+    decompressed, so opening even a large archive is cheap. ``get`` hands
+    out the answers recorded for a key in order and keeps repeating the
+    last one once they run out. Keys that were never recorded count as
+    ``misses``.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._served: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.misses = 0
+        if self._map[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f'{path} is not an HTTP archive')
+        self._index = self._read_index()
+
+    def _read_index(self) -> Dict[str, List[Tuple[int, int]]]:
+        size = len(self._map)
+        footer = size - _FOOTER.size - len(INDEX_MAGIC)
+        if footer >= len(MAGIC) and self._map[size - len(INDEX_MAGIC):] == INDEX_MAGIC:
+            start, = _FOOTER.unpack_from(self._map, footer)
+            return json.loads(zlib.decompress(self._map[start:footer]))
+        logger.warning(f"{self.path} has no index, the recording did not finish; rebuilding it")
+        index: Dict[str, List[Tuple[int, int]]] = {}
+        offset = len(MAGIC)
+        while offset + _LENGTH.size <= size:
+            length, = _LENGTH.unpack_from(self._map, offset)
+            start = offset + _LENGTH.size
+            if start + length > size:
+                break
+            try:
+                meta = self._decode(start, length)[0]
+            except (zlib.error, ValueError):
+                break
+            index.setdefault(meta['key'], []).append((start, length))
+            offset = start + length
+        return index
+
+    def _decode(self, offset: int, length: int) -> Tuple[Dict[str, Any], bytes]:
+        meta, _, body = zlib.decompress(self._map[offset:offset + length]).partition(b'\n')
+        return json.loads(meta), body
+
+    def get(self, key: str) -> Tuple[Optional[Dict[str, Any]], bytes]:
+        """The next archived answer for a key as (description, body); (None, b'') if there is none"""
+        records = self._index.get(key)
+        with self._lock:
+            if not records:
+                self.misses += 1
+                return None, b''
+            served = self._served.get(key, 0)
+            self._served[key] = served + 1
+        return self._decode(*records[min(served, len(records) - 1)])
+
+    def __len__(self) -> int:
+        return sum(len(records) for records in self._index.values())
+
+    def close(self):
+        if self._file.closed:
+            return
+        self._map.close()
+        self._file.close()
+        if self.misses:
+            logger.warning(f"{self.misses} requests were not in {self.path}: probes the recorded scan stopped "
+                           f"before sending, or checks that changed since")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
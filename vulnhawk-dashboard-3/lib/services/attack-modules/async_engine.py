@@ -0,0 +1,295 @@
+import asyncio
+import functools
+import logging
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import aiohttp
+
+from archive import request_key
+from deadline import Deadline
+from http_client import HEAD_FALLBACK_STATUSES, READ_CHUNK_SIZE, HttpClient, HttpResponse
+from events import EventSink
+from journal import ScanJournal
+from metrics import ScanMetrics
+from probes import Check, CheckState, Probe, execute_func, fail_probe
+from scheduler import FairQueue, finding_reporter, module_finished, module_results, retraction_reporter
+
+logger = logging.getLogger('async_engine')
+
+DEFAULT_CONCURRENCY = 200
+
+
+class AsyncEngine:
+    """Runs every probe as a coroutine on a single event loop.
+
+    A global semaphore caps the number of probes in flight across all
+    modules (and all targets in batch mode), so a scan can keep hundreds of
+    requests outstanding without an OS thread per request. Worker coroutines
+    take probes from a ``FairQueue`` so modules running in parallel share
+    the budget evenly.
+    Pool sizing, default headers and timeouts are taken from the run's
+    ``HttpClient`` so both engines behave alike.
+    """
+
+    def __init__(self, client: HttpClient, concurrency: int = DEFAULT_CONCURRENCY):
+        self.client = client
+        self.concurrency = concurrency
+        self._session = None
+        self._slots = None
+
+    def run(self, modules: Dict[str, Dict[str, Check]], parallel: bool = False,
+            events: Optional[EventSink] = None, deadline: Optional[Deadline] = None,
+            module_timeout: Optional[float] = None, metrics: Optional[ScanMetrics] = None,
+            journal: Optional[ScanJournal] = None) -> Dict[str, Dict[str, Any]]:
+        """Run the checks of each module; returns findings per module and check.
+
+        With ``parallel`` every module is queued at once and modules share
+        the concurrency budget fairly; otherwise modules run one after another.
+        Progress is reported to ``events`` as it happens. Deadlines, metrics
+        and the journal work as in ``ThreadScheduler.run``.
+        """
+        async def main():
+            async with self:
+                return await self.run_modules(modules, parallel, events, deadline, module_timeout, metrics, journal)
+
+        return asyncio.run(main())
+
+    async def __aenter__(self):
+        self._slots = asyncio.Semaphore(self.concurrency)
+        connector = aiohttp.TCPConnector(
+            limit=self.concurrency,
+            limit_per_host=self.client.pool_maxsize,
+            ssl=None if self.client.session.verify else False
+        )
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            headers=dict(self.client.session.headers),
+            cookie_jar=aiohttp.DummyCookieJar()
+        )
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._session.close()
+        self._session = None
+
+    async def run_modules(self, modules: Dict[str, Dict[str, Check]], parallel: bool = False,
+                          events: Optional[EventSink] = None, deadline: Optional[Deadline] = None,
+                          module_timeout: Optional[float] = None, metrics: Optional[ScanMetrics] = None,
+                          journal: Optional[ScanJournal] = None) -> Dict[str, Dict[str, Any]]:
+        """Coroutine form of ``run`` for callers already inside the engine's loop.
+
+        Concurrent calls (one per target in batch mode) share the engine's
+        global concurrency cap.
+        """
+        events = events or EventSink()
+        if parallel:
+            return await self._run_batch(modules, events, deadline, module_timeout, metrics, journal)
+        results = {}
+        for module_name, checks in modules.items():
+            logger.info(f"Running module {module_name} on asyncio engine")
+            results.update(await self._run_batch({module_name: checks}, events, deadline, module_timeout,
+                                                 metrics, journal))
+        return results
+
+    async def _run_batch(self, modules: Dict[str, Dict[str, Check]], events: EventSink,
+                         deadline: Optional[Deadline], module_timeout: Optional[float],
+                         metrics: Optional[ScanMetrics] = None,
+                         journal: Optional[ScanJournal] = None) -> Dict[str, Dict[str, Any]]:
+        """Queue every probe of the given modules the journal has not seen and drain the queue with fair workers"""
+        queue = FairQueue()
+        states = {}
+        remaining = {}
+        module_events = {}
+
+        def spawn(module_name: str, state: CheckState, index, probe: Probe):
+            # Also queues follow-ups while the module runs; they count towards its remaining work
+            follow = functools.partial(spawn, module_name, state)
+            queue.put(module_name, (module_name, functools.partial(self._run_probe, state, index, probe, follow)))
+            remaining[module_name] += 1
+            if idle:
+                idle.pop().set()
+
+        idle = []
+        for module_name, checks in modules.items():
+            module_events[module_name] = events.bind(module=module_name)
+            module_events[module_name].emit('module_started', checks=list(checks))
+            module_deadline = Deadline.child(deadline, module_timeout)
+            states[module_name] = {}
+            remaining[module_name] = 0
+            for name, check in checks.items():
+                check_events = module_events[module_name].bind(check=name)
+                state = states[module_name][name] = CheckState(
+                    check, on_finding=finding_reporter(check_events), on_retract=retraction_reporter(check_events),
+                    deadline=module_deadline,
+                    metrics=metrics.for_check(module_name, name) if metrics else None,
+                    journal=journal.for_check(module_name, name) if journal else None
+                )
+                state.replay()
+                if check.func is not None:
+                    if None not in state.replayed:
+                        queue.put(module_name, (module_name, functools.partial(self._run_func, state)))
+                        remaining[module_name] += 1
+                    continue
+                for index, probe in enumerate(check.probes):
+                    if index not in state.replayed:
+                        spawn(module_name, state, index, probe)
+            if not remaining[module_name]:
+                module_finished(module_events[module_name], states[module_name])
+
+        async def worker():
+            while True:
+                if not queue:
+                    if not any(remaining.values()):
+                        break
+                    # Running probes may still queue follow-ups
+                    wake = asyncio.Event()
+                    idle.append(wake)
+                    await wake.wait()
+                    continue
+                module_name, task = queue.get()
+                try:
+                    async with self._slots:
+                        await task()
+                finally:
+                    remaining[module_name] -= 1
+                    if not remaining[module_name]:
+                        module_finished(module_events[module_name], states[module_name])
+                    if not any(remaining.values()):
+                        while idle:
+                            idle.pop().set()
+
+        # Every worker is started even when fewer probes are queued: the idle
+        # ones pick up follow-ups as they are queued
+        await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+        return {module_name: module_results(module_states) for module_name, module_states in states.items()}
+
+    async def _run_func(self, state: CheckState):
+        await asyncio.to_thread(execute_func, state)
+
+    async def _run_probe(self, state: CheckState, index, probe: Probe,
+                         spawn: Optional[Callable[[Any, Probe], None]] = None):
+        if not state.wanted(probe, index):
+            return
+        # Run the request as its own task so a hit elsewhere in the group or
+        # check can abort it without cancelling this worker
+        if state.expired():
+            state.skip(f"{probe.method} {probe.url}", probe.url)
+            return
+        fetch = asyncio.ensure_future(self.fetch(probe, state.deadline))
+        untrack = state.track(index, probe, fetch.cancel)
+        try:
+            await asyncio.wait({fetch})
+        except asyncio.CancelledError:
+            fetch.cancel()
+            raise
+        finally:
+            untrack()
+        if fetch.cancelled():
+            logger.debug(f"{probe} cancelled, outcome already decided")
+            return
+        if fetch.exception() is not None:
+            fail_probe(state, probe, fetch.exception())
+            return
+        state.observe(probe, fetch.result())
+        try:
+            findings = state.check.evaluate(probe, fetch.result())
+            follow_ups = state.follow_ups(index, probe, fetch.result())
+        except Exception as e:
+            logger.debug(f"{probe} failed: {e}")
+            return
+        state.complete(index, probe, findings, follow_ups)
+        for follow_index, follow_up in follow_ups:
+            spawn(follow_index, follow_up)
+
+    async def fetch(self, probe: Probe, deadline: Optional[Deadline] = None) -> HttpResponse:
+        """Send one probe, trying HEAD first for ``head_first`` probes as the thread engine does"""
+        kwargs = dict(probe.kwargs)
+        if kwargs.pop('head_first', False) and probe.method.upper() == 'GET':
+            response = await self._fetch('HEAD', probe.url, kwargs, deadline)
+            if response.status_code not in HEAD_FALLBACK_STATUSES:
+                return response
+        return await self._fetch(probe.method, probe.url, kwargs, deadline)
+
+    async def _fetch(self, method: str, url: str, kwargs: Dict[str, Any],
+                     deadline: Optional[Deadline]) -> HttpResponse:
+        """Send one request, sharing the run's response cache with the thread engine"""
+        cache = self.client.cache
+        if cache is not None and cache.cacheable(method, **kwargs):
+            key = cache.key(method, url, **kwargs)
+            sent = []
+
+            def send():
+                sent.append(True)
+                return self._send(method, url, kwargs, deadline)
+
+            response = await cache.afetch(key, send)
+            return response if sent else response.cache_hit()
+        return await self._send(method, url, kwargs, deadline)
+
+    async def _send(self, method: str, url: str, kwargs: Dict[str, Any],
+                    deadline: Optional[Deadline]) -> HttpResponse:
+        """Send one request over the shared aiohttp session"""
+        if self.client.replay is not None:
+            return self.client.replayed(method, url, kwargs)
+        recorder = self.client.recorder
+        key = request_key(method, url, kwargs) if recorder is not None else None
+        kwargs = dict(kwargs)
+        timeout = kwargs.pop('timeout', self.client.timeout)
+        max_body = kwargs.pop('max_body', self.client.max_body)
+        files = kwargs.pop('files', None)
+        if files:
+            form = aiohttp.FormData(kwargs.pop('data', None) or {})
+            for field, (filename, content, content_type) in files.items():
+                form.add_field(field, content, filename=filename, content_type=content_type)
+            kwargs['data'] = form
+
+        started = time.monotonic()
+        limiter = self.client.limiter
+        if limiter is not None:
+            await limiter.aacquire(url)
+        if deadline is not None:
+            timeout = deadline.budget(timeout)
+        wait, started = time.monotonic() - started, time.monotonic()
+        try:
+            async with self._session.request(method, url, timeout=aiohttp.ClientTimeout(total=timeout),
+                                             **kwargs) as response:
+                content, truncated = await read_capped(response, max_body)
+                headers = {
+                    name: ', '.join(response.headers.getall(name))
+                    for name in set(response.headers.keys())
+                }
+                result = HttpResponse(
+                    response.status,
+                    headers,
+                    content,
+                    str(response.url),
+                    encoding=response.charset,
+                    elapsed=time.monotonic() - started,
+                    truncated=truncated,
+                    method=method,
+                    wait=wait
+                )
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.client.record(method, url, None, time.monotonic() - started)
+            if key is not None:
+                recorder.add(key, method, url, error=e)
+            raise
+        self.client.record(method, url, result.status_code, result.elapsed, result.headers.get('Retry-After'))
+        if key is not None:
+            recorder.add(key, method, url, result)
+        return result
+
+
+async def read_capped(response: aiohttp.ClientResponse, max_body: Optional[int]) -> Tuple[bytes, bool]:
+    """Read a body up to ``max_body`` bytes; a cut-off body closes the connection"""
+    if max_body is None:
+        return await response.read(), False
+    chunks, size = [], 0
+    async for chunk in response.content.iter_chunked(min(READ_CHUNK_SIZE, max_body + 1)):
+        chunks.append(chunk)
+        size += len(chunk)
+        if size > max_body:
+            response.close()
+            return b''.join(chunks)[:max_body], True
+    return b''.join(chunks), False
@@ -1,55 +1,148 @@
 import sys
 import json
+import hashlib
 import os
+import argparse
+import time
 import traceback
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
+from urllib.parse import urlparse
+from archive import ArchiveReader, ArchiveWriter
+from http_client import HttpClient, DEFAULT_TIMEOUT, DEFAULT_POOL_SIZE, DEFAULT_MAX_BODY
+from rate_limiter import HostRateLimiter, DEFAULT_RATE, DEFAULT_MAX_RATE
+from response_cache import ResponseCache
+import log_setup
+from deadline import Deadline
+from journal import DEFAULT_JOURNAL_DIR, ScanJournal
+from history import DEFAULT_HISTORY_DIR, DEFAULT_TTL as DEFAULT_HISTORY_TTL, ScanHistory, module_context
+from soft404 import baselines
+from crawler import Crawler, SiteMap, DEFAULT_MAX_DEPTH as DEFAULT_CRAWL_DEPTH, DEFAULT_MAX_PAGES as DEFAULT_CRAWL_PAGES, \
+    DEFAULT_MAX_BYTES as DEFAULT_CRAWL_BYTES
+from metrics import ScanMetrics, serve_metrics
+from scheduler import ThreadScheduler, DEFAULT_WORKERS
+from batch import BatchRunner, DEFAULT_MAX_TARGETS, read_targets
+from events import EventSink, NdjsonWriter
+from registry import registry
+from port_scan import SCANNERS, DEFAULT_CACHE_TTL as DEFAULT_PORT_CACHE_TTL
+from profiling import PROFILE_MODES, DEFAULT_TOP as DEFAULT_PROFILE_TOP, profiled
 
-def setup_logging():
-    """Configure logging to both stderr and a file"""
+def setup_logging(levels: List[str] = ()):
+    """Configure queued logging to stderr; ``levels`` as for --log-level"""
     import logging
-    logging.basicConfig(
-        level=logging.DEBUG,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        stream=sys.stderr
-    )
+    log_setup.setup_logging(levels, stream=sys.stderr)
     return logging.getLogger('attack_runner')
 
 logger = setup_logging()
 
+ENGINES = ('thread', 'asyncio')
+DEFAULT_ASYNC_CONCURRENCY = 200
+
 class AttackRunner:
-    def __init__(self, target: str, modules: List[str]):
+    def __init__(self, target: str, modules: List[str], client: Optional[HttpClient] = None,
+                 engine: str = 'thread', concurrency: Optional[int] = None, parallel: bool = False,
+                 scheduler: Optional[ThreadScheduler] = None, events: Optional[EventSink] = None,
+                 module_options: Optional[Dict[str, Dict[str, Any]]] = None,
+                 deadline: Optional[float] = None, module_timeout: Optional[float] = None,
+                 metrics: Optional[ScanMetrics] = None, journal_dir: Optional[str] = None,
+                 resume: bool = False, crawl: Optional[Dict[str, Any]] = None, soft404: bool = True,
+                 history: Optional[Dict[str, Any]] = None):
+        if engine not in ENGINES:
+            raise ValueError(f'Unknown engine: {engine}')
         self.target = target
         self.modules = modules
+        self.engine = engine
+        self.parallel = parallel
+        self.events = events or EventSink()
+        self.module_options = module_options or {}
+        self._owns_client = client is None
+        self.client = client or HttpClient(cache=ResponseCache(), limiter=HostRateLimiter())
+        if self.client.cache is not None:
+            # Other runs sharing the cache keep this host's entries until this run ends too
+            self.client.cache.open_host(urlparse(target).netloc)
+        if engine == 'asyncio':
+            self.concurrency = concurrency or DEFAULT_ASYNC_CONCURRENCY
+        else:
+            self.concurrency = concurrency or DEFAULT_WORKERS
+        self._owns_scheduler = scheduler is None
+        self.scheduler = scheduler or ThreadScheduler(self.client, workers=self.concurrency)
         self.results: Dict[str, Any] = {}
+        self._loaded: Dict[str, Any] = {}
+        self._started = time.monotonic()
+        # The scan's clock starts now; each module gets module_timeout from its own start
+        self.deadline = Deadline(deadline) if deadline is not None else None
+        self.module_timeout = module_timeout
+        # Per-run metrics, forwarded to the daemon's or batch's totals when given
+        self.metrics = ScanMetrics(parent=metrics)
+        # Completed probes survive a crash here; a resumed run replays them
+        self.journal = ScanJournal.for_scan(journal_dir, target, modules, resume) if journal_dir else None
+        # Crawler options; modules flagged 'crawl' in the manifest then test the endpoints found
+        self.crawl = crawl
+        self.site = None
+        # Random-path answers of the host, so path checks can tell real pages from a catch-all
+        self.soft404 = soft404
+        self.baseline = None
+        # What earlier scans of the target saw ('directory' and 'ttl'); unchanged answers reuse their verdicts
+        self.history = ScanHistory.for_target(target=target, **history) if history is not None else None
+        self._options: Dict[str, Dict[str, Any]] = {}
         logger.info(f"Initialized AttackRunner with target: {target}, modules: {modules}")
         
+    def load_module(self, module_name: str):
+        """Import and instantiate a specific attack module"""
+        # Modules are imported on first use so unselected ones cost nothing
+        options = self.module_options.get(module_name, {})
+        if self.site is not None and registry.wants(module_name, 'crawl'):
+            options = {**options, 'endpoints': self.site.endpoints}
+        if self.baseline is not None and registry.wants(module_name, 'soft404'):
+            options = {**options, 'baseline': self.baseline.to_dict()}
+        self._options[module_name] = options
+        return registry.create(module_name, self.target, client=self.client, **options)
+
+    def discover(self):
+        """Gather the scan-wide inputs the selected modules use: soft-404 baseline and crawled endpoints"""
+        wanted = lambda feature: any(registry.wants(name, feature) for name in self.modules)
+        if self.soft404 and self.baseline is None and wanted('soft404'):
+            try:
+                self.baseline = baselines.get(self.client, self.target)
+            except Exception as e:
+                # Path checks then report every 200, as without a baseline
+                logger.error(f"Soft-404 baseline of {self.target} failed: {e}")
+        if self.crawl is None or self.site is not None or not wanted('crawl'):
+            return
+        try:
+            self.site = self._crawl()
+        except Exception as e:
+            # The modules fall back to their usual guesses
+            logger.error(f"Crawl of {self.target} failed: {e}")
+            return
+        self.events.emit('crawl_finished', **self.site.summary())
+
+    def _crawl(self) -> SiteMap:
+        """Crawl the target, or reuse the last crawl while the target page is unchanged within the history TTL"""
+        if self.history is None:
+            return Crawler(self.client, self.target, **self.crawl).crawl()
+        page = self.client.get(self.target)
+        fingerprint = [self.crawl, page.status_code, page.headers.get('ETag'), hashlib.sha1(page.content).hexdigest()]
+        stored = self.history.stage('crawl', fingerprint)
+        if stored is not None:
+            return SiteMap.from_dict(stored)
+        site = Crawler(self.client, self.target, **self.crawl).crawl()
+        self.history.store_stage('crawl', fingerprint, site.to_dict())
+        return site
+
     def run_module(self, module_name: str) -> Dict:
         """Run a specific attack module"""
         try:
             logger.info(f"Starting module: {module_name}")
             
-            # Import the module dynamically
             try:
-                if module_name == 'recon':
-                    from recon import ReconModule as Module
-                elif module_name == 'auth':
-                    from auth import AuthModule as Module
-                elif module_name == 'client':
-                    from client import ClientModule as Module
-                elif module_name == 'file':
-                    from file import FileModule as Module
-                elif module_name == 'post':
-                    from post import PostModule as Module
-                else:
-                    raise ImportError(f'Unknown module: {module_name}')
+                module = self.load_module(module_name)
             except ImportError as e:
                 logger.error(f"Failed to import module {module_name}: {e}")
                 return {'error': f'Module import failed: {str(e)}'}
                 
-            # Initialize and run the module
+            # Run the module
             try:
-                module = Module(self.target)
-                result = module.run()
+                result = module.run(scheduler=self.scheduler)
                 logger.info(f"Module {module_name} completed successfully")
                 return result
             except Exception as e:
@@ -61,15 +154,79 @@ class AttackRunner:
             logger.error(f"Unexpected error in run_module: {e}")
             logger.error(traceback.format_exc())
             return {'error': str(e)}
+
+    def prepare(self) -> Dict[str, Dict[str, Any]]:
+        """Load the selected modules and return their checks keyed by module"""
+        self._loaded = {}
+        for module_name in self.modules:
+            try:
+                self._loaded[module_name] = self.load_module(module_name)
+            except ImportError as e:
+                logger.error(f"Failed to import module {module_name}: {e}")
+                self.results[module_name] = {'error': f'Module import failed: {str(e)}'}
+            except Exception as e:
+                logger.error(f"Error initializing module {module_name}: {e}")
+                self.results[module_name] = {'error': str(e)}
+            if module_name in self.results:
+                self.events.emit('module_finished', module=module_name, error=self.results[module_name]['error'])
+        checks = {name: module.checks() for name, module in self._loaded.items()}
+        if self.history is not None:
+            for name, module_checks in checks.items():
+                context = module_context(self._loaded[name], self._options.get(name, {}))
+                for check_name, check in module_checks.items():
+                    module_checks[check_name] = self.history.wrap(name, check_name, check, context)
+        return checks
+
+    def collect(self, findings: Dict[str, Dict[str, List]]) -> Dict:
+        """Merge engine findings into each module's result layout"""
+        for module_name, module in self._loaded.items():
+            module.results.update(findings[module_name])
+            self.results[module_name] = module.results
+        # Keep the results in the order the modules were requested
+        results = {name: self.results[name] for name in self.modules}
+        results['_metrics'] = self.metrics.snapshot()
+        sent = sum(module['probes'] for module in results['_metrics']['modules'].values())
+        errors = sum(module['errors'] for module in results['_metrics']['modules'].values())
+        if sent and errors == sent:
+            # Nothing answered: empty findings would pass for a clean scan
+            results['error'] = f'All {sent} requests to {self.target} failed'
+        return results
+
+    def run_engine(self) -> Dict:
+        """Hand the checks of all selected modules to the engine in one go"""
+        self.discover()
+        checks = self.prepare()
+        if self.engine == 'asyncio':
+            from async_engine import AsyncEngine
+            engine = AsyncEngine(self.client, concurrency=self.concurrency)
+            findings = engine.run(checks, parallel=self.parallel, events=self.events,
+                                  deadline=self.deadline, module_timeout=self.module_timeout, metrics=self.metrics,
+                                  journal=self.journal)
+        else:
+            findings = self.scheduler.run(checks, parallel=self.parallel, events=self.events,
+                                          deadline=self.deadline, module_timeout=self.module_timeout,
+                                          metrics=self.metrics, journal=self.journal)
+        return self.collect(findings)
+
+    async def run_on(self, engine) -> Dict:
+        """Run on an already open AsyncEngine shared with other runs"""
+        import asyncio
+        try:
+            # Crawl and baseline block; keep the loop free for the other runs meanwhile
+            await asyncio.get_running_loop().run_in_executor(None, self.discover)
+            findings = await engine.run_modules(self.prepare(), parallel=self.parallel, events=self.events,
+                                                deadline=self.deadline, module_timeout=self.module_timeout,
+                                                metrics=self.metrics, journal=self.journal)
+            self.results = self.collect(findings)
+            return self.results
+        finally:
+            self._finish()
             
     def run(self) -> Dict:
         """Run all selected attack modules"""
         try:
-            logger.info("Starting attack run")
-            for module in self.modules:
-                logger.info(f"Running module: {module}")
-                self.results[module] = self.run_module(module)
-                logger.info(f"Completed module: {module}")
+            logger.info(f"Starting attack run on {self.engine} engine (parallel={self.parallel})")
+            self.results = self.run_engine()
             
             logger.info("Attack run completed")
             return self.results
@@ -77,6 +234,265 @@ class AttackRunner:
             logger.error(f"Error in run: {e}")
             logger.error(traceback.format_exc())
             return {'error': str(e)}
+        finally:
+            self._finish()
+
+    def stats(self) -> Dict[str, Any]:
+        """Summary of the run for the final 'stats' event"""
+        findings = sum(
+            len(value)
+            for result in self.results.values() if isinstance(result, dict)
+            for value in result.values() if isinstance(value, list)
+        )
+        stats = {
+            'modules': len(self.modules),
+            'findings': findings,
+            'duration': round(time.monotonic() - self._started, 3)
+        }
+        skipped = sum(
+            len(probes)
+            for result in self.results.values() if isinstance(result, dict)
+            for probes in result.get('_skipped', {}).values()
+        )
+        if skipped:
+            stats['skipped'] = skipped
+        if self.site is not None:
+            stats['crawl'] = self.site.summary()
+        if self.journal is not None and self.journal.replayed:
+            stats['resumed'] = self.journal.replayed
+        if self.history is not None:
+            stats['history'] = self.history.stats()
+        if self.deadline is not None:
+            stats['deadline_exceeded'] = self.deadline.expired
+        if self.client.cache is not None:
+            stats['cache'] = self.client.cache.stats()
+        if self.client.limiter is not None:
+            stats['rate_limit'] = self.client.limiter.stats(urlparse(self.target).netloc)
+        return stats
+
+    def _finish(self):
+        self.events.emit('stats', **self.stats())
+        if self.journal is not None:
+            self.journal.close()
+        if self.history is not None:
+            self.history.save()
+        if self.client.cache is not None:
+            # Cached responses only live as long as some run on the host
+            logger.info(f"Response cache: {self.client.cache.stats()}")
+            self.client.cache.close_host(urlparse(self.target).netloc)
+        if self._owns_scheduler:
+            self.scheduler.close()
+        if self._owns_client:
+            self.client.close()
+
+def add_engine_options(parser: argparse.ArgumentParser):
+    """Options shared by every entry point that runs scans"""
+    parser.add_argument('--engine', choices=ENGINES, default='thread',
+                        help='thread: a shared worker pool; asyncio: every probe on one event loop')
+    parser.add_argument('--concurrency', type=int,
+                        help=f'global probe budget: worker threads (default {DEFAULT_WORKERS}) '
+                             f'or in-flight coroutines (default {DEFAULT_ASYNC_CONCURRENCY})')
+    parser.add_argument('--parallel', action='store_true',
+                        help='run the selected modules at the same time under the shared budget')
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT,
+                        help='default per-request timeout in seconds')
+    parser.add_argument('--pool-size', type=int, default=DEFAULT_POOL_SIZE,
+                        help='keep-alive connections kept per host')
+    parser.add_argument('--header', action='append', default=[],
+                        help="extra request header as 'Name: value' (repeatable)")
+    parser.add_argument('--no-cache', action='store_true',
+                        help='send every probe even if an identical one was already answered')
+    parser.add_argument('--deadline', type=float, metavar='SECONDS',
+                        help='stop each scan after this long; probes not sent by then are reported as skipped')
+    parser.add_argument('--module-timeout', type=float, metavar='SECONDS',
+                        help='time each module may take from its start, within the scan deadline')
+    parser.add_argument('--max-body', type=int, default=DEFAULT_MAX_BODY, metavar='BYTES',
+                        help='stop reading a response body after this many bytes (0 reads bodies in full)')
+    parser.add_argument('--journal', metavar='DIR',
+                        help='journal completed probes of each scan to DIR so a crashed scan can be resumed')
+    parser.add_argument('--resume', action='store_true',
+                        help=f'skip probes an earlier run of the same scan completed (journal in --journal '
+                             f'or {DEFAULT_JOURNAL_DIR})')
+    parser.add_argument('--history', metavar='DIR',
+                        help='keep what each scan saw in DIR; rescans send conditional requests and reuse the '
+                             'verdicts, crawl and port scan of unchanged targets')
+    parser.add_argument('--incremental', action='store_true',
+                        help=f'rescan incrementally against the history in --history or {DEFAULT_HISTORY_DIR}')
+    parser.add_argument('--history-ttl', type=float, default=DEFAULT_HISTORY_TTL, metavar='SECONDS',
+                        help='how long stored verdicts and stage results stay usable; with a history this is '
+                             'also the default --port-cache-ttl')
+    parser.add_argument('--rate', type=float, default=DEFAULT_RATE,
+                        help='starting request rate per host (req/s); adapts to 429s, Retry-After and latency')
+    parser.add_argument('--max-rate', type=float, default=DEFAULT_MAX_RATE,
+                        help='ceiling the per-host request rate may ramp up to (req/s)')
+    parser.add_argument('--no-rate-limit', action='store_true',
+                        help='send requests as fast as the concurrency settings allow')
+    archive = parser.add_mutually_exclusive_group()
+    archive.add_argument('--record', metavar='FILE',
+                         help='write every HTTP exchange to an archive FILE for --replay')
+    archive.add_argument('--replay', metavar='FILE',
+                         help='answer every HTTP request from an archive written with --record; nothing is sent '
+                              "(recon's port and DNS scans are not HTTP and still run)")
+
+def add_module_options(parser: argparse.ArgumentParser):
+    """Options passed through to individual attack modules"""
+    parser.add_argument('--wordlist', metavar='FILE',
+                        help='recon: subdomain wordlist, one label per line (streamed, 100k+ is fine)')
+    parser.add_argument('--dns-server', metavar='HOST[:PORT]',
+                        help='recon: resolve subdomains through this name server instead of the system one')
+    parser.add_argument('--ports', metavar='SPEC',
+                        help="recon: ports to scan: 'top100' (default), 'all' or '22,80,8000-8100'")
+    parser.add_argument('--port-scanner', choices=SCANNERS,
+                        help='recon: nmap in sharded processes, or an asyncio TCP connect scan '
+                             '(auto: nmap when installed)')
+    parser.add_argument('--port-cache-ttl', type=float, metavar='SECONDS',
+                        help=f'recon: reuse port scan results this recent (default {DEFAULT_PORT_CACHE_TTL}, 0 disables)')
+    parser.add_argument('--no-soft404', action='store_true',
+                        help='auth, file, post: report every path answering 200, even where any random '
+                             'path gets the same page')
+    parser.add_argument('--batch-params', type=int, metavar='N',
+                        help='client, file: inject each payload into up to N parameters per request, '
+                             'narrowing down batches that match')
+
+def add_crawl_options(parser: argparse.ArgumentParser):
+    """Options of the crawl that feeds discovered endpoints to the modules"""
+    parser.add_argument('--crawl', action='store_true',
+                        help='crawl the target first; client and file then test the parameters, forms '
+                             'and upload fields found instead of guessing')
+    parser.add_argument('--crawl-depth', type=int, default=DEFAULT_CRAWL_DEPTH, metavar='N',
+                        help='links followed away from the target URL')
+    parser.add_argument('--crawl-pages', type=int, default=DEFAULT_CRAWL_PAGES, metavar='N',
+                        help='pages fetched per target at most')
+    parser.add_argument('--crawl-bytes', type=int, default=DEFAULT_CRAWL_BYTES, metavar='BYTES',
+                        help='response bytes read per target at most')
+
+def crawl_options(args: argparse.Namespace) -> Optional[Dict[str, Any]]:
+    """Crawler keyword arguments, or None without --crawl"""
+    if not args.crawl:
+        return None
+    return {'max_depth': args.crawl_depth, 'max_pages': args.crawl_pages, 'max_bytes': args.crawl_bytes}
+
+def add_diagnostic_options(parser: argparse.ArgumentParser):
+    """Logging and profiling options of every entry point"""
+    parser.add_argument('--log-level', action='append', default=[], type=log_setup.log_level, metavar='SPEC',
+                        help="'INFO' for every logger, 'http_client=WARNING' for one (repeatable, "
+                             f"comma-separated; default ${log_setup.LEVEL_ENV} or DEBUG)")
+    parser.add_argument('--profile', metavar='FILE',
+                        help='profile the run into FILE and print the busiest functions to stderr')
+    parser.add_argument('--profile-mode', choices=PROFILE_MODES, default='sample',
+                        help='sample: low-overhead stack sampling of all threads (collapsed stacks); '
+                             'cprofile: exact call counts (pstats file), much slower')
+    parser.add_argument('--profile-top', type=int, default=DEFAULT_PROFILE_TOP, metavar='N',
+                        help='functions listed in the profile summary')
+
+def journal_dir(args: argparse.Namespace) -> Optional[str]:
+    """Where scans journal their probes, if anywhere"""
+    return args.journal or (DEFAULT_JOURNAL_DIR if args.resume else None)
+
+def history_options(args: argparse.Namespace) -> Optional[Dict[str, Any]]:
+    """Where and for how long scans keep their history, or None without one"""
+    # Entry points without the engine options (the distributed coordinator) keep none
+    directory = getattr(args, 'history', None) or (DEFAULT_HISTORY_DIR if getattr(args, 'incremental', False) else None)
+    if directory is None:
+        return None
+    return {'directory': directory, 'ttl': args.history_ttl}
+
+def module_options(args: argparse.Namespace) -> Dict[str, Dict[str, Any]]:
+    """Per-module keyword arguments from command line options"""
+    port_cache_ttl = args.port_cache_ttl
+    if port_cache_ttl is None and history_options(args) is not None:
+        # Rescans skip the port scan while the host's addresses stay the same
+        port_cache_ttl = args.history_ttl
+    recon = {
+        'wordlist': args.wordlist,
+        'dns_server': args.dns_server,
+        'ports': args.ports,
+        'port_scanner': args.port_scanner,
+        'port_cache_ttl': port_cache_ttl
+    }
+    injection = {'batch': args.batch_params} if args.batch_params else {}
+    return {
+        'recon': {name: value for name, value in recon.items() if value is not None},
+        'client': injection,
+        'file': injection
+    }
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog='attack_runner.py',
+        usage='python attack_runner.py [options] <target> <module1> [module2 ...]\n'
+              '       python attack_runner.py [options] --targets <file|-> <module1> [module2 ...]'
+    )
+    parser.add_argument('args', nargs='+', metavar='target/module')
+    parser.add_argument('--targets', metavar='FILE',
+                        help="batch mode: scan every target listed in FILE ('-' for stdin), "
+                             "writing one JSON line per target")
+    parser.add_argument('--max-targets', type=int, default=DEFAULT_MAX_TARGETS,
+                        help='batch mode: targets scanned at the same time')
+    parser.add_argument('--metrics-port', type=int, metavar='PORT',
+                        help='batch mode: serve Prometheus metrics on http://127.0.0.1:PORT/metrics')
+    parser.add_argument('--output', choices=('json', 'ndjson'), default='json',
+                        help='json: one document at exit; ndjson: one JSON line per event as it happens')
+    add_engine_options(parser)
+    add_module_options(parser)
+    add_crawl_options(parser)
+    add_diagnostic_options(parser)
+    args = parser.parse_args(argv)
+    if args.targets:
+        args.target, args.modules = None, args.args
+    elif len(args.args) < 2:
+        parser.error('a target and at least one module are required')
+    else:
+        args.target, args.modules = args.args[0], args.args[1:]
+    return args
+
+def build_client(args: argparse.Namespace) -> HttpClient:
+    """Create the shared HTTP client from command line options"""
+    headers = {}
+    for header in args.header:
+        name, _, value = header.partition(':')
+        headers[name.strip()] = value.strip()
+    return HttpClient(
+        timeout=args.timeout,
+        headers=headers,
+        pool_maxsize=args.pool_size,
+        cache=None if args.no_cache else ResponseCache(),
+        # A replay has nothing to pace
+        limiter=None if args.no_rate_limit or args.replay else HostRateLimiter(rate=args.rate, max_rate=args.max_rate),
+        max_body=args.max_body or None,
+        recorder=ArchiveWriter(args.record) if args.record else None,
+        replay=ArchiveReader(args.replay) if args.replay else None
+    )
+
+def run_batch(args: argparse.Namespace) -> int:
+    """Scan every target from --targets, streaming one JSON line per target"""
+    targets = read_targets(args.targets)
+    logger.info(f"Running batch of {len(targets)} targets with modules: {args.modules}")
+    metrics = ScanMetrics()
+    if args.metrics_port is not None:
+        serve_metrics(metrics, args.metrics_port)
+    with build_client(args) as client:
+        failed = BatchRunner(
+            targets,
+            args.modules,
+            client,
+            engine=args.engine,
+            concurrency=args.concurrency,
+            parallel=args.parallel,
+            max_targets=args.max_targets,
+            module_options=module_options(args),
+            events=NdjsonWriter() if args.output == 'ndjson' else None,
+            deadline=args.deadline,
+            module_timeout=args.module_timeout,
+            metrics=metrics,
+            journal_dir=journal_dir(args),
+            resume=args.resume,
+            crawl=crawl_options(args),
+            soft404=not args.no_soft404,
+            history=history_options(args)
+        ).run()
+    logger.info(f"Batch completed: {len(targets) - failed} succeeded, {failed} failed")
+    return 1 if failed else 0
 
 def main():
     try:
@@ -84,20 +500,44 @@ def main():
         
         if len(sys.argv) < 3:
             logger.error("Insufficient arguments")
-            print("Usage: python attack_runner.py <target> <module1> [module2 ...]")
+            print("Usage: python attack_runner.py [options] <target> <module1> [module2 ...]")
             sys.exit(1)
             
-        target = sys.argv[1]
-        modules = sys.argv[2:]
-        
-        logger.info(f"Running attack on {target} with modules: {modules}")
-        runner = AttackRunner(target, modules)
-        results = runner.run()
-        
-        # Output results as JSON
-        output = json.dumps(results)
-        logger.info("Successfully serialized results to JSON")
-        print(output)
+        args = parse_args(sys.argv[1:])
+        if args.log_level:
+            setup_logging(args.log_level)
+        with profiled(args.profile, args.profile_mode, args.profile_top):
+            if args.targets:
+                sys.exit(run_batch(args))
+            target = args.target
+            modules = args.modules
+
+            logger.info(f"Running attack on {target} with modules: {modules}")
+            runner = AttackRunner(
+                target,
+                modules,
+                client=build_client(args),
+                engine=args.engine,
+                concurrency=args.concurrency,
+                parallel=args.parallel,
+                events=NdjsonWriter() if args.output == 'ndjson' else None,
+                module_options=module_options(args),
+                deadline=args.deadline,
+                module_timeout=args.module_timeout,
+                journal_dir=journal_dir(args),
+                resume=args.resume,
+                crawl=crawl_options(args),
+                soft404=not args.no_soft404,
+                history=history_options(args)
+            )
+            results = runner.run()
+            runner.client.close()
+
+        if args.output == 'json':
+            # Output results as JSON
+            output = json.dumps(results)
+            logger.info("Successfully serialized results to JSON")
+            print(output)
         
         logger.info("Attack completed successfully")
         sys.exit(0)
@@ -1,154 +1,134 @@
-import requests
-from typing import Dict, List
-import concurrent.futures
+from typing import Any, Dict, List, Optional
+from http_client import HttpClient
+from probes import STATUS_ONLY, Check, Probe
+from scheduler import ThreadScheduler, run_checks
+from soft404 import Baseline, exists
 from urllib.parse import urljoin
 
 class AuthModule:
-    def __init__(self, target: str):
+    def __init__(self, target: str, client: HttpClient = None, baseline: Optional[Dict[str, Any]] = None):
         self.target = target
+        self.client = client or HttpClient()
+        # Soft-404 fingerprint of the host; path checks ignore 200s that match it
+        self.baseline = Baseline.from_dict(baseline) if baseline else None
         self.results = {
             "weak_auth": [],
             "session_issues": [],
             "brute_force": [],
             "auth_bypass": []
         }
-        
-    def check_weak_auth(self) -> List[Dict]:
+
+    def check_weak_auth(self) -> Check:
         """Check for weak authentication mechanisms"""
-        try:
-            issues = []
-            
-            # Check for default credentials
-            default_creds = [
-                ('admin', 'admin'),
-                ('admin', 'password'),
-                ('root', 'root'),
-                ('user', 'password')
-            ]
-            
-            for username, password in default_creds:
-                try:
-                    response = requests.post(
-                        urljoin(self.target, '/login'),
-                        data={'username': username, 'password': password},
-                        timeout=5
-                    )
-                    if response.status_code == 200:
-                        issues.append({
-                            'type': 'weak_auth',
-                            'description': 'Default credentials found',
-                            'details': f"Username: {username}, Password: {password}"
-                        })
-                except:
-                    continue
-                    
-            return issues
-        except Exception as e:
-            print(f"Weak auth check error: {str(e)}")
+        # Check for default credentials
+        default_creds = [
+            ('admin', 'admin'),
+            ('admin', 'password'),
+            ('root', 'root'),
+            ('user', 'password')
+        ]
+        probes = [
+            Probe(
+                'POST',
+                urljoin(self.target, '/login'),
+                label=(username, password),
+                data={'username': username, 'password': password}
+            )
+            for username, password in default_creds
+        ]
+
+        def evaluate(probe: Probe, response) -> List[Dict]:
+            if response.status_code == 200:
+                username, password = probe.label
+                return [{
+                    'type': 'weak_auth',
+                    'description': 'Default credentials found',
+                    'details': f"Username: {username}, Password: {password}"
+                }]
             return []
 
-    def check_session_management(self) -> List[Dict]:
+        return Check(probes, evaluate)
+
+    def check_session_management(self) -> Check:
         """Check for session management issues"""
-        try:
+        def evaluate(probe: Probe, response) -> List[Dict]:
             issues = []
-            
+
             # Check for session fixation
-            try:
-                response = requests.get(self.target)
-                if 'Set-Cookie' in response.headers:
-                    cookie = response.headers['Set-Cookie']
-                    if 'httponly' not in cookie.lower():
-                        issues.append({
-                            'type': 'session_issue',
-                            'description': 'Missing HttpOnly flag',
-                            'details': 'Session cookie is accessible via JavaScript'
-                        })
-                    if 'secure' not in cookie.lower():
-                        issues.append({
-                            'type': 'session_issue',
-                            'description': 'Missing Secure flag',
-                            'details': 'Session cookie can be sent over non-HTTPS'
-                        })
-            except:
-                pass
-                
+            if 'Set-Cookie' in response.headers:
+                cookie = response.headers['Set-Cookie']
+                if 'httponly' not in cookie.lower():
+                    issues.append({
+                        'type': 'session_issue',
+                        'description': 'Missing HttpOnly flag',
+                        'details': 'Session cookie is accessible via JavaScript'
+                    })
+                if 'secure' not in cookie.lower():
+                    issues.append({
+                        'type': 'session_issue',
+                        'description': 'Missing Secure flag',
+                        'details': 'Session cookie can be sent over non-HTTPS'
+                    })
             return issues
-        except Exception as e:
-            print(f"Session management check error: {str(e)}")
-            return []
 
-    def test_brute_force(self) -> List[Dict]:
+        return Check([Probe('GET', self.target)], evaluate)
+
+    def test_brute_force(self) -> Check:
         """Test for brute force vulnerabilities"""
-        try:
-            issues = []
-            
-            # Test for rate limiting
-            for _ in range(10):
-                try:
-                    response = requests.post(
-                        urljoin(self.target, '/login'),
-                        data={'username': 'test', 'password': 'wrong'},
-                        timeout=5
-                    )
-                    if response.status_code != 429:  # No rate limiting
-                        issues.append({
-                            'type': 'brute_force',
-                            'description': 'No rate limiting detected',
-                            'details': 'Multiple failed login attempts allowed'
-                        })
-                        break
-                except:
-                    continue
-                    
-            return issues
-        except Exception as e:
-            print(f"Brute force test error: {str(e)}")
+        # Test for rate limiting
+        probes = [
+            Probe(
+                'POST',
+                urljoin(self.target, '/login'),
+                data={'username': 'test', 'password': 'wrong'}
+            )
+            for _ in range(10)
+        ]
+
+        def evaluate(probe: Probe, response) -> List[Dict]:
+            if response.status_code != 429:  # No rate limiting
+                return [{
+                    'type': 'brute_force',
+                    'description': 'No rate limiting detected',
+                    'details': 'Multiple failed login attempts allowed'
+                }]
             return []
 
-    def check_auth_bypass(self) -> List[Dict]:
+        return Check(probes, evaluate, stop='check')
+
+    def check_auth_bypass(self) -> Check:
         """Check for authentication bypass techniques"""
-        try:
-            issues = []
-            
-            # Test for path traversal in auth endpoints
-            paths = [
-                '/admin',
-                '/dashboard',
-                '/user/profile',
-                '/api/user'
-            ]
-            
-            for path in paths:
-                try:
-                    response = requests.get(
-                        urljoin(self.target, path),
-                        timeout=5
-                    )
-                    if response.status_code == 200:
-                        issues.append({
-                            'type': 'auth_bypass',
-                            'description': 'Potential authentication bypass',
-                            'details': f"Accessible path: {path}"
-                        })
-                except:
-                    continue
-                    
-            return issues
-        except Exception as e:
-            print(f"Auth bypass check error: {str(e)}")
+        # Test for path traversal in auth endpoints
+        paths = [
+            '/admin',
+            '/dashboard',
+            '/user/profile',
+            '/api/user'
+        ]
+        probes = [Probe('GET', urljoin(self.target, path), label=path, **STATUS_ONLY) for path in paths]
+        found = exists(self.baseline)
+
+        def evaluate(probe: Probe, response) -> List[Dict]:
+            if found(probe, response):
+                return [{
+                    'type': 'auth_bypass',
+                    'description': 'Potential authentication bypass',
+                    'details': f"Accessible path: {probe.label}"
+                }]
             return []
 
-    def run(self) -> Dict:
+        return Check(probes, evaluate)
+
+    def checks(self) -> Dict[str, Check]:
+        """All authentication checks keyed by result field"""
+        return {
+            'weak_auth': self.check_weak_auth(),
+            'session_issues': self.check_session_management(),
+            'brute_force': self.test_brute_force(),
+            'auth_bypass': self.check_auth_bypass()
+        }
+
+    def run(self, scheduler: ThreadScheduler = None) -> Dict:
         """Run all authentication checks"""
-        with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
-            weak_auth_future = executor.submit(self.check_weak_auth)
-            session_future = executor.submit(self.check_session_management)
-            brute_force_future = executor.submit(self.test_brute_force)
-            bypass_future = executor.submit(self.check_auth_bypass)
-            
-            self.results['weak_auth'] = weak_auth_future.result()
-            self.results['session_issues'] = session_future.result()
-            self.results['brute_force'] = brute_force_future.result()
-            self.results['auth_bypass'] = bypass_future.result()
-            
-        return self.results 
\ No newline at end of file
+        self.results.update(run_checks(self.client, self.checks(), scheduler, workers=4))
+        return self.results
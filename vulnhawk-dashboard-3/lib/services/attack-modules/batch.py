@@ -0,0 +1,165 @@
+import asyncio
+import concurrent.futures
+import json
+import logging
+import sys
+import threading
+import traceback
+from typing import Any, Dict, Iterable, List, Optional, TextIO
+
+from events import EventSink
+from http_client import HttpClient
+from metrics import ScanMetrics
+from scheduler import ThreadScheduler, DEFAULT_WORKERS
+
+logger = logging.getLogger('batch')
+
+DEFAULT_MAX_TARGETS = 8
+
+
+def read_targets(source: str) -> List[str]:
+    """Read targets from a file, or from stdin when ``source`` is '-'.
+
+    One target per line; blank lines and '#' comments are skipped and
+    duplicates are dropped while keeping the original order.
+    """
+    if source == '-':
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(source) as f:
+            lines = f.read().splitlines()
+    targets = []
+    seen = set()
+    for line in lines:
+        target = line.strip()
+        if not target or target.startswith('#') or target in seen:
+            continue
+        seen.add(target)
+        targets.append(target)
+    return targets
+
+
+class BatchRunner:
+    """Scans many targets in one interpreter with shared pools and caches.
+
+    Every target gets its own ``AttackRunner``, but all of them share one
+    ``HttpClient`` (connection pools, response cache) and one engine, so
+    the per-host cap (``pool_size``) and the global budget
+    (``concurrency``) hold across the whole batch. Up to ``max_targets``
+    targets are in progress at once and each target's results are written
+    as one JSON line as soon as that target finishes. When an ``events``
+    sink is given, per-target events (tagged with ``target``) are streamed
+    instead and each target ends with a ``target_finished`` event.
+    Every target's metrics also add up in ``metrics``, when given. With
+    ``journal_dir`` each target journals its probes there, and ``resume``
+    skips what an earlier, interrupted batch already did. ``crawl`` options
+    crawl each target before its modules run; ``soft404`` and ``history``
+    as for ``AttackRunner``.
+    """
+
+    def __init__(self, targets: Iterable[str], modules: List[str], client: HttpClient,
+                 engine: str = 'thread', concurrency: Optional[int] = None, parallel: bool = False,
+                 max_targets: int = DEFAULT_MAX_TARGETS, out: TextIO = sys.stdout,
+                 events: Optional[EventSink] = None, module_options: Optional[Dict[str, Dict]] = None,
+                 deadline: Optional[float] = None, module_timeout: Optional[float] = None,
+                 metrics: Optional[ScanMetrics] = None, journal_dir: Optional[str] = None,
+                 resume: bool = False, crawl: Optional[Dict[str, Any]] = None, soft404: bool = True,
+                 history: Optional[Dict[str, Any]] = None):
+        self.targets = list(targets)
+        self.modules = modules
+        self.client = client
+        self.engine = engine
+        self.concurrency = concurrency
+        self.parallel = parallel
+        self.max_targets = max_targets
+        self.out = out
+        self.events = events
+        self.module_options = module_options
+        self.deadline = deadline
+        self.module_timeout = module_timeout
+        self.metrics = metrics
+        self.journal_dir = journal_dir
+        self.resume = resume
+        self.crawl = crawl
+        self.soft404 = soft404
+        self.history = history
+        self._out_lock = threading.Lock()
+
+    def emit(self, target: str, results: Dict):
+        if self.events is not None:
+            self.events.emit('target_finished', target=target, error=results.get('error'))
+            return
+        line = json.dumps({'target': target, 'results': results})
+        with self._out_lock:
+            self.out.write(line + '\n')
+            self.out.flush()
+
+    def _runner(self, target: str, **kwargs):
+        from attack_runner import AttackRunner
+        return AttackRunner(
+            target,
+            self.modules,
+            client=self.client,
+            engine=self.engine,
+            concurrency=self.concurrency,
+            parallel=self.parallel,
+            events=self.events.bind(target=target) if self.events is not None else None,
+            module_options=self.module_options,
+            deadline=self.deadline,
+            module_timeout=self.module_timeout,
+            metrics=self.metrics,
+            journal_dir=self.journal_dir,
+            resume=self.resume,
+            crawl=self.crawl,
+            soft404=self.soft404,
+            history=self.history,
+            **kwargs
+        )
+
+    def run(self) -> int:
+        """Scan every target; returns the number of targets that failed"""
+        logger.info(f"Starting batch of {len(self.targets)} targets on {self.engine} engine")
+        if self.engine == 'asyncio':
+            return asyncio.run(self._run_async())
+        return self._run_threads()
+
+    def _report(self, target: str, results: Dict) -> bool:
+        """Write a finished target's results; returns whether it succeeded"""
+        self.emit(target, results)
+        # A module that failed fails the target, as in a distributed scan
+        return 'error' not in results and not any(
+            isinstance(result, dict) and 'error' in result for result in results.values()
+        )
+
+    def _scan(self, target: str, scheduler: ThreadScheduler) -> bool:
+        try:
+            results = self._runner(target, scheduler=scheduler).run()
+        except Exception as e:
+            logger.error(f"Target {target} failed: {e}")
+            logger.error(traceback.format_exc())
+            results = {'error': str(e)}
+        return self._report(target, results)
+
+    def _run_threads(self) -> int:
+        with ThreadScheduler(self.client, workers=self.concurrency or DEFAULT_WORKERS) as scheduler:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_targets) as executor:
+                futures = [executor.submit(self._scan, target, scheduler) for target in self.targets]
+                return sum(not future.result() for future in futures)
+
+    async def _run_async(self) -> int:
+        from async_engine import AsyncEngine, DEFAULT_CONCURRENCY
+        slots = asyncio.Semaphore(self.max_targets)
+
+        async with AsyncEngine(self.client, concurrency=self.concurrency or DEFAULT_CONCURRENCY) as engine:
+            async def scan(target: str) -> bool:
+                async with slots:
+                    try:
+                        results = await self._runner(target).run_on(engine)
+                    except Exception as e:
+                        logger.error(f"Target {target} failed: {e}")
+                        logger.error(traceback.format_exc())
+                        results = {'error': str(e)}
+                    return self._report(target, results)
+
+            outcomes = await asyncio.gather(*(scan(target) for target in self.targets))
+        return sum(not ok for ok in outcomes)
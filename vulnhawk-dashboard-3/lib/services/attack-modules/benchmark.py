@@ -0,0 +1,221 @@
+"""Scanner throughput benchmarks against a simulated target.
+
+    python benchmark.py                                # print results
+    python benchmark.py --save benchmark_baseline.json
+    python benchmark.py --compare benchmark_baseline.json [--tolerance 0.25]
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+from sim_server import SimulatedTarget
+
+logger = logging.getLogger('benchmark')
+
+DEFAULT_MODULES = ('auth', 'client', 'file', 'post')
+DEFAULT_ENGINES = ('thread', 'asyncio')
+DEFAULT_REPEAT = 3
+DEFAULT_TOLERANCE = 0.25
+
+# Simulated target settings per scenario, see SimulatedTarget
+SCENARIOS: Dict[str, Dict[str, Any]] = {
+    'baseline': {},
+    'latency': {'latency': 0.05, 'jitter': 0.05},
+    'throttled': {'rate_limit': 50, 'burst': 20},
+    'large-bodies': {'body_size': 512 * 1024, 'large_body_size': 256 * 1024 * 1024},
+    'catch-all': {'catch_all': True},
+}
+
+# Whether a larger value of a metric is better, for --compare
+HIGHER_IS_BETTER = {
+    'requests_per_s': True,
+    'p50_ms': False,
+    'p99_ms': False,
+    'peak_rss_mb': False,
+    'wall_s': False,
+}
+
+
+def percentile(values: Sequence[float], fraction: float) -> float:
+    """Nearest-rank percentile of ``values``"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))]
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def run_scan(target: str, modules: List[str], engine: str) -> Dict[str, Any]:
+    """Scan ``target`` once in this process and measure it"""
+    from attack_runner import AttackRunner
+    from events import EventSink
+    from http_client import HttpClient
+    from rate_limiter import HostRateLimiter
+    from response_cache import ResponseCache
+
+    class ModuleTimer(EventSink):
+        def __init__(self):
+            self.started: Dict[str, float] = {}
+            self.wall: Dict[str, float] = {}
+
+        def emit(self, event: str, **fields: Any):
+            if event == 'module_started':
+                self.started[fields['module']] = time.monotonic()
+            elif event == 'module_finished' and fields.get('module') in self.started:
+                self.wall[fields['module']] = round(time.monotonic() - self.started[fields['module']], 3)
+
+        def bind(self, **context: Any) -> EventSink:
+            timer = self
+
+            class Bound(EventSink):
+                def emit(self, event: str, **fields: Any):
+                    timer.emit(event, **{**context, **fields})
+
+            return Bound()
+
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+
+    def observe(method: str, url: str, status: Optional[int], elapsed: float):
+        latencies.append(elapsed)
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    timer = ModuleTimer()
+    with HttpClient(cache=ResponseCache(), limiter=HostRateLimiter()) as client:
+        client.observe(observe)
+        started = time.monotonic()
+        results = AttackRunner(target, modules, client=client, engine=engine, events=timer).run()
+        wall = time.monotonic() - started
+    findings = sum(
+        len(value)
+        for result in results.values() if isinstance(result, dict)
+        for value in result.values() if isinstance(value, list)
+    )
+    return {
+        'requests': len(latencies),
+        'requests_per_s': round(len(latencies) / wall, 1) if wall else 0.0,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'peak_rss_mb': peak_rss_mb(),
+        'wall_s': round(wall, 3),
+        'modules': timer.wall,
+        'statuses': statuses,
+        'findings': findings
+    }
+
+
+def run_isolated(target: str, modules: List[str], engine: str) -> Dict[str, Any]:
+    """Run ``run_scan`` in a fresh interpreter so its memory is measured alone"""
+    command = [sys.executable, os.path.abspath(__file__), '--child', json.dumps([target, modules, engine])]
+    completed = subprocess.run(command, capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    if completed.returncode != 0:
+        raise RuntimeError(f'Benchmark run failed: {completed.stderr.strip()[-2000:]}')
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def median_run(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """The run with the median wall time, so one noisy run does not skew the result"""
+    return sorted(runs, key=lambda run: run['wall_s'])[len(runs) // 2]
+
+
+def run_benchmarks(scenarios: List[str], engines: List[str], modules: List[str],
+                   repeat: int = DEFAULT_REPEAT) -> Dict[str, Any]:
+    results = {}
+    for scenario in scenarios:
+        with SimulatedTarget(**SCENARIOS[scenario]) as target:
+            for engine in engines:
+                runs = [run_isolated(target.url, modules, engine) for _ in range(repeat)]
+                results[f'{scenario}/{engine}'] = median_run(runs)
+                logger.info(f"{scenario}/{engine}: {results[f'{scenario}/{engine}']}")
+    return {
+        'meta': {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'modules': modules,
+            'repeat': repeat
+        },
+        'results': results
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Regressions of ``current`` against ``baseline`` beyond ``tolerance``"""
+    regressions = []
+    for name, result in current['results'].items():
+        base = baseline.get('results', {}).get(name)
+        if base is None:
+            continue
+        for metric, higher_is_better in HIGHER_IS_BETTER.items():
+            old, new = base.get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if (-change if higher_is_better else change) > tolerance:
+                regressions.append(f'{name} {metric}: {old} -> {new} ({change:+.0%})')
+    return regressions
+
+
+def print_table(report: Dict[str, Any]):
+    print(f"{'run':<24} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'rss MB':>7} {'wall s':>7}  modules")
+    for name, result in report['results'].items():
+        modules = ' '.join(f'{module}={wall}' for module, wall in result['modules'].items())
+        print(f"{name:<24} {result['requests_per_s']:>8} {result['p50_ms']:>8} {result['p99_ms']:>8} "
+              f"{result['peak_rss_mb']:>7} {result['wall_s']:>7}  {modules}")
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='benchmark.py', description='Scanner benchmarks against a simulated target')
+    parser.add_argument('--scenario', action='append', choices=list(SCENARIOS),
+                        help='scenario to run (repeatable; default all)')
+    parser.add_argument('--engine', action='append', choices=DEFAULT_ENGINES,
+                        help='engine to run (repeatable; default both)')
+    parser.add_argument('--modules', nargs='+', default=list(DEFAULT_MODULES))
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT,
+                        help='runs per scenario and engine; the median run is reported')
+    parser.add_argument('--save', metavar='FILE', help='write the results as a JSON baseline')
+    parser.add_argument('--compare', metavar='FILE', help='fail on regressions against a saved baseline')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='relative change tolerated by --compare')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        logging.disable(logging.CRITICAL)
+        target, modules, engine = json.loads(args.child)
+        print(json.dumps(run_scan(target, modules, engine)))
+        return
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    report = run_benchmarks(args.scenario or list(SCENARIOS), args.engine or list(DEFAULT_ENGINES),
+                            args.modules, args.repeat)
+    print_table(report)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(report, f, indent=2)
+        logger.info(f"Baseline written to {args.save}")
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for regression in regressions:
+            logger.error(f"Regression: {regression}")
+        if regressions:
+            sys.exit(1)
+        logger.info(f"No regressions against {args.compare}")
+
+
+if __name__ == '__main__':
+    main()
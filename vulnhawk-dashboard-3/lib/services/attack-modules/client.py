@@ -1,145 +1,125 @@
-import requests
-from typing import Dict, List
-import concurrent.futures
-from urllib.parse import urljoin, urlparse
-import re
+from typing import Any, Dict, List, Optional
+from crawler import matrix_check
+from http_client import HttpClient
+from probes import Check, Probe, ProbeMatrix, body_contains, reflects_payload
+from scheduler import ThreadScheduler, run_checks
+from urllib.parse import urljoin
 
 class ClientModule:
-    def __init__(self, target: str):
+    def __init__(self, target: str, client: HttpClient = None, endpoints: Optional[List[Dict[str, Any]]] = None,
+                 batch: Optional[int] = None):
         self.target = target
+        self.client = client or HttpClient()
+        # Crawled endpoints; the checks fall back to common guesses without them
+        self.endpoints = endpoints or []
+        # Parameters per injection request; bisected on a hit
+        self.batch = batch
         self.results = {
             "xss": [],
             "csrf": [],
             "clickjacking": [],
             "client_validation": []
         }
-        
-    def check_xss(self) -> List[Dict]:
+
+    def check_xss(self) -> Check:
         """Check for Cross-Site Scripting vulnerabilities"""
-        try:
-            issues = []
-            
-            # Test for reflected XSS
-            xss_payloads = [
-                '<script>alert(1)</script>',
-                '"><script>alert(1)</script>',
-                "'><script>alert(1)</script>",
-                '<img src=x onerror=alert(1)>'
-            ]
-            
-            # Test common parameters
-            params = ['q', 'search', 'id', 'name', 'input']
-            
-            for param in params:
-                for payload in xss_payloads:
-                    try:
-                        response = requests.get(
-                            urljoin(self.target, f'/?{param}={payload}'),
-                            timeout=5
-                        )
-                        if payload in response.text:
-                            issues.append({
-                                'type': 'xss',
-                                'description': 'Potential XSS vulnerability',
-                                'details': f"Reflected XSS in parameter: {param}"
-                            })
-                            break
-                    except:
-                        continue
-                        
-            return issues
-        except Exception as e:
-            print(f"XSS check error: {str(e)}")
-            return []
+        # Test for reflected XSS
+        xss_payloads = [
+            '<script>alert(1)</script>',
+            '"><script>alert(1)</script>',
+            "'><script>alert(1)</script>",
+            '<img src=x onerror=alert(1)>'
+        ]
+
+        matrix = dict(
+            payloads=xss_payloads,
+            match=reflects_payload,
+            finding={
+                'type': 'xss',
+                'description': 'Potential XSS vulnerability',
+                'details': 'Reflected XSS in parameter: {param}'
+            },
+            stop='group',
+            batch=self.batch
+        )
+        # Every payload in every parameter the crawl found, else in common ones;
+        # a parameter is done at its first hit
+        crawled = matrix_check(self.endpoints, **matrix)
+        if crawled is not None:
+            return crawled
+        return ProbeMatrix(urljoin(self.target, '/'), params=['q', 'search', 'id', 'name', 'input'], **matrix).check()
 
-    def check_csrf(self) -> List[Dict]:
+    def check_csrf(self) -> Check:
         """Check for Cross-Site Request Forgery vulnerabilities"""
-        try:
-            issues = []
-            
-            # Test for CSRF protection
-            try:
-                response = requests.get(self.target, timeout=5)
-                if 'csrf' not in response.text.lower() and 'xsrf' not in response.text.lower():
-                    issues.append({
-                        'type': 'csrf',
-                        'description': 'Potential CSRF vulnerability',
-                        'details': 'No CSRF token found in forms'
-                    })
-            except:
-                pass
-                
-            return issues
-        except Exception as e:
-            print(f"CSRF check error: {str(e)}")
+        # Test for CSRF protection
+        has_token = body_contains('csrf', 'xsrf', ignore_case=True)
+
+        def evaluate(probe: Probe, response) -> List[Dict]:
+            if not has_token(probe, response):
+                return [{
+                    'type': 'csrf',
+                    'description': 'Potential CSRF vulnerability',
+                    'details': 'No CSRF token found in forms'
+                }]
             return []
 
-    def check_clickjacking(self) -> List[Dict]:
+        return Check([Probe('GET', self.target)], evaluate)
+
+    def check_clickjacking(self) -> Check:
         """Check for Clickjacking vulnerabilities"""
-        try:
-            issues = []
-            
-            # Check for X-Frame-Options header
-            try:
-                response = requests.get(self.target, timeout=5)
-                if 'X-Frame-Options' not in response.headers:
-                    issues.append({
-                        'type': 'clickjacking',
-                        'description': 'Potential Clickjacking vulnerability',
-                        'details': 'Missing X-Frame-Options header'
-                    })
-            except:
-                pass
-                
-            return issues
-        except Exception as e:
-            print(f"Clickjacking check error: {str(e)}")
+        # Check for X-Frame-Options header
+        def evaluate(probe: Probe, response) -> List[Dict]:
+            if 'X-Frame-Options' not in response.headers:
+                return [{
+                    'type': 'clickjacking',
+                    'description': 'Potential Clickjacking vulnerability',
+                    'details': 'Missing X-Frame-Options header'
+                }]
             return []
 
-    def check_client_validation(self) -> List[Dict]:
+        return Check([Probe('GET', self.target)], evaluate)
+
+    def check_client_validation(self) -> Check:
         """Check for client-side validation bypasses"""
-        try:
-            issues = []
-            
-            # Test for client-side validation
-            test_cases = [
-                ('email', 'test@test.com<script>alert(1)</script>'),
-                ('phone', '1234567890<script>alert(1)</script>'),
-                ('name', '<script>alert(1)</script>')
-            ]
-            
-            for field, value in test_cases:
-                try:
-                    response = requests.post(
-                        urljoin(self.target, '/submit'),
-                        data={field: value},
-                        timeout=5
-                    )
-                    if response.status_code == 200:
-                        issues.append({
-                            'type': 'client_validation',
-                            'description': 'Potential client-side validation bypass',
-                            'details': f"Bypassed validation for field: {field}"
-                        })
-                except:
-                    continue
-                    
-            return issues
-        except Exception as e:
-            print(f"Client validation check error: {str(e)}")
+        # Test for client-side validation
+        test_cases = [
+            ('email', 'test@test.com<script>alert(1)</script>'),
+            ('phone', '1234567890<script>alert(1)</script>'),
+            ('name', '<script>alert(1)</script>')
+        ]
+        # Fields of the forms the crawl found, else of the usual endpoint
+        crawled = [
+            Probe('POST', endpoint['url'], label=f"{field} at {endpoint['url']}",
+                  data={field: dict(test_cases).get(field, '<script>alert(1)</script>')})
+            for endpoint in self.endpoints if endpoint['method'] == 'POST' and endpoint['location'] == 'form'
+            for field in endpoint['params']
+        ]
+        probes = crawled or [
+            Probe('POST', urljoin(self.target, '/submit'), label=field, data={field: value})
+            for field, value in test_cases
+        ]
+
+        def evaluate(probe: Probe, response) -> List[Dict]:
+            if response.status_code == 200:
+                return [{
+                    'type': 'client_validation',
+                    'description': 'Potential client-side validation bypass',
+                    'details': f"Bypassed validation for field: {probe.label}"
+                }]
             return []
 
-    def run(self) -> Dict:
+        return Check(probes, evaluate)
+
+    def checks(self) -> Dict[str, Check]:
+        """All client-side checks keyed by result field"""
+        return {
+            'xss': self.check_xss(),
+            'csrf': self.check_csrf(),
+            'clickjacking': self.check_clickjacking(),
+            'client_validation': self.check_client_validation()
+        }
+
+    def run(self, scheduler: ThreadScheduler = None) -> Dict:
         """Run all client-side vulnerability checks"""
-        with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
-            xss_future = executor.submit(self.check_xss)
-            csrf_future = executor.submit(self.check_csrf)
-            clickjacking_future = executor.submit(self.check_clickjacking)
-            validation_future = executor.submit(self.check_client_validation)
-            
-            self.results['xss'] = xss_future.result()
-            self.results['csrf'] = csrf_future.result()
-            self.results['clickjacking'] = clickjacking_future.result()
-            self.results['client_validation'] = validation_future.result()
-            
-        return self.results 
\ No newline at end of file
+        self.results.update(run_checks(self.client, self.checks(), scheduler, workers=4))
+        return self.results
@@ -0,0 +1,278 @@
+import concurrent.futures
+import hashlib
+import logging
+import math
+import posixpath
+import threading
+from html.parser import HTMLParser
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qsl, urldefrag, urljoin, urlparse
+
+from http_client import HttpClient
+from probes import Check, ProbeMatrix, merge_checks
+
+logger = logging.getLogger('crawler')
+
+DEFAULT_MAX_DEPTH = 2
+DEFAULT_MAX_PAGES = 200
+DEFAULT_MAX_BYTES = 20 * 1024 * 1024
+DEFAULT_CONCURRENCY = 8
+DEFAULT_CAPACITY = 100_000
+DEFAULT_ERROR_RATE = 0.001
+# Links to these are never fetched: they cannot contain more links or forms
+SKIPPED_EXTENSIONS = {
+    '.png', '.jpg', '.jpeg', '.gif', '.svg', '.ico', '.webp', '.css', '.js', '.woff', '.woff2', '.ttf',
+    '.pdf', '.zip', '.gz', '.tar', '.rar', '.7z', '.mp3', '.mp4', '.avi', '.mov', '.exe', '.dmg', '.iso'
+}
+# Form inputs that carry no user data
+IGNORED_INPUT_TYPES = {'submit', 'button', 'image', 'reset'}
+# Stands in for a page left unfetched because the byte budget ran out
+_OVER_BUDGET = object()
+
+
+class BloomFilter:
+    """Set membership in a fixed number of bits, with rare false positives.
+
+    Sized for ``capacity`` items at ``error_rate``; 100k URLs at 0.1% take
+    about 180 KB however long the URLs are. A false positive only means a
+    page is not crawled.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY, error_rate: float = DEFAULT_ERROR_RATE):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str) -> Iterator[int]:
+        # Double hashing: k positions from the two halves of one digest
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+        return ((first + i * second) % self.size for i in range(self.hashes))
+
+    def add(self, item: str) -> bool:
+        """Add ``item``; returns False if it was (probably) already there"""
+        added = False
+        for position in self._positions(item):
+            byte, bit = divmod(position, 8)
+            if not self.bits[byte] & (1 << bit):
+                self.bits[byte] |= 1 << bit
+                added = True
+        return added
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[position // 8] & (1 << position % 8) for position in self._positions(item))
+
+
+class _PageParser(HTMLParser):
+    """Links and forms of one HTML page"""
+
+    def __init__(self, url: str):
+        super().__init__(convert_charrefs=True)
+        self.base = url
+        self.links: List[str] = []
+        self.forms: List[Dict[str, Any]] = []
+        self._form: Optional[Dict[str, Any]] = None
+
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]):
+        attrs = {name: value or '' for name, value in attrs}
+        if tag == 'base' and attrs.get('href'):
+            self.base = urljoin(self.base, attrs['href'])
+        elif tag in ('a', 'area') and attrs.get('href'):
+            self.links.append(urljoin(self.base, attrs['href']))
+        elif tag in ('iframe', 'frame') and attrs.get('src'):
+            self.links.append(urljoin(self.base, attrs['src']))
+        elif tag == 'form':
+            self._form = {
+                'url': urljoin(self.base, attrs.get('action') or ''),
+                'method': (attrs.get('method') or 'GET').upper(),
+                'params': [],
+                'files': []
+            }
+            self.forms.append(self._form)
+        elif tag in ('input', 'select', 'textarea') and self._form is not None and attrs.get('name'):
+            kind = attrs.get('type', '').lower()
+            if kind == 'file':
+                self._form['files'].append(attrs['name'])
+            elif kind not in IGNORED_INPUT_TYPES:
+                self._form['params'].append(attrs['name'])
+
+    def handle_endtag(self, tag: str):
+        if tag == 'form':
+            self._form = None
+
+
+class SiteMap:
+    """Endpoints found by a crawl, merged per URL, method and parameter location.
+
+    ``endpoints`` are plain dicts (``url``, ``method``, ``location`` of
+    'query' or 'form', ``params``, ``files``) so they can be passed to
+    modules as options and through a work queue unchanged.
+    """
+
+    def __init__(self):
+        self.pages = 0
+        self.bytes = 0
+        self._endpoints: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+
+    def add(self, url: str, method: str, location: str, params: Sequence[str], files: Sequence[str] = ()):
+        endpoint = self._endpoints.setdefault((url, method, location), {
+            'url': url, 'method': method, 'location': location, 'params': [], 'files': []
+        })
+        for field, names in (('params', params), ('files', files)):
+            endpoint[field].extend(name for name in names if name not in endpoint[field])
+
+    @property
+    def endpoints(self) -> List[Dict[str, Any]]:
+        return list(self._endpoints.values())
+
+    def summary(self) -> Dict[str, int]:
+        return {'pages': self.pages, 'bytes': self.bytes, 'endpoints': len(self._endpoints)}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'SiteMap':
+        site = cls()
+        site.pages, site.bytes = data['pages'], data['bytes']
+        for endpoint in data['endpoints']:
+            site.add(endpoint['url'], endpoint['method'], endpoint['location'], endpoint['params'], endpoint['files'])
+        return site
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'pages': self.pages, 'bytes': self.bytes, 'endpoints': self.endpoints}
+
+
+class Crawler:
+    """Breadth-first crawl of one site within depth, page and byte budgets.
+
+    Pages of one depth are fetched concurrently through the scan's
+    ``HttpClient``, so its pooling, rate limiting and body cap apply. Only
+    links on the target's host are followed. The frontier is deduplicated
+    by URL shape (path plus query parameter names, not their values) in a
+    ``BloomFilter``, so memory stays bounded on sites with endless
+    generated URLs. Query strings and forms become ``SiteMap`` endpoints.
+    Each fetch reads at most what is left of ``max_bytes`` and the crawl
+    stops once it is spent, so the budget holds within a depth too.
+    """
+
+    def __init__(self, client: HttpClient, target: str, max_depth: int = DEFAULT_MAX_DEPTH,
+                 max_pages: int = DEFAULT_MAX_PAGES, max_bytes: int = DEFAULT_MAX_BYTES,
+                 concurrency: int = DEFAULT_CONCURRENCY, capacity: int = DEFAULT_CAPACITY):
+        self.client = client
+        self.target = target
+        self.host = urlparse(target).netloc.lower()
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.max_bytes = max_bytes
+        self.concurrency = concurrency
+        self.seen = BloomFilter(capacity)
+        self._read = 0
+        self._lock = threading.Lock()
+
+    def crawl(self) -> SiteMap:
+        site = SiteMap()
+        level = [self.target]
+        self._read = 0
+        self.seen.add(self._shape(self.target))
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='crawl') as pool:
+            for depth in range(self.max_depth + 1):
+                level = level[:self.max_pages - site.pages]
+                if not level or self._read >= self.max_bytes:
+                    break
+                found = []
+                futures = [pool.submit(self._fetch, url) for url in level]
+                for url, future in zip(level, futures):
+                    page = future.result()
+                    if page is _OVER_BUDGET:
+                        for rest in futures:
+                            rest.cancel()
+                        break
+                    site.pages += 1
+                    if page is None:
+                        continue
+                    site.bytes += len(page.content)
+                    found.extend(self._parse(url, page, site))
+                level = [url for url in found if self._wanted(url)] if depth < self.max_depth else []
+        logger.info(f"Crawled {self.target}: {site.summary()}")
+        return site
+
+    def _fetch(self, url: str):
+        # Concurrent fetches each reserve what they may read, so together they stay within the budget
+        with self._lock:
+            left = self.max_bytes - self._read
+            if left <= 0:
+                return _OVER_BUDGET
+            max_body = left if self.client.max_body is None else min(self.client.max_body, left)
+            self._read += max_body
+        try:
+            # Only a cap below the client's goes with the request, so archived fetches keep their key
+            response = self.client.get(url, **({'max_body': max_body} if max_body != self.client.max_body else {}))
+        except Exception as e:
+            logger.debug(f"Crawl of {url} failed: {e}")
+            response = None
+        with self._lock:
+            self._read -= max_body - (len(response.content) if response is not None else 0)
+        if response is None:
+            return None
+        if 'html' not in response.headers.get('Content-Type', 'text/html').lower():
+            return None
+        return response
+
+    def _parse(self, url: str, page, site: SiteMap) -> List[str]:
+        """Record the endpoints of a page; returns its links"""
+        parser = _PageParser(page.url or url)
+        try:
+            parser.feed(page.text)
+        except Exception as e:
+            logger.debug(f"Could not parse {url}: {e}")
+        for link in [url, *parser.links]:
+            address, query = self._split(link)
+            if query and self._on_site(address):
+                site.add(address, 'GET', 'query', query)
+        for form in parser.forms:
+            address, query = self._split(form['url'])
+            if not self._on_site(address):
+                continue
+            if form['method'] == 'POST':
+                site.add(address, 'POST', 'form', form['params'], form['files'])
+            else:
+                site.add(address, 'GET', 'query', query + form['params'])
+        return parser.links + [form['url'] for form in parser.forms if form['method'] == 'GET']
+
+    @staticmethod
+    def _split(url: str) -> Tuple[str, List[str]]:
+        """URL without query or fragment, and the query's parameter names"""
+        url = urldefrag(url)[0]
+        parsed = urlparse(url)
+        names = list(dict.fromkeys(name for name, _ in parse_qsl(parsed.query, keep_blank_values=True)))
+        return parsed._replace(query='').geturl(), names
+
+    def _on_site(self, url: str) -> bool:
+        parsed = urlparse(url)
+        return parsed.scheme in ('http', 'https') and parsed.netloc.lower() == self.host
+
+    def _shape(self, url: str) -> str:
+        address, names = self._split(url)
+        return f"{address}?{'&'.join(sorted(names))}"
+
+    def _wanted(self, url: str) -> bool:
+        if not self._on_site(url):
+            return False
+        if posixpath.splitext(urlparse(url).path)[1].lower() in SKIPPED_EXTENSIONS:
+            return False
+        return self.seen.add(self._shape(url))
+
+
+def matrix_check(endpoints: Sequence[Dict[str, Any]], payloads: Sequence[str], match, finding: Dict[str, str],
+                 stop: Optional[str] = 'group', **kwargs) -> Optional[Check]:
+    """One ``ProbeMatrix`` per crawled endpoint with parameters, run as one check; None without any"""
+    matrices = [
+        ProbeMatrix(endpoint['url'], endpoint['params'], payloads, match, _at(finding, endpoint['url']),
+                    method=endpoint['method'], location=endpoint['location'], stop=stop, **kwargs).check()
+        for endpoint in endpoints if endpoint['params']
+    ]
+    return merge_checks(matrices) if matrices else None
+
+
+def _at(finding: Dict[str, str], url: str) -> Dict[str, str]:
+    """``finding`` template whose details name the endpoint"""
+    url = url.replace('{', '{{').replace('}', '}}')
+    return {**finding, 'details': f"{finding['details']} at {url}"} if 'details' in finding else finding
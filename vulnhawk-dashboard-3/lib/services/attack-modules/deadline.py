@@ -0,0 +1,42 @@
+import math
+import time
+from typing import Optional
+
+
+class DeadlineExceeded(Exception):
+    """No time is left for the work a deadline covers"""
+
+
+class Deadline:
+    """A point on the monotonic clock by which work has to be finished.
+
+    A scan gets one deadline and each module a child of it, which never
+    ends later than its parent. Requests take their timeout from
+    ``budget``, so every request gets at most the time that is left.
+    """
+
+    def __init__(self, seconds: Optional[float] = None, parent: Optional['Deadline'] = None):
+        self.at = time.monotonic() + seconds if seconds is not None else math.inf
+        if parent is not None:
+            self.at = min(self.at, parent.at)
+
+    @classmethod
+    def child(cls, parent: Optional['Deadline'], seconds: Optional[float]) -> Optional['Deadline']:
+        """Deadline ``seconds`` from now, capped by ``parent``; None if neither is set"""
+        if parent is None and seconds is None:
+            return None
+        return cls(seconds, parent)
+
+    def remaining(self) -> float:
+        return max(0.0, self.at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.at
+
+    def budget(self, timeout: Optional[float]) -> float:
+        """Timeout for one request: ``timeout`` cut down to the time left"""
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise DeadlineExceeded('Deadline passed')
+        return remaining if timeout is None else min(timeout, remaining)
@@ -0,0 +1,317 @@
+"""Distributed scans: a coordinator shards each target's scan onto a shared queue that workers drain.
+
+    python distributed.py coordinator --queue sqlite:///srv/vh/queue.db http://example.com auth file
+    python distributed.py coordinator --queue queue.db --targets targets.txt recon auth
+    python distributed.py worker --queue queue.db [--engine asyncio] [--exit-when-idle]
+"""
+import argparse
+import json
+import logging
+import os
+import socket
+import sys
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional, TextIO, Tuple
+
+from attack_runner import (ENGINES, add_crawl_options, add_diagnostic_options, add_engine_options,
+                           add_module_options, build_client, crawl_options, module_options, setup_logging)
+from batch import read_targets
+from crawler import Crawler
+from soft404 import baselines
+from deadline import Deadline
+from http_client import HttpClient
+from probes import Check
+from profiling import profiled
+from registry import registry
+from scheduler import DEFAULT_WORKERS, ThreadScheduler
+from work_queue import DEFAULT_LEASE, DONE, FAILED, LEASED, QUEUED, Shard, WorkQueue, open_queue
+
+logger = logging.getLogger('distributed')
+
+DEFAULT_SHARD_SIZE = 50
+DEFAULT_POLL_INTERVAL = 1.0
+
+
+def split_check(check: Check, shard_size: int) -> List[Optional[Tuple[int, int]]]:
+    """Probe ranges ``[start, end)`` to shard a check into; None stands for the whole check.
+
+    Funcs, ``'check'`` stop policies and groups that are not contiguous
+    keep the check in one piece; otherwise ranges end on group boundaries.
+    """
+    probes = check.probes
+    if check.func is not None or check.stop == 'check' or len(probes) <= shard_size:
+        return [None]
+    if check.stop == 'group':
+        starts = [index for index in range(len(probes)) if not index or probes[index].group != probes[index - 1].group]
+        if len({probes[index].group for index in starts}) != len(starts):
+            return [None]
+    else:
+        starts = list(range(len(probes)))
+    ranges, start = [], 0
+    for boundary in starts[1:] + [len(probes)]:
+        if boundary - start >= shard_size or boundary == len(probes):
+            ranges.append((start, boundary))
+            start = boundary
+    return ranges
+
+
+class Coordinator:
+    """Puts the shards of each target's scan on the queue and assembles their results"""
+
+    def __init__(self, queue: WorkQueue, modules: List[str], shard_size: int = DEFAULT_SHARD_SIZE,
+                 module_options: Optional[Dict[str, Dict[str, Any]]] = None, client: Optional[HttpClient] = None,
+                 crawl: Optional[Dict[str, Any]] = None, soft404: bool = True):
+        self.queue = queue
+        self.modules = modules
+        self.shard_size = shard_size
+        self.module_options = module_options or {}
+        self.crawl = crawl
+        self.soft404 = soft404
+        # Builds the checks, crawls and fetches baselines; the coordinator sends no probes
+        self.client = client or HttpClient()
+        self._scans: Dict[str, Tuple[str, Dict[str, Any]]] = {}
+
+    def submit(self, target: str) -> str:
+        """Queue every shard of a scan of ``target``; returns the scan id"""
+        scan = uuid.uuid4().hex
+        loaded, payloads = {}, []
+        discovered = self.discover(target)
+        for module_name in self.modules:
+            options = dict(self.module_options.get(module_name, {}))
+            for feature, option in (('crawl', 'endpoints'), ('soft404', 'baseline')):
+                if option in discovered and registry.wants(module_name, feature):
+                    options[option] = discovered[option]
+            try:
+                module = registry.create(module_name, target, client=self.client, **options)
+                checks = module.checks()
+            except Exception as e:
+                logger.error(f"Module {module_name} failed for {target}: {e}")
+                loaded[module_name] = {'error': str(e)}
+                continue
+            loaded[module_name] = module
+            for name, check in checks.items():
+                for probes in split_check(check, self.shard_size):
+                    payloads.append({'target': target, 'module': module_name, 'check': name,
+                                     'probes': probes, 'options': options})
+        self.queue.put(scan, payloads)
+        self._scans[scan] = (target, loaded)
+        logger.info(f"Queued scan {scan} of {target} as {len(payloads)} shards")
+        return scan
+
+    def discover(self, target: str) -> Dict[str, Any]:
+        """Module options found on ``target`` itself: soft-404 'baseline' and crawled 'endpoints'"""
+        wanted = lambda feature: any(registry.wants(name, feature) for name in self.modules)
+        discovered = {}
+        if self.soft404 and wanted('soft404'):
+            try:
+                discovered['baseline'] = baselines.get(self.client, target).to_dict()
+            except Exception as e:
+                logger.error(f"Soft-404 baseline of {target} failed: {e}")
+        if self.crawl is not None and wanted('crawl'):
+            try:
+                discovered['endpoints'] = Crawler(self.client, target, **self.crawl).crawl().endpoints
+            except Exception as e:
+                logger.error(f"Crawl of {target} failed: {e}")
+        return discovered
+
+    def finished(self, scan: str) -> bool:
+        progress = self.queue.progress(scan)
+        return not progress.get(QUEUED) and not progress.get(LEASED)
+
+    def collect(self, scan: str) -> Dict[str, Any]:
+        """Merge the shard results of a finished scan into ``AttackRunner`` results"""
+        target, loaded = self._scans[scan]
+        findings: Dict[str, Dict[str, Any]] = {
+            name: {check: [] for check in module.checks()}
+            for name, module in loaded.items() if not isinstance(module, dict)
+        }
+        for shard in self.queue.results(scan):
+            payload = shard['payload']
+            results = findings[payload['module']]
+            if shard['state'] == DONE:
+                results[payload['check']].extend(shard['result']['findings'])
+                if shard['result']['skipped']:
+                    results.setdefault('_skipped', {}).setdefault(payload['check'], []).extend(shard['result']['skipped'])
+            elif shard['state'] == FAILED:
+                results.setdefault('_failed', {}).setdefault(payload['check'], []).append(shard['error'])
+        output = {}
+        for name, module in loaded.items():
+            if isinstance(module, dict):
+                output[name] = module
+                continue
+            module.results.update(findings[name])
+            output[name] = module.results
+        return output
+
+    def run(self, targets: List[str], out: TextIO = sys.stdout, poll_interval: float = DEFAULT_POLL_INTERVAL) -> int:
+        """Scan ``targets`` on the queue's workers, writing each target's results when it completes.
+
+        Returns the number of targets with failed shards.
+        """
+        pending = {self.submit(target): target for target in targets}
+        failed = 0
+        while pending:
+            for scan in [scan for scan in pending if self.finished(scan)]:
+                target = pending.pop(scan)
+                results = self.collect(scan)
+                failed += any('_failed' in result or 'error' in result for result in results.values())
+                out.write(json.dumps({'target': target, 'scan': scan, 'results': results}) + '\n')
+                out.flush()
+            if pending:
+                time.sleep(poll_interval)
+        return failed
+
+
+class ShardWorker:
+    """Leases shards from the queue and runs them on a local engine.
+
+    A heartbeat thread keeps the lease of the running shard alive. A shard
+    that fails is given back to the queue for another attempt. Each shard
+    must finish within ``shard_timeout`` seconds when given.
+    """
+
+    def __init__(self, queue: WorkQueue, client: HttpClient, engine: str = 'thread',
+                 concurrency: Optional[int] = None, name: Optional[str] = None,
+                 shard_timeout: Optional[float] = None, heartbeat: float = DEFAULT_LEASE / 3):
+        if engine not in ENGINES:
+            raise ValueError(f'Unknown engine: {engine}')
+        self.queue = queue
+        self.client = client
+        self.engine = engine
+        self.concurrency = concurrency
+        self.name = name or f'{socket.gethostname()}:{os.getpid()}'
+        self.shard_timeout = shard_timeout
+        self.heartbeat = heartbeat
+        self.stopped = threading.Event()
+        self._scheduler = None
+
+    def run(self, exit_when_idle: bool = False, poll_interval: float = DEFAULT_POLL_INTERVAL) -> int:
+        """Work shards until stopped (or the queue is empty); returns the number of shards done"""
+        done = 0
+        if self.engine == 'thread':
+            self._scheduler = ThreadScheduler(self.client, workers=self.concurrency or DEFAULT_WORKERS)
+        try:
+            while not self.stopped.is_set():
+                shard = self.queue.lease(self.name)
+                if shard is None:
+                    if exit_when_idle:
+                        break
+                    self.stopped.wait(poll_interval)
+                    continue
+                done += self.work(shard)
+        finally:
+            if self._scheduler is not None:
+                self._scheduler.close()
+        logger.info(f"Worker {self.name} stopping after {done} shards")
+        return done
+
+    def work(self, shard: Shard) -> bool:
+        """Run one leased shard and report it; returns whether it completed"""
+        payload = shard.payload
+        probes = ' probes {}-{}'.format(*payload['probes']) if payload['probes'] else ''
+        logger.info(f"Shard {shard.id}: {payload['module']}.{payload['check']}{probes} on {payload['target']} "
+                    f"(attempt {shard.attempts})")
+        finished = threading.Event()
+        beat = threading.Thread(target=self._heartbeat, args=(shard, finished), name='heartbeat', daemon=True)
+        beat.start()
+        try:
+            result = self.run_shard(payload)
+        except Exception as e:
+            logger.error(f"Shard {shard.id} failed: {e}")
+            self.queue.fail(shard, self.name, str(e))
+            return False
+        finally:
+            finished.set()
+            beat.join()
+        if not self.queue.complete(shard, self.name, result):
+            logger.warning(f"Shard {shard.id} was re-queued while running, dropping its result")
+            return False
+        return True
+
+    def _heartbeat(self, shard: Shard, finished: threading.Event):
+        while not finished.wait(self.heartbeat):
+            if not self.queue.heartbeat(shard, self.name):
+                logger.warning(f"Lost the lease on shard {shard.id}")
+                return
+
+    def run_shard(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Findings and skipped probes of one shard"""
+        module_name, name = payload['module'], payload['check']
+        module = registry.create(module_name, payload['target'], client=self.client, **payload['options'])
+        check = module.checks()[name]
+        if payload['probes'] is not None:
+            start, end = payload['probes']
+            check = Check(check.probes[start:end], check.evaluate, stop=check.stop, split=check.split)
+        checks = {module_name: {name: check}}
+        deadline = Deadline(self.shard_timeout) if self.shard_timeout is not None else None
+        if self.engine == 'asyncio':
+            from async_engine import AsyncEngine, DEFAULT_CONCURRENCY
+            engine = AsyncEngine(self.client, concurrency=self.concurrency or DEFAULT_CONCURRENCY)
+            results = engine.run(checks, deadline=deadline)[module_name]
+        else:
+            results = self._scheduler.run(checks, deadline=deadline)[module_name]
+        return {'findings': results[name], 'skipped': results.get('_skipped', {}).get(name, [])}
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='distributed.py', description='Distributed scans over a shared work queue')
+    roles = parser.add_subparsers(dest='role', required=True)
+
+    coordinator = roles.add_parser('coordinator', help='queue scans and collect their results')
+    coordinator.add_argument('args', nargs='+', metavar='target/module')
+    coordinator.add_argument('--targets', metavar='FILE', help="scan every target listed in FILE ('-' for stdin)")
+    coordinator.add_argument('--shard-size', type=int, default=DEFAULT_SHARD_SIZE,
+                             help='probes per shard for checks large enough to split')
+    add_module_options(coordinator)
+    add_crawl_options(coordinator)
+
+    worker = roles.add_parser('worker', help='run shards from the queue')
+    worker.add_argument('--name', help='worker name in the queue (default host:pid)')
+    worker.add_argument('--exit-when-idle', action='store_true', help='stop once the queue has no shards left')
+    add_engine_options(worker)
+
+    for role in (coordinator, worker):
+        role.add_argument('--queue', required=True, metavar='URL',
+                          help='queue backend: a SQLite file path or sqlite:///path')
+        role.add_argument('--lease', type=float, default=DEFAULT_LEASE,
+                          help='seconds a shard stays leased without a heartbeat')
+        role.add_argument('--poll-interval', type=float, default=DEFAULT_POLL_INTERVAL)
+        add_diagnostic_options(role)
+    return parser
+
+
+def main():
+    parser = build_parser()
+    args = parser.parse_args()
+    if args.log_level:
+        setup_logging(args.log_level)
+
+    if args.role == 'coordinator':
+        if args.targets:
+            targets, modules = read_targets(args.targets), args.args
+        elif len(args.args) < 2:
+            parser.error('a target and at least one module are required')
+        else:
+            targets, modules = args.args[:1], args.args[1:]
+    elif args.journal or args.resume:
+        parser.error('the queue keeps track of finished shards; --journal and --resume do not apply')
+
+    queue = open_queue(args.queue, lease=args.lease)
+    try:
+        with profiled(args.profile, args.profile_mode, args.profile_top):
+            if args.role == 'coordinator':
+                failed = Coordinator(queue, modules, args.shard_size, module_options(args), crawl=crawl_options(args),
+                                     soft404=not args.no_soft404).run(targets, poll_interval=args.poll_interval)
+                sys.exit(1 if failed else 0)
+            with build_client(args) as client:
+                ShardWorker(queue, client, engine=args.engine, concurrency=args.concurrency, name=args.name,
+                            shard_timeout=args.module_timeout or args.deadline,
+                            heartbeat=args.lease / 3).run(args.exit_when_idle, args.poll_interval)
+    finally:
+        queue.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,266 @@
+import asyncio
+import logging
+import random
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, FrozenSet, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import dns.asyncquery
+import dns.exception
+import dns.flags
+import dns.message
+import dns.rcode
+import dns.rdatatype
+import dns.resolver
+
+logger = logging.getLogger('dns_enum')
+
+DEFAULT_WINDOW = 256
+DEFAULT_TIMEOUT = 1.0
+DEFAULT_TRIES = 3
+DEFAULT_NEGATIVE_TTL = 60
+DEFAULT_CACHE_SIZE = 200_000
+# Random labels resolved per zone to tell wildcard DNS from real names
+WILDCARD_PROBES = 2
+
+
+def read_wordlist(path: str) -> Iterator[str]:
+    """Yield subdomain labels from a wordlist one line at a time.
+
+    The file is never loaded whole, so 100k+ entry lists stream in constant
+    memory. Blank lines and '#' comments are skipped.
+    """
+    with open(path, encoding='utf-8', errors='replace') as f:
+        for line in f:
+            word = line.strip().lower().rstrip('.')
+            if word and not word.startswith('#'):
+                yield word
+
+
+class DnsCache:
+    """Positive and negative answers kept for their DNS TTLs.
+
+    A positive entry holds the resolved addresses, a negative one (NXDOMAIN
+    or no records) holds None. Thread-safe, so one cache can serve every
+    scan in a process. When full, the oldest entries are dropped first.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[str, Tuple[float, Optional[Tuple[str, ...]]]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> Tuple[bool, Optional[Tuple[str, ...]]]:
+        """Return ``(hit, addresses)``; addresses is None for a cached negative answer"""
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None:
+                return False, None
+            expires, addresses = entry
+            if expires < time.monotonic():
+                del self._entries[name]
+                return False, None
+            return True, addresses
+
+    def put(self, name: str, addresses: Optional[Tuple[str, ...]], ttl: float):
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._entries[name] = (time.monotonic() + ttl, addresses)
+            self._entries.move_to_end(name)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# Shared by every enumerator in the process, so a long-lived worker keeps
+# answers warm between scans for as long as their TTLs allow
+shared_cache = DnsCache()
+
+
+def _negative_ttl(response) -> float:
+    """Negative caching TTL from the SOA in a response's authority section"""
+    if response is not None:
+        for rrset in response.authority:
+            if rrset.rdtype == dns.rdatatype.SOA:
+                return min(rrset.ttl, rrset[0].minimum)
+    return DEFAULT_NEGATIVE_TTL
+
+
+class _DnsChannel(asyncio.DatagramProtocol):
+    """One UDP socket carrying every in-flight query to one name server.
+
+    Responses are matched to queries by message id and question, so
+    hundreds of lookups share a socket instead of each opening its own.
+    """
+
+    def __init__(self, address: Tuple[str, int]):
+        self.address = address
+        self.transport = None
+        self._pending: Dict[int, Tuple[dns.message.Message, asyncio.Future]] = {}
+
+    @classmethod
+    async def open(cls, nameserver: str, port: int) -> '_DnsChannel':
+        channel = cls((nameserver, port))
+        await asyncio.get_running_loop().create_datagram_endpoint(lambda: channel, remote_addr=channel.address)
+        return channel
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data: bytes, addr):
+        try:
+            response = dns.message.from_wire(data)
+        except dns.exception.DNSException:
+            return
+        request, future = self._pending.get(response.id, (None, None))
+        if future is not None and not future.done() and request.is_response(response):
+            future.set_result(response)
+
+    def error_received(self, exc: Exception):
+        logger.debug(f"Name server {self.address[0]} socket error: {exc}")
+
+    async def query(self, request: dns.message.Message, timeout: float) -> dns.message.Message:
+        while request.id in self._pending:
+            request.id = random.getrandbits(16)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request.id] = (request, future)
+        try:
+            self.transport.sendto(request.to_wire())
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            raise dns.exception.Timeout(timeout=timeout) from None
+        finally:
+            del self._pending[request.id]
+
+    def close(self):
+        if self.transport is not None:
+            self.transport.close()
+
+
+class SubdomainEnumerator:
+    """Resolves candidate subdomains concurrently on one event loop.
+
+    Up to ``window`` lookups are in flight at once, multiplexed over one UDP
+    socket per name server (the system's unless ``nameservers`` is given).
+    Candidates are pulled lazily from any iterable (such as
+    ``read_wordlist``), so the window bounds memory as well as load on the
+    name servers. Each zone is tested once for wildcard DNS, and names
+    that only resolve to the wildcard's addresses are dropped. Answers are
+    cached with their TTLs. Timeouts and server failures are retried up to
+    ``tries`` times, then counted and logged, never cached.
+    """
+
+    def __init__(self, nameservers: Optional[Sequence[str]] = None, port: int = 53,
+                 window: int = DEFAULT_WINDOW, timeout: float = DEFAULT_TIMEOUT,
+                 tries: int = DEFAULT_TRIES, rdtype: str = 'A', cache: Optional[DnsCache] = None):
+        self.nameservers = list(nameservers) if nameservers else dns.resolver.Resolver().nameservers
+        self.port = port
+        self.window = window
+        self.timeout = timeout
+        self.tries = tries
+        self.rdtype = dns.rdatatype.from_text(rdtype)
+        self.cache = cache if cache is not None else shared_cache
+        self.lookups = 0
+        self.cache_hits = 0
+        self.errors = 0
+        self.elapsed = 0.0
+
+    async def _exchange(self, channels: Sequence[_DnsChannel], name: str) -> dns.message.Message:
+        """Send one query, rotating over the name servers on timeouts and failures"""
+        error: Exception = dns.exception.Timeout(timeout=self.timeout)
+        for attempt in range(self.tries):
+            channel = channels[(hash(name) + attempt) % len(channels)]
+            request = dns.message.make_query(name, self.rdtype)
+            request.id = random.getrandbits(16)
+            try:
+                response = await channel.query(request, self.timeout)
+            except dns.exception.Timeout as e:
+                error = e
+                continue
+            if response.flags & dns.flags.TC:
+                response = await dns.asyncquery.tcp(request, channel.address[0], self.timeout, channel.address[1])
+            if response.rcode() in (dns.rcode.NOERROR, dns.rcode.NXDOMAIN):
+                return response
+            error = dns.exception.DNSException(f'{dns.rcode.to_text(response.rcode())} from {channel.address[0]}')
+        raise error
+
+    async def resolve(self, channels: Sequence[_DnsChannel], name: str) -> Optional[Tuple[str, ...]]:
+        """Addresses for a name, or None if it does not exist or has no records"""
+        hit, addresses = self.cache.get(name)
+        if hit:
+            self.cache_hits += 1
+            return addresses
+        self.lookups += 1
+        try:
+            response = await self._exchange(channels, name)
+        except (dns.exception.DNSException, OSError) as e:
+            self.errors += 1
+            logger.debug(f"Lookup of {name} failed: {e}")
+            return None
+        # Follow CNAME chains by taking every record of the wanted type
+        rrsets = [rrset for rrset in response.answer if rrset.rdtype == self.rdtype]
+        if response.rcode() == dns.rcode.NXDOMAIN or not rrsets:
+            self.cache.put(name, None, _negative_ttl(response))
+            return None
+        addresses = tuple(sorted(rdata.to_text() for rrset in rrsets for rdata in rrset))
+        self.cache.put(name, addresses, min(rrset.ttl for rrset in response.answer))
+        return addresses
+
+    async def _wildcard(self, channels: Sequence[_DnsChannel], zone: str) -> FrozenSet[str]:
+        """Addresses that any random label under ``zone`` resolves to"""
+        addresses = set()
+        for _ in range(WILDCARD_PROBES):
+            found = await self.resolve(channels, f'{secrets.token_hex(8)}.{zone}')
+            addresses.update(found or ())
+        if addresses:
+            logger.info(f"Wildcard DNS on {zone}: {sorted(addresses)}")
+        return frozenset(addresses)
+
+    async def aenumerate(self, domain: str, words: Iterable[str]) -> List[str]:
+        """Resolve ``<word>.<domain>`` for every word; returns the names that exist"""
+        domain = domain.lower().rstrip('.')
+        channels = [await _DnsChannel.open(nameserver, self.port) for nameserver in self.nameservers]
+        wildcards: Dict[str, asyncio.Task] = {}
+        found = []
+        candidates = iter(words)
+        started = time.monotonic()
+
+        async def worker():
+            for word in candidates:
+                name = f'{word}.{domain}'
+                addresses = await self.resolve(channels, name)
+                if not addresses:
+                    continue
+                zone = name.split('.', 1)[1]
+                if zone not in wildcards:
+                    wildcards[zone] = asyncio.ensure_future(self._wildcard(channels, zone))
+                if not set(addresses) <= await wildcards[zone]:
+                    found.append(name)
+
+        try:
+            await asyncio.gather(*(worker() for _ in range(self.window)))
+        finally:
+            for channel in channels:
+                channel.close()
+        self.elapsed += time.monotonic() - started
+        return sorted(found)
+
+    def enumerate(self, domain: str, words: Iterable[str]) -> List[str]:
+        """Blocking form of ``aenumerate`` for checks run on worker threads"""
+        found = asyncio.run(self.aenumerate(domain, words))
+        logger.info(f"Subdomain enumeration of {domain}: {self.stats()}")
+        return found
+
+    def stats(self) -> Dict[str, float]:
+        resolved = self.lookups + self.cache_hits
+        return {
+            'lookups': self.lookups,
+            'cache_hits': self.cache_hits,
+            'errors': self.errors,
+            'per_second': round(resolved / self.elapsed, 1) if self.elapsed else 0.0
+        }
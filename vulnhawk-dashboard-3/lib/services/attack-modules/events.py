@@ -0,0 +1,41 @@
+import json
+import sys
+import threading
+import time
+from typing import Any, Dict, Optional, TextIO
+
+
+class EventSink:
+    """Receives scan progress events; the base sink discards them.
+
+    Engines report ``module_started``, ``finding``, ``finding_retracted``
+    (a finding an earlier probe's replaced), ``module_finished`` and
+    ``stats`` events through ``emit`` as they happen, from whichever
+    thread produced them.
+    """
+
+    def emit(self, event: str, **fields: Any):
+        pass
+
+    def bind(self, **context: Any) -> 'EventSink':
+        """Return a sink that adds ``context`` fields to every event"""
+        return self
+
+
+class NdjsonWriter(EventSink):
+    """Writes each event as one JSON line so consumers can stream results"""
+
+    def __init__(self, out: TextIO = sys.stdout, context: Optional[Dict[str, Any]] = None,
+                 lock: Optional[threading.Lock] = None):
+        self.out = out
+        self.context = context or {}
+        self._lock = lock or threading.Lock()
+
+    def emit(self, event: str, **fields: Any):
+        with self._lock:
+            line = json.dumps({'event': event, 'time': round(time.time(), 3), **self.context, **fields}, default=str)
+            self.out.write(line + '\n')
+            self.out.flush()
+
+    def bind(self, **context: Any) -> 'NdjsonWriter':
+        return NdjsonWriter(self.out, {**self.context, **context}, self._lock)
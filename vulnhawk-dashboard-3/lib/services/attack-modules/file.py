@@ -1,12 +1,22 @@
-import requests
-from typing import Dict, List
-import concurrent.futures
+from typing import Any, Dict, List, Optional
+from crawler import matrix_check
+from http_client import HttpClient
+from probes import STATUS_ONLY, Check, Probe, ProbeMatrix, body_contains
+from scheduler import ThreadScheduler, run_checks
+from soft404 import Baseline, exists
 from urllib.parse import urljoin
-import re
 
 class FileModule:
-    def __init__(self, target: str):
+    def __init__(self, target: str, client: HttpClient = None, endpoints: Optional[List[Dict[str, Any]]] = None,
+                 batch: Optional[int] = None, baseline: Optional[Dict[str, Any]] = None):
         self.target = target
+        self.client = client or HttpClient()
+        # Crawled endpoints; the checks fall back to common guesses without them
+        self.endpoints = endpoints or []
+        # Parameters per injection request; bisected on a hit
+        self.batch = batch
+        # Soft-404 fingerprint of the host; path checks ignore 200s that match it
+        self.baseline = Baseline.from_dict(baseline) if baseline else None
         self.results = {
             "sql_injection": [],
             "nosql_injection": [],
@@ -14,195 +24,159 @@ class FileModule:
             "file_upload": [],
             "data_leakage": []
         }
-        
-    def check_sql_injection(self) -> List[Dict]:
+
+    def check_sql_injection(self) -> Check:
         """Check for SQL injection vulnerabilities"""
-        try:
-            issues = []
-            
-            # SQL injection payloads
-            sql_payloads = [
-                "' OR '1'='1",
-                "' OR 1=1--",
-                "' UNION SELECT NULL--",
-                "admin'--"
-            ]
-            
-            # Test common parameters
-            params = ['id', 'user', 'name', 'search']
-            
-            for param in params:
-                for payload in sql_payloads:
-                    try:
-                        response = requests.get(
-                            urljoin(self.target, f'/?{param}={payload}'),
-                            timeout=5
-                        )
-                        if any(error in response.text.lower() for error in ['sql', 'mysql', 'postgresql', 'oracle']):
-                            issues.append({
-                                'type': 'sql_injection',
-                                'description': 'Potential SQL injection vulnerability',
-                                'details': f"SQL error in parameter: {param}"
-                            })
-                            break
-                    except:
-                        continue
-                        
-            return issues
-        except Exception as e:
-            print(f"SQL injection check error: {str(e)}")
-            return []
+        # SQL injection payloads
+        sql_payloads = [
+            "' OR '1'='1",
+            "' OR 1=1--",
+            "' UNION SELECT NULL--",
+            "admin'--"
+        ]
 
-    def check_nosql_injection(self) -> List[Dict]:
+        matrix = dict(
+            payloads=sql_payloads,
+            match=body_contains('sql', 'mysql', 'postgresql', 'oracle', ignore_case=True),
+            finding={
+                'type': 'sql_injection',
+                'description': 'Potential SQL injection vulnerability',
+                'details': 'SQL error in parameter: {param}'
+            },
+            stop='group',
+            batch=self.batch
+        )
+        # Every payload in every parameter the crawl found, else in common ones;
+        # a parameter is done at its first hit
+        crawled = matrix_check(self.endpoints, **matrix)
+        if crawled is not None:
+            return crawled
+        return ProbeMatrix(urljoin(self.target, '/'), params=['id', 'user', 'name', 'search'], **matrix).check()
+
+    def check_nosql_injection(self) -> Check:
         """Check for NoSQL injection vulnerabilities"""
-        try:
-            issues = []
-            
-            # NoSQL injection payloads
-            nosql_payloads = [
-                '{"$gt": ""}',
-                '{"$ne": null}',
-                '{"$where": "1==1"}'
-            ]
-            
-            for payload in nosql_payloads:
-                try:
-                    response = requests.post(
-                        urljoin(self.target, '/api/search'),
-                        json={'query': payload},
-                        timeout=5
-                    )
-                    if response.status_code == 200 and len(response.json()) > 0:
-                        issues.append({
-                            'type': 'nosql_injection',
-                            'description': 'Potential NoSQL injection vulnerability',
-                            'details': 'NoSQL query manipulation successful'
-                        })
-                        break
-                except:
-                    continue
-                    
-            return issues
-        except Exception as e:
-            print(f"NoSQL injection check error: {str(e)}")
+        # NoSQL injection payloads
+        nosql_payloads = [
+            '{"$gt": ""}',
+            '{"$ne": null}',
+            '{"$where": "1==1"}'
+        ]
+        probes = [
+            Probe('POST', urljoin(self.target, '/api/search'), json={'query': payload})
+            for payload in nosql_payloads
+        ]
+
+        def evaluate(probe: Probe, response) -> List[Dict]:
+            if response.status_code == 200 and len(response.json()) > 0:
+                return [{
+                    'type': 'nosql_injection',
+                    'description': 'Potential NoSQL injection vulnerability',
+                    'details': 'NoSQL query manipulation successful'
+                }]
             return []
 
-    def check_command_injection(self) -> List[Dict]:
+        return Check(probes, evaluate, stop='check')
+
+    def check_command_injection(self) -> Check:
         """Check for command injection vulnerabilities"""
-        try:
-            issues = []
-            
-            # Command injection payloads
-            cmd_payloads = [
-                '; ls',
-                '& dir',
-                '| cat /etc/passwd',
-                '`id`'
-            ]
-            
-            for payload in cmd_payloads:
-                try:
-                    response = requests.get(
-                        urljoin(self.target, f'/api/execute?cmd={payload}'),
-                        timeout=5
-                    )
-                    if any(output in response.text for output in ['root:', '/bin/bash', 'uid=']):
-                        issues.append({
-                            'type': 'command_injection',
-                            'description': 'Potential command injection vulnerability',
-                            'details': 'Command execution successful'
-                        })
-                        break
-                except:
-                    continue
-                    
-            return issues
-        except Exception as e:
-            print(f"Command injection check error: {str(e)}")
+        # Command injection payloads
+        cmd_payloads = [
+            '; ls',
+            '& dir',
+            '| cat /etc/passwd',
+            '`id`'
+        ]
+        probes = [
+            Probe('GET', urljoin(self.target, f'/api/execute?cmd={payload}'))
+            for payload in cmd_payloads
+        ]
+
+        command_output = body_contains('root:', '/bin/bash', 'uid=')
+
+        def evaluate(probe: Probe, response) -> List[Dict]:
+            if command_output(probe, response):
+                return [{
+                    'type': 'command_injection',
+                    'description': 'Potential command injection vulnerability',
+                    'details': 'Command execution successful'
+                }]
             return []
 
-    def check_file_upload(self) -> List[Dict]:
+        return Check(probes, evaluate, stop='check')
+
+    def check_file_upload(self) -> Check:
         """Check for insecure file upload vulnerabilities"""
-        try:
-            issues = []
-            
-            # Test file upload
-            test_files = [
-                ('test.php', '<?php echo "test"; ?>', 'application/x-php'),
-                ('test.jsp', '<% out.println("test"); %>', 'application/jsp'),
-                ('test.asp', '<% Response.Write("test") %>', 'application/asp')
-            ]
-            
-            for filename, content, content_type in test_files:
-                try:
-                    files = {'file': (filename, content, content_type)}
-                    response = requests.post(
-                        urljoin(self.target, '/upload'),
-                        files=files,
-                        timeout=5
-                    )
-                    if response.status_code == 200:
-                        issues.append({
-                            'type': 'file_upload',
-                            'description': 'Potential insecure file upload',
-                            'details': f"Uploaded file: {filename}"
-                        })
-                        break
-                except:
-                    continue
-                    
-            return issues
-        except Exception as e:
-            print(f"File upload check error: {str(e)}")
+        # Test file upload
+        test_files = [
+            ('test.php', '<?php echo "test"; ?>', 'application/x-php'),
+            ('test.jsp', '<% out.println("test"); %>', 'application/jsp'),
+            ('test.asp', '<% Response.Write("test") %>', 'application/asp')
+        ]
+        # Upload fields of the forms the crawl found, else the usual endpoint
+        crawled = [
+            (endpoint['url'], field)
+            for endpoint in self.endpoints if endpoint['method'] == 'POST'
+            for field in endpoint['files']
+        ]
+        probes = [
+            Probe(
+                'POST',
+                url,
+                group=url,
+                label=f'{filename} at {url}' if crawled else filename,
+                files={field: (filename, content, content_type)}
+            )
+            for url, field in crawled or [(urljoin(self.target, '/upload'), 'file')]
+            for filename, content, content_type in test_files
+        ]
+
+        def evaluate(probe: Probe, response) -> List[Dict]:
+            if response.status_code == 200:
+                return [{
+                    'type': 'file_upload',
+                    'description': 'Potential insecure file upload',
+                    'details': f"Uploaded file: {probe.label}"
+                }]
             return []
 
-    def check_data_leakage(self) -> List[Dict]:
+        # One accepted upload per form is enough
+        return Check(probes, evaluate, stop='group')
+
+    def check_data_leakage(self) -> Check:
         """Check for sensitive data leakage"""
-        try:
-            issues = []
-            
-            # Check for sensitive files
-            sensitive_paths = [
-                '/.git/config',
-                '/.env',
-                '/config.php',
-                '/backup.zip',
-                '/database.sql'
-            ]
-            
-            for path in sensitive_paths:
-                try:
-                    response = requests.get(
-                        urljoin(self.target, path),
-                        timeout=5
-                    )
-                    if response.status_code == 200:
-                        issues.append({
-                            'type': 'data_leakage',
-                            'description': 'Potential sensitive data leakage',
-                            'details': f"Accessible sensitive file: {path}"
-                        })
-                except:
-                    continue
-                    
-            return issues
-        except Exception as e:
-            print(f"Data leakage check error: {str(e)}")
+        # Check for sensitive files
+        sensitive_paths = [
+            '/.git/config',
+            '/.env',
+            '/config.php',
+            '/backup.zip',
+            '/database.sql'
+        ]
+        probes = [Probe('GET', urljoin(self.target, path), label=path, **STATUS_ONLY) for path in sensitive_paths]
+        found = exists(self.baseline)
+
+        def evaluate(probe: Probe, response) -> List[Dict]:
+            if found(probe, response):
+                return [{
+                    'type': 'data_leakage',
+                    'description': 'Potential sensitive data leakage',
+                    'details': f"Accessible sensitive file: {probe.label}"
+                }]
             return []
 
-    def run(self) -> Dict:
+        return Check(probes, evaluate)
+
+    def checks(self) -> Dict[str, Check]:
+        """All file and data exploit checks keyed by result field"""
+        return {
+            'sql_injection': self.check_sql_injection(),
+            'nosql_injection': self.check_nosql_injection(),
+            'command_injection': self.check_command_injection(),
+            'file_upload': self.check_file_upload(),
+            'data_leakage': self.check_data_leakage()
+        }
+
+    def run(self, scheduler: ThreadScheduler = None) -> Dict:
         """Run all file and data exploit checks"""
-        with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
-            sql_future = executor.submit(self.check_sql_injection)
-            nosql_future = executor.submit(self.check_nosql_injection)
-            cmd_future = executor.submit(self.check_command_injection)
-            upload_future = executor.submit(self.check_file_upload)
-            leakage_future = executor.submit(self.check_data_leakage)
-            
-            self.results['sql_injection'] = sql_future.result()
-            self.results['nosql_injection'] = nosql_future.result()
-            self.results['command_injection'] = cmd_future.result()
-            self.results['file_upload'] = upload_future.result()
-            self.results['data_leakage'] = leakage_future.result()
-            
-        return self.results 
\ No newline at end of file
+        self.results.update(run_checks(self.client, self.checks(), scheduler, workers=5))
+        return self.results
@@ -0,0 +1,226 @@
+import copy
+import hashlib
+import inspect
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set
+
+from requests.structures import CaseInsensitiveDict
+
+from archive import request_key
+from probes import Check, Probe
+
+logger = logging.getLogger('history')
+
+DEFAULT_HISTORY_DIR = os.path.join(
+    os.environ.get('XDG_STATE_HOME') or os.path.join(os.path.expanduser('~'), '.local', 'state'),
+    'vulnhawk', 'history'
+)
+# Longer than the gap between nightly rescans, short enough that every
+# verdict is re-derived from a full answer now and then
+DEFAULT_TTL = 7 * 24 * 60 * 60
+# Methods whose probes are sent as conditional requests
+CONDITIONAL_METHODS = ('GET', 'HEAD')
+
+
+def target_id(target: str) -> str:
+    return hashlib.sha1(target.encode()).hexdigest()[:16]
+
+
+def module_context(module: Any, options: Dict[str, Any]) -> str:
+    """Hash of a module's code and options; verdicts only carry over while it stays the same"""
+    digest = hashlib.sha1(json.dumps(options, sort_keys=True, default=str).encode())
+    try:
+        with open(inspect.getsourcefile(type(module)), 'rb') as f:
+            digest.update(f.read())
+    except (OSError, TypeError):
+        pass
+    return digest.hexdigest()
+
+
+def body_hash(response) -> Optional[str]:
+    """Hash of a body read in full; None for HEAD answers, empty and cut-off bodies"""
+    if response.method == 'HEAD' or response.truncated or not response.content:
+        return None
+    return hashlib.sha1(response.content).hexdigest()
+
+
+class _ReadHeaders(CaseInsensitiveDict):
+    """Response headers that note which names a check looked at"""
+
+    def __init__(self, headers):
+        super().__init__(headers)
+        self.read: Set[str] = set()
+
+    def __getitem__(self, key):
+        self.read.add(key.lower())
+        return super().__getitem__(key)
+
+    def __iter__(self):
+        self.read.update(name.lower() for name in super().__iter__())
+        return super().__iter__()
+
+
+def _evaluate_reading_headers(check: Check, probe: Probe, response):
+    """The check's findings for a response and the headers it read, as {name: value or None}"""
+    watched = copy.copy(response)
+    watched.headers = _ReadHeaders(response.headers)
+    findings = check.evaluate(probe, watched)
+    return findings, {name: response.headers.get(name) for name in sorted(watched.headers.read)}
+
+
+class ScanHistory:
+    """What earlier scans of one target saw, kept across runs for incremental rescans.
+
+    For every GET and HEAD probe the history keeps the answer's ``ETag``
+    and ``Last-Modified``, a hash of its body, the headers the check read
+    and the check's verdict. A rescan sends those probes as conditional
+    requests (``wrap``); a ``304 Not Modified``, or a body with the same
+    hash and the same values of those headers, reuses the verdict instead
+    of evaluating the answer. Probes whose check read headers are sent in
+    full, since a 304 does not repeat them. Verdicts belong to the module's code
+    and options of the scan that made them: when either changes, or the
+    entry is older than ``ttl``, the probe is sent and evaluated in full.
+    Checks that split their probes and ``func`` checks always run in full.
+    Expensive stages keep their result under a fingerprint of what they
+    depend on (``stage``). ``save`` rewrites the file atomically.
+    """
+
+    def __init__(self, path: str, target: str, ttl: float = DEFAULT_TTL):
+        self.path = path
+        self.target = target
+        self.ttl = ttl
+        # Probes answered 304, and probes whose verdict was reused either way
+        self.revalidated = 0
+        self.reused = 0
+        # Stages whose stored result was used
+        self.skipped: List[str] = []
+        self._modules: Dict[str, Dict[str, Any]] = {}
+        self._stages: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            self._load()
+
+    @classmethod
+    def for_target(cls, directory: str, target: str, ttl: float = DEFAULT_TTL) -> 'ScanHistory':
+        """The history of ``target`` in ``directory``"""
+        return cls(os.path.join(directory, f'{target_id(target)}.json'), target, ttl)
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable history {self.path}: {e}")
+            return
+        if data.get('target') != self.target:
+            logger.warning(f"History {self.path} belongs to another target, starting over")
+            return
+        self._modules = data.get('modules', {})
+        self._stages = data.get('stages', {})
+
+    def _fresh(self, entry: Optional[Dict[str, Any]]) -> bool:
+        # Entries from before headers were kept cannot tell a header change
+        return entry is not None and 'headers' in entry and time.time() - entry['at'] < self.ttl
+
+    def wrap(self, module: str, name: str, check: Check, context: str) -> Check:
+        """The check with conditional probes that reuse earlier verdicts on unchanged answers"""
+        with self._lock:
+            stored = self._modules.get(module)
+            if stored is None or stored['context'] != context:
+                stored = self._modules[module] = {'context': context, 'checks': {}}
+            entries = stored['checks'].setdefault(name, {})
+        if check.func is not None or check.split is not None:
+            return check
+        origin = {}
+
+        def conditional(probe: Probe) -> Probe:
+            key = request_key(probe.method, probe.url, probe.kwargs)
+            entry = entries.get(key)
+            kwargs = probe.kwargs
+            if not self._fresh(entry):
+                entry = None
+            elif (probe.method.upper() in CONDITIONAL_METHODS and not entry['headers']
+                  and (entry['etag'] or entry['last_modified'])):
+                headers = dict(kwargs.get('headers') or {})
+                if entry['etag']:
+                    headers['If-None-Match'] = entry['etag']
+                if entry['last_modified']:
+                    headers['If-Modified-Since'] = entry['last_modified']
+                kwargs = {**kwargs, 'headers': headers}
+            wrapped = Probe(probe.method, probe.url, group=probe.group, label=probe.label, **kwargs)
+            origin[id(wrapped)] = (probe, key, entry)
+            return wrapped
+
+        def evaluate(probe: Probe, response) -> List:
+            original, key, entry = origin[id(probe)]
+            digest = body_hash(response)
+            if entry is not None:
+                not_modified = response.status_code == 304
+                unchanged = (digest is not None and digest == entry['hash'] and response.status_code == entry['status']
+                             and all(response.headers.get(name) == value for name, value in entry['headers'].items()))
+                if not_modified or unchanged:
+                    with self._lock:
+                        self.revalidated += not_modified
+                        self.reused += 1
+                    return list(entry['findings'])
+            findings, headers = _evaluate_reading_headers(check, original, response)
+            if original.method.upper() in CONDITIONAL_METHODS and response.status_code != 304:
+                with self._lock:
+                    entries[key] = {
+                        'at': time.time(),
+                        'status': response.status_code,
+                        'etag': response.headers.get('ETag'),
+                        'last_modified': response.headers.get('Last-Modified'),
+                        'hash': digest,
+                        'headers': headers,
+                        'findings': findings
+                    }
+            return findings
+
+        return Check([conditional(probe) for probe in check.probes], evaluate, stop=check.stop)
+
+    def stage(self, name: str, fingerprint: Any) -> Optional[Any]:
+        """Stored result of a stage run within the TTL on the same fingerprint, else None"""
+        with self._lock:
+            entry = self._stages.get(name)
+            if not self._fresh(entry) or entry['fingerprint'] != json.loads(json.dumps(fingerprint)):
+                return None
+            self.skipped.append(name)
+        logger.info(f"Reusing the {name} of {self.target} from {time.ctime(entry['at'])}, nothing it depends on changed")
+        return entry['result']
+
+    def store_stage(self, name: str, fingerprint: Any, result: Any):
+        with self._lock:
+            self._stages[name] = {'at': time.time(), 'fingerprint': fingerprint, 'result': result}
+
+    def stats(self) -> Dict[str, Any]:
+        return {'revalidated': self.revalidated, 'reused': self.reused, 'skipped': list(self.skipped)}
+
+    def save(self):
+        """Write the history, dropping entries older than the TTL"""
+        with self._lock:
+            modules = {
+                module: {
+                    'context': stored['context'],
+                    'checks': {
+                        name: {key: entry for key, entry in entries.items() if self._fresh(entry)}
+                        for name, entries in stored['checks'].items()
+                    }
+                }
+                for module, stored in self._modules.items()
+            }
+            stages = {name: entry for name, entry in self._stages.items() if self._fresh(entry)}
+            data = json.dumps({'target': self.target, 'modules': modules, 'stages': stages}, default=str)
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.path)), suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                f.write(data)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            logger.warning(f"Could not save history {self.path}: {e}")
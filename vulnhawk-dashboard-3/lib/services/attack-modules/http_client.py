@@ -0,0 +1,283 @@
+import copy
+import json
+import logging
+import time
+from http import cookiejar
+from typing import Any, Callable, Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+from archive import ArchiveReader, ArchiveWriter, request_key
+from deadline import Deadline
+from rate_limiter import HostRateLimiter
+from response_cache import ResponseCache
+
+logger = logging.getLogger('http_client')
+
+DEFAULT_TIMEOUT = 5
+DEFAULT_POOL_SIZE = 10
+# Bodies beyond this are cut off and the connection dropped
+DEFAULT_MAX_BODY = 1024 * 1024
+READ_CHUNK_SIZE = 64 * 1024
+# HEAD answers that say nothing about the GET, so the GET is sent after all
+HEAD_FALLBACK_STATUSES = (400, 405, 501)
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+}
+
+
+class HttpResponse:
+    """Transport-independent response handed to check evaluators.
+
+    Mirrors the parts of ``requests.Response`` the checks use so the same
+    evaluation code works for the threaded and the asyncio engines.
+    ``truncated`` is set when the body was cut off at the byte cap and
+    ``method`` is the method of the request that got the answer.
+    ``elapsed`` is the time on the wire, from sending the request to the
+    last byte read, and ``wait`` the time spent waiting for the rate
+    limiter before it; ``cached`` marks an answer shared from the response
+    cache rather than sent for this request.
+    """
+
+    def __init__(self, status_code: int, headers, content: bytes, url: str,
+                 encoding: Optional[str] = None, elapsed: float = 0.0,
+                 truncated: bool = False, method: Optional[str] = None,
+                 wait: float = 0.0, cached: bool = False):
+        self.status_code = status_code
+        self.headers = CaseInsensitiveDict(headers)
+        self.content = content
+        self.url = url
+        self.encoding = encoding
+        self.elapsed = elapsed
+        self.truncated = truncated
+        self.method = method
+        self.wait = wait
+        self.cached = cached
+        self._text = None
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            try:
+                self._text = self.content.decode(self.encoding or 'utf-8', errors='replace')
+            except LookupError:
+                self._text = self.content.decode('utf-8', errors='replace')
+        return self._text
+
+    def json(self) -> Any:
+        return json.loads(self.content)
+
+    def cache_hit(self) -> 'HttpResponse':
+        """The answer as handed to a request that found it in the response cache"""
+        hit = copy.copy(self)
+        hit.wait = 0.0
+        hit.cached = True
+        return hit
+
+    @classmethod
+    def from_requests(cls, response: requests.Response, max_body: Optional[int] = None) -> 'HttpResponse':
+        """Convert a streamed ``requests`` response, reading at most ``max_body`` bytes"""
+        if max_body is None:
+            content = response.content
+        else:
+            chunks, size = [], 0
+            # Reading one byte past the cap tells a cut-off body from one that fits
+            for chunk in response.iter_content(min(READ_CHUNK_SIZE, max_body + 1)):
+                chunks.append(chunk)
+                size += len(chunk)
+                if size > max_body:
+                    break
+            content = b''.join(chunks)
+        truncated = max_body is not None and len(content) > max_body
+        if truncated:
+            # Drops the connection instead of draining the rest of the body
+            response.close()
+        return cls(
+            response.status_code,
+            response.headers,
+            content[:max_body] if truncated else content,
+            response.url,
+            encoding=response.encoding,
+            elapsed=response.elapsed.total_seconds(),
+            truncated=truncated,
+            method=response.request.method
+        )
+
+
+class _RejectCookies(cookiejar.DefaultCookiePolicy):
+    """Cookie policy that never stores cookies set by the target"""
+
+    def set_ok(self, cookie, request):
+        return False
+
+
+class HttpClient:
+    """Pooled HTTP client shared by every attack module in a run.
+
+    One ``requests.Session`` backs all probes, so connections (and the TLS
+    sessions on them) are kept alive and reused per host instead of being
+    re-established for every request. ``pool_maxsize`` is also the per-host
+    connection cap: with ``pool_block`` set, callers wait for a free
+    connection rather than opening extra ones against the same host.
+    When a ``ResponseCache`` is attached, identical safe requests made
+    during the run share one round-trip. When a ``HostRateLimiter`` is
+    attached, every request that actually goes out is paced per host and
+    its outcome fed back to the limiter. Bodies are streamed and cut off at
+    ``max_body`` bytes (per request via the ``max_body`` argument, ``None``
+    for no cap), so a huge download cannot fill a worker's memory.
+    Functions added with ``observe`` are told about every request that
+    actually goes out, from either engine.
+    With a ``recorder`` every exchange is also written to an HTTP archive;
+    with ``replay`` nothing goes out at all and every request is answered
+    from an archive recorded earlier, so a scan can be re-run offline.
+    """
+
+    def __init__(self, timeout: float = DEFAULT_TIMEOUT,
+                 headers: Optional[Dict[str, str]] = None,
+                 pool_connections: int = DEFAULT_POOL_SIZE,
+                 pool_maxsize: int = DEFAULT_POOL_SIZE,
+                 pool_block: bool = True,
+                 verify: bool = True,
+                 cache: Optional[ResponseCache] = None,
+                 limiter: Optional[HostRateLimiter] = None,
+                 max_body: Optional[int] = DEFAULT_MAX_BODY,
+                 recorder: Optional[ArchiveWriter] = None,
+                 replay: Optional[ArchiveReader] = None):
+        self.timeout = timeout
+        self.max_body = max_body
+        self.recorder = recorder
+        self.replay = replay
+        self.cache = cache
+        self.limiter = limiter
+        self.observers: List[Callable[[str, str, Optional[int], float], None]] = []
+        self.pool_maxsize = pool_maxsize
+        self.session = requests.Session()
+        self.session.headers.update(DEFAULT_HEADERS)
+        if headers:
+            self.session.headers.update(headers)
+        self.session.verify = verify
+        # Probes must not leak state into each other through the shared session
+        self.session.cookies.set_policy(_RejectCookies())
+
+        adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            pool_block=pool_block
+        )
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def request(self, method: str, url: str, head_first: bool = False,
+                deadline: Optional[Deadline] = None, **kwargs) -> HttpResponse:
+        """Send a request through the shared session.
+
+        With ``head_first`` a GET is tried as a HEAD request first, and only
+        sent when the HEAD answer is unusable; use it for checks that only
+        look at the status and headers. With a ``deadline`` the timeout is
+        cut down to the time left, and ``DeadlineExceeded`` is raised when
+        none is.
+        """
+        if head_first and method.upper() == 'GET':
+            response = self.request('HEAD', url, deadline=deadline, **kwargs)
+            if response.status_code not in HEAD_FALLBACK_STATUSES:
+                return response
+        kwargs.setdefault('timeout', self.timeout)
+        if self.cache is not None and self.cache.cacheable(method, **kwargs):
+            key = self.cache.key(method, url, **kwargs)
+            sent = []
+
+            def send() -> HttpResponse:
+                sent.append(True)
+                return self._send(method, url, deadline, **kwargs)
+
+            response = self.cache.fetch(key, send)
+            return response if sent else response.cache_hit()
+        return self._send(method, url, deadline, **kwargs)
+
+    def _send(self, method: str, url: str, deadline: Optional[Deadline] = None, **kwargs) -> HttpResponse:
+        if self.replay is not None:
+            return self.replayed(method, url, kwargs)
+        key = request_key(method, url, kwargs) if self.recorder is not None else None
+        max_body = kwargs.pop('max_body', self.max_body)
+        kwargs['stream'] = max_body is not None
+        started = time.monotonic()
+        if self.limiter is not None:
+            self.limiter.acquire(url)
+        if deadline is not None:
+            # Taken after any rate limit wait, which also uses up the budget
+            kwargs['timeout'] = deadline.budget(kwargs.get('timeout'))
+        wait, started = time.monotonic() - started, time.monotonic()
+        try:
+            response = HttpResponse.from_requests(self.session.request(method, url, **kwargs), max_body)
+        except requests.RequestException as e:
+            self.record(method, url, None, time.monotonic() - started)
+            if key is not None:
+                self.recorder.add(key, method, url, error=e)
+            raise
+        # Up to the last byte read, not just the headers as requests counts it
+        response.elapsed = time.monotonic() - started
+        response.wait = wait
+        self.record(method, url, response.status_code, response.elapsed, response.headers.get('Retry-After'))
+        if key is not None:
+            self.recorder.add(key, method, url, response)
+        return response
+
+    def replayed(self, method: str, url: str, kwargs: Dict[str, Any]) -> HttpResponse:
+        """Answer a request from the replay archive, cut to this client's byte cap; requests it does not hold fail"""
+        started = time.monotonic()
+        meta, body = self.replay.get(request_key(method, url, kwargs))
+        if meta is None or 'error' in meta:
+            for observer in self.observers:
+                observer(method, url, None, time.monotonic() - started)
+            raise requests.ConnectionError(meta['error'] if meta else f'{method} {url} is not in the archive')
+        max_body = kwargs.get('max_body', self.max_body)
+        truncated = max_body is not None and len(body) > max_body
+        response = HttpResponse(
+            meta['status'],
+            meta['headers'],
+            body[:max_body] if truncated else body,
+            meta['url'],
+            encoding=meta['encoding'],
+            elapsed=meta['elapsed'],
+            truncated=meta['truncated'] or truncated,
+            method=meta['method']
+        )
+        for observer in self.observers:
+            observer(method, url, response.status_code, time.monotonic() - started)
+        return response
+
+    def observe(self, observer: Callable[[str, str, Optional[int], float], None]):
+        """Call ``observer(method, url, status, elapsed)`` after every request sent"""
+        self.observers.append(observer)
+
+    def record(self, method: str, url: str, status: Optional[int], elapsed: float,
+               retry_after: Optional[str] = None):
+        """Report a finished request (status None if it failed) to the limiter and observers"""
+        if self.limiter is not None:
+            self.limiter.feedback(url, status, elapsed, retry_after)
+        for observer in self.observers:
+            observer(method, url, status, elapsed)
+
+    def get(self, url: str, **kwargs) -> HttpResponse:
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> HttpResponse:
+        return self.request('POST', url, **kwargs)
+
+    def head(self, url: str, **kwargs) -> HttpResponse:
+        return self.request('HEAD', url, **kwargs)
+
+    def close(self):
+        """Close every pooled connection and any archive in use"""
+        self.session.close()
+        for archive in (self.recorder, self.replay):
+            if archive is not None:
+                archive.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,119 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger('journal')
+
+DEFAULT_JOURNAL_DIR = os.path.join(
+    os.environ.get('XDG_STATE_HOME') or os.path.join(os.path.expanduser('~'), '.local', 'state'),
+    'vulnhawk', 'journal'
+)
+# Writes reach the OS at once (a crashed process loses nothing); fsync,
+# which a host crash needs, runs at most this often
+DEFAULT_SYNC_INTERVAL = 1.0
+
+
+def scan_id(target: str, modules: List[str]) -> str:
+    """Stable id of a scan, so running the same scan again finds its journal"""
+    return hashlib.sha1(json.dumps([target, sorted(modules)]).encode()).hexdigest()[:16]
+
+
+class ScanJournal:
+    """Append-only JSONL record of the probes a scan has completed.
+
+    Every probe whose response was evaluated is written as one line with
+    its module, check, index and findings; a check's ``func`` is written
+    once it returns. With ``resume`` an existing journal is read back
+    first and its entries are replayed by the engines in the order they
+    were written, so findings and stop policies come out as before and the
+    probes are not sent again. Failed and skipped probes are never
+    journaled and run again on resume. A line torn by a crash is ignored.
+    """
+
+    def __init__(self, path: str, target: str, modules: List[str], resume: bool = False,
+                 sync_interval: float = DEFAULT_SYNC_INTERVAL):
+        self.path = path
+        self.sync_interval = sync_interval
+        self.replayed = 0
+        self._entries: Dict[Tuple[str, str], List[Dict[str, Any]]] = defaultdict(list)
+        self._lock = threading.Lock()
+        self._synced = time.monotonic()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        resumed = resume and os.path.exists(path) and self._load(target, modules)
+        self._file = open(path, 'a' if resumed else 'w')
+        if not resumed:
+            self._write({'target': target, 'modules': modules, 'started': time.time()})
+
+    @classmethod
+    def for_scan(cls, directory: str, target: str, modules: List[str], resume: bool = False) -> 'ScanJournal':
+        """The journal of this target and module list in ``directory``"""
+        return cls(os.path.join(directory, f'{scan_id(target, modules)}.jsonl'), target, modules, resume)
+
+    def _load(self, target: str, modules: List[str]) -> bool:
+        """Read the entries of an earlier run of this scan; False if the file is another scan's"""
+        with open(self.path) as f:
+            lines = f.read().splitlines()
+        try:
+            header = json.loads(lines[0]) if lines else {}
+        except ValueError:
+            header = {}
+        if header.get('target') != target or sorted(header.get('modules') or []) != sorted(modules):
+            logger.warning(f"Journal {self.path} belongs to another scan, starting over")
+            return False
+        for line in lines[1:]:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                logger.warning(f"Ignoring torn journal line in {self.path}")
+                continue
+            self._entries[(entry['module'], entry['check'])].append(entry)
+            self.replayed += 1
+        logger.info(f"Resuming from {self.path}: {self.replayed} entries")
+        return True
+
+    def for_check(self, module: str, check: str) -> 'CheckJournal':
+        return CheckJournal(self, module, check, self._entries.pop((module, check), []))
+
+    def _write(self, entry: Dict[str, Any]):
+        line = json.dumps(entry, default=str) + '\n'
+        with self._lock:
+            if self._file.closed:
+                # An abandoned func finishing after its scan
+                return
+            self._file.write(line)
+            self._file.flush()
+            if time.monotonic() - self._synced >= self.sync_interval:
+                os.fsync(self._file.fileno())
+                self._synced = time.monotonic()
+
+    def record(self, module: str, check: str, index: Optional[int], probe: Optional[str], findings: List):
+        self._write({'module': module, 'check': check, 'index': index, 'probe': probe, 'findings': findings})
+
+    def close(self):
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+
+
+class CheckJournal:
+    """``ScanJournal`` bound to one check, holding the entries to replay for it"""
+
+    def __init__(self, journal: ScanJournal, module: str, check: str, entries: List[Dict[str, Any]]):
+        self.journal = journal
+        self.module = module
+        self.check = check
+        self.entries = entries
+
+    def probe(self, index: int, probe, findings: List):
+        self.journal.record(self.module, self.check, index, f'{probe.method} {probe.url}', findings)
+
+    def func(self, findings: List):
+        self.journal.record(self.module, self.check, None, None, findings)
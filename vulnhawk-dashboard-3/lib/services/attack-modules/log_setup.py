@@ -0,0 +1,79 @@
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+from typing import Dict, Iterable, Optional, TextIO, Tuple
+
+DEFAULT_LEVEL = 'DEBUG'
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+# Level spec read when no --log-level is given, e.g. 'INFO,http_client=WARNING'
+LEVEL_ENV = 'VULNHAWK_LOG_LEVEL'
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def parse_levels(specs: Iterable[str]) -> Tuple[Optional[str], Dict[str, str]]:
+    """Split level specs into the default level and per-logger levels.
+
+    Each spec is a comma-separated list of ``LEVEL`` (the default for
+    every logger) and ``name=LEVEL`` (one logger, e.g. ``probes=ERROR``).
+    Raises ValueError for unknown levels.
+    """
+    default, levels = None, {}
+    for spec in specs:
+        for item in filter(None, (part.strip() for part in spec.split(','))):
+            name, _, level = item.rpartition('=')
+            level = level.strip().upper()
+            if not isinstance(logging.getLevelName(level), int):
+                raise ValueError(f'Unknown log level: {level}')
+            if name:
+                levels[name.strip()] = level
+            else:
+                default = level
+    return default, levels
+
+
+def log_level(spec: str) -> str:
+    """argparse type for level specs"""
+    parse_levels([spec])
+    return spec
+
+
+def setup_logging(specs: Iterable[str] = (), stream: Optional[TextIO] = None) -> logging.Logger:
+    """Send every log record through a queue to one background writer.
+
+    Callers only put the record on a queue; formatting and the write to
+    ``stream`` (stderr by default) happen on the listener's thread, so
+    logging at high probe rates does not stall the scan. ``specs`` set the
+    levels as in ``parse_levels``, falling back to ``$VULNHAWK_LOG_LEVEL``
+    and then DEBUG. Calling it again replaces the previous setup.
+    """
+    global _listener
+    specs = list(specs) or [os.environ.get(LEVEL_ENV, '')]
+    default, levels = parse_levels(specs)
+
+    if _listener is not None:
+        _listener.stop()
+    handler = logging.StreamHandler(stream or sys.stderr)
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    records = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(records, handler)
+    _listener.start()
+
+    root = logging.getLogger()
+    for old in list(root.handlers):
+        root.removeHandler(old)
+    root.addHandler(logging.handlers.QueueHandler(records))
+    root.setLevel(default or DEFAULT_LEVEL)
+    for name, level in levels.items():
+        logging.getLogger(name).setLevel(level)
+    return root
+
+
+@atexit.register
+def _flush():
+    """Write out records still queued when the interpreter exits"""
+    if _listener is not None:
+        _listener.stop()
@@ -0,0 +1,246 @@
+import bisect
+import logging
+import math
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urlparse
+
+logger = logging.getLogger('metrics')
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus style"""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """Estimate by linear interpolation within the bucket, as histogram_quantile does, capped at the max"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                lower = self.buckets[index - 1] if index else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else self.max
+                return min(self.max, lower + (upper - lower) * (rank - seen) / count)
+            seen += count
+        return self.max
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        """``(le, count)`` pairs for the exposition format, ending with +Inf"""
+        pairs, total = [], 0
+        for bound, count in zip(self.buckets + (math.inf,), self.counts):
+            total += count
+            pairs.append(('+Inf' if bound == math.inf else repr(bound), total))
+        return pairs
+
+    def snapshot(self, digits: int = 4) -> Dict[str, float]:
+        return {
+            'count': self.count,
+            'sum': round(self.sum, digits),
+            'max': round(self.max, digits),
+            'p50': round(self.quantile(0.5), digits),
+            'p99': round(self.quantile(0.99), digits)
+        }
+
+
+class _Series:
+    """Counters and histograms for one label set (a check, a module or a host)"""
+
+    def __init__(self):
+        self.statuses: Counter = Counter()
+        self.retries = 0
+        self.skipped = 0
+        self.cache_hits = 0
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.wait = Histogram(LATENCY_BUCKETS)
+        self.size = Histogram(SIZE_BUCKETS)
+
+    def probe(self, status: Optional[int], latency: Optional[float], size: int, retries: int,
+              wait: float = 0.0, cached: bool = False):
+        self.statuses['error' if status is None else str(status)] += 1
+        self.retries += retries
+        if cached:
+            self.cache_hits += 1
+            return
+        if latency is not None:
+            self.latency.observe(latency)
+            self.wait.observe(wait)
+        if status is not None:
+            self.size.observe(size)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'probes': sum(self.statuses.values()),
+            'statuses': dict(self.statuses),
+            'errors': self.statuses.get('error', 0),
+            'retries': self.retries,
+            'skipped': self.skipped,
+            'cache_hits': self.cache_hits,
+            'bytes': int(self.size.sum),
+            'latency': self.latency.snapshot(),
+            'rate_limit_wait': self.wait.snapshot()
+        }
+
+
+class ScanMetrics:
+    """Per-probe measurements rolled up per check, per module and per host.
+
+    Engines report every probe with ``probe`` (through the ``CheckMetrics``
+    handed to each check) and work a deadline cut off with ``skip``.
+    Latency is the time on the wire only; the time a request waited for
+    the rate limiter is kept apart, and answers shared from the response
+    cache are counted as cache hits instead of being timed. A run's
+    metrics can forward everything to a ``parent``, so a daemon or batch
+    keeps process-wide totals for Prometheus while each scan still gets
+    its own ``_metrics`` section.
+    """
+
+    def __init__(self, parent: Optional['ScanMetrics'] = None):
+        self.parent = parent
+        self._checks: Dict[Tuple[str, str], _Series] = {}
+        self._modules: Dict[str, _Series] = {}
+        self._hosts: Dict[str, _Series] = {}
+        self._lock = threading.Lock()
+
+    def for_check(self, module: str, check: str) -> 'CheckMetrics':
+        return CheckMetrics(self, module, check)
+
+    def probe(self, module: str, check: str, host: str, status: Optional[int], latency: Optional[float],
+              size: int = 0, retries: int = 0, wait: float = 0.0, cached: bool = False):
+        with self._lock:
+            for series in (self._series(self._checks, (module, check)), self._series(self._modules, module),
+                           self._series(self._hosts, host)):
+                series.probe(status, latency, size, retries, wait, cached)
+        if self.parent is not None:
+            self.parent.probe(module, check, host, status, latency, size, retries, wait, cached)
+
+    def skip(self, module: str, check: str, host: Optional[str] = None):
+        with self._lock:
+            self._series(self._checks, (module, check)).skipped += 1
+            self._series(self._modules, module).skipped += 1
+            if host is not None:
+                self._series(self._hosts, host).skipped += 1
+        if self.parent is not None:
+            self.parent.skip(module, check, host)
+
+    @staticmethod
+    def _series(table: Dict, key) -> _Series:
+        series = table.get(key)
+        if series is None:
+            series = table[key] = _Series()
+        return series
+
+    def snapshot(self) -> Dict[str, Any]:
+        """The ``_metrics`` section of a result: totals per module (with their checks) and per host"""
+        with self._lock:
+            modules = {module: {**series.snapshot(), 'checks': {}} for module, series in self._modules.items()}
+            for (module, check), series in self._checks.items():
+                modules[module]['checks'][check] = series.snapshot()
+            hosts = {host: series.snapshot() for host, series in self._hosts.items()}
+        return {'modules': modules, 'hosts': hosts}
+
+    def prometheus(self) -> str:
+        """Counters and histograms per check and per host in the text exposition format"""
+        lines: List[str] = []
+        with self._lock:
+            for scope, table, names in (('check', self._checks, ('module', 'check')), ('host', self._hosts, ('host',))):
+                series = [(dict(zip(names, key if isinstance(key, tuple) else (key,))), value)
+                          for key, value in sorted(table.items())]
+                _counter(lines, f'vulnhawk_{scope}_probes_total', f'Probes sent, per {scope} and status', [
+                    ({**labels, 'status': status}, count)
+                    for labels, value in series for status, count in sorted(value.statuses.items())
+                ])
+                _counter(lines, f'vulnhawk_{scope}_retries_total', f'Extra requests sent for probes, per {scope}',
+                         [(labels, value.retries) for labels, value in series])
+                _counter(lines, f'vulnhawk_{scope}_skipped_total', f'Probes skipped at a deadline, per {scope}',
+                         [(labels, value.skipped) for labels, value in series])
+                _counter(lines, f'vulnhawk_{scope}_cache_hits_total', f'Probes answered from the response cache, '
+                         f'per {scope}', [(labels, value.cache_hits) for labels, value in series])
+                _histogram(lines, f'vulnhawk_{scope}_probe_seconds', f'Probe latency on the wire, per {scope}',
+                           [(labels, value.latency) for labels, value in series])
+                _histogram(lines, f'vulnhawk_{scope}_rate_limit_wait_seconds',
+                           f'Time probes waited for the rate limiter, per {scope}',
+                           [(labels, value.wait) for labels, value in series])
+                _histogram(lines, f'vulnhawk_{scope}_response_bytes', f'Response body size, per {scope}',
+                           [(labels, value.size) for labels, value in series])
+        return '\n'.join(lines) + '\n'
+
+
+class CheckMetrics:
+    """``ScanMetrics`` bound to one check of one module"""
+
+    def __init__(self, metrics: ScanMetrics, module: str, check: str):
+        self.metrics = metrics
+        self.module = module
+        self.check = check
+
+    def probe(self, url: str, status: Optional[int], latency: Optional[float], size: int = 0, retries: int = 0,
+              wait: float = 0.0, cached: bool = False):
+        self.metrics.probe(self.module, self.check, urlparse(url).netloc, status, latency, size, retries,
+                           wait, cached)
+
+    def skip(self, url: Optional[str] = None):
+        self.metrics.skip(self.module, self.check, urlparse(url).netloc if url else None)
+
+
+def _labels(labels: Dict[str, Any], **extra: Any) -> str:
+    pairs = {**labels, **extra}
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for value in pairs.values())
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(pairs, escaped)) + '}'
+
+
+def _counter(lines: List[str], name: str, help_text: str, samples: List[Tuple[Dict[str, Any], float]]):
+    lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+    lines += [f'{name}{_labels(labels)} {value}' for labels, value in samples]
+
+
+def _histogram(lines: List[str], name: str, help_text: str, samples: List[Tuple[Dict[str, Any], Histogram]]):
+    lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+    for labels, histogram in samples:
+        lines += [f'{name}_bucket{_labels(labels, le=le)} {count}' for le, count in histogram.cumulative()]
+        lines.append(f'{name}_sum{_labels(labels)} {histogram.sum}')
+        lines.append(f'{name}_count{_labels(labels)} {histogram.count}')
+
+
+def serve_metrics(metrics: ScanMetrics, port: int, host: str = '127.0.0.1') -> ThreadingHTTPServer:
+    """Serve ``metrics`` as Prometheus text on ``/metrics`` from a daemon thread"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?', 1)[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = metrics.prometheus().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', PROMETHEUS_CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            logger.debug(f"Metrics request: {format % args}")
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics', daemon=True).start()
+    logger.info(f"Serving Prometheus metrics on http://{host}:{server.server_address[1]}/metrics")
+    return server
@@ -0,0 +1,315 @@
+import asyncio
+import concurrent.futures
+import json
+import logging
+import math
+import multiprocessing
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: saves still merge, without excluding each other
+    fcntl = None
+
+logger = logging.getLogger('port_scan')
+
+# nmap's top 100 TCP ports, i.e. what `nmap -F` scans
+TOP_100_PORTS = (
+    7, 9, 13, 21, 22, 23, 25, 26, 37, 53, 79, 80, 81, 88, 106, 110, 111, 113, 119, 135,
+    139, 143, 144, 179, 199, 389, 427, 443, 444, 445, 465, 513, 514, 515, 543, 544, 548,
+    554, 587, 631, 646, 873, 990, 993, 995, 1025, 1026, 1027, 1028, 1029, 1110, 1433,
+    1720, 1723, 1755, 1900, 2000, 2001, 2049, 2121, 2717, 3000, 3128, 3306, 3389, 3986,
+    4899, 5000, 5009, 5051, 5060, 5101, 5190, 5357, 5432, 5631, 5666, 5800, 5900, 6000,
+    6001, 6646, 7070, 8000, 8008, 8009, 8080, 8081, 8443, 8888, 9100, 9999, 10000, 32768,
+    49152, 49153, 49154, 49155, 49156, 49157
+)
+SCANNERS = ('auto', 'nmap', 'connect')
+# Bounds of the nmap shard size, which otherwise spreads the ports evenly over the workers
+MIN_SHARD_SIZE = 8
+MAX_SHARD_SIZE = 1024
+CONNECT_SHARD_SIZE = 1024
+DEFAULT_CACHE_TTL = 15 * 60
+DEFAULT_CACHE_PATH = os.path.join(
+    os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'),
+    'vulnhawk', 'port_scan.json'
+)
+DEFAULT_CONNECT_CONCURRENCY = 500
+DEFAULT_CONNECT_TIMEOUT = 1.0
+
+
+def parse_ports(spec: str) -> List[int]:
+    """Port list from 'top100', 'all' or nmap-style '22,80,8000-8100'"""
+    spec = spec.strip().lower()
+    if spec in ('top100', 'fast'):
+        return list(TOP_100_PORTS)
+    if spec == 'all':
+        return list(range(1, 65536))
+    ports = set()
+    for part in spec.split(','):
+        start, _, end = part.strip().partition('-')
+        first, last = int(start), int(end or start)
+        if not 1 <= first <= last <= 65535:
+            raise ValueError(f'Invalid port range: {part}')
+        ports.update(range(first, last + 1))
+    return sorted(ports)
+
+
+def _ranges(ports: Sequence[int]) -> str:
+    """Compact nmap -p argument for a sorted port list"""
+    parts = []
+    start = prev = ports[0]
+    for port in list(ports[1:]) + [None]:
+        if port is not None and port == prev + 1:
+            prev = port
+            continue
+        parts.append(str(start) if start == prev else f'{start}-{prev}')
+        if port is not None:
+            start = prev = port
+    return ','.join(parts)
+
+
+def shard(ports: Sequence[int], size: int) -> List[List[int]]:
+    return [list(ports[i:i + size]) for i in range(0, len(ports), size)]
+
+
+def shard_size(port_count: int, workers: int) -> int:
+    """Ports per shard that keep every worker busy, and small shards reporting early on large scans"""
+    return max(MIN_SHARD_SIZE, min(MAX_SHARD_SIZE, math.ceil(port_count / workers)))
+
+
+class PortCache:
+    """Per-host scan results kept for ``ttl`` seconds, optionally on disk.
+
+    Every scanned port is stored with its state and the time it was seen,
+    closed ports included, so a later scan of an overlapping range only
+    probes the ports that are missing or stale. The addresses the host
+    resolved to are kept too: once it resolves elsewhere, everything cached
+    for it is stale. With a ``path`` the cache survives across processes
+    (each CLI scan is its own process). ``save`` merges with what other
+    processes saved meanwhile under a file lock, keeping the newer entry
+    per port, and writes a temporary file that replaces the cache
+    atomically.
+    """
+
+    def __init__(self, ttl: float = DEFAULT_CACHE_TTL, path: Optional[str] = None):
+        self.ttl = ttl
+        self.path = path
+        self._hosts: Dict[str, Dict[str, List]] = {}
+        self._addresses: Dict[str, List[str]] = {}
+        self._lock = threading.Lock()
+        if path:
+            self._hosts, self._addresses = self._read(path)
+
+    @staticmethod
+    def _read(path: str) -> Tuple[Dict[str, Dict[str, List]], Dict[str, List[str]]]:
+        if not os.path.exists(path):
+            return {}, {}
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable port cache {path}: {e}")
+            return {}, {}
+        # Caches written before addresses were kept hold the hosts alone
+        return (data['hosts'] if 'hosts' in data else data), data.get('addresses', {})
+
+    def lookup(self, host: str, ports: Iterable[int],
+               addresses: Optional[List[str]] = None) -> Tuple[List[Dict], List[int]]:
+        """Split ports into fresh cached open-port results and ports still to scan"""
+        cutoff = time.time() - self.ttl
+        found, missing = [], []
+        with self._lock:
+            moved = addresses is not None and self._addresses.get(host, addresses) != addresses
+            entries = {} if moved else self._hosts.get(host, {})
+            for port in ports:
+                entry = entries.get(str(port))
+                if entry is None or entry[0] < cutoff:
+                    missing.append(port)
+                elif entry[1] == 'open':
+                    found.append({'port': port, 'service': entry[2], 'state': 'open'})
+        return found, missing
+
+    def store(self, host: str, scanned: Iterable[int], open_ports: List[Dict],
+              addresses: Optional[List[str]] = None):
+        """Record a finished shard: listed ports are open, the rest closed"""
+        now = time.time()
+        by_port = {result['port']: result for result in open_ports}
+        with self._lock:
+            if addresses is not None and self._addresses.get(host) != addresses:
+                self._addresses[host] = addresses
+                self._hosts.pop(host, None)
+            entries = self._hosts.setdefault(host, {})
+            for port in scanned:
+                result = by_port.get(port)
+                entries[str(port)] = [now, 'open', result['service']] if result else [now, 'closed', None]
+
+    def save(self):
+        if not self.path:
+            return
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            ours = {host: dict(entries) for host, entries in self._hosts.items()}
+            our_addresses = dict(self._addresses)
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(f'{self.path}.lock', 'a') as lock:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_EX)
+                hosts, addresses = self._read(self.path)
+                for host, entries in ours.items():
+                    if host in our_addresses and addresses.get(host, our_addresses[host]) != our_addresses[host]:
+                        # The host moved since that scan; only this scan's entries still apply
+                        hosts[host] = entries
+                    else:
+                        merged = hosts.setdefault(host, {})
+                        for port, entry in entries.items():
+                            if port not in merged or merged[port][0] <= entry[0]:
+                                merged[port] = entry
+                    if host in our_addresses:
+                        addresses[host] = our_addresses[host]
+                hosts = {
+                    host: {port: entry for port, entry in entries.items() if entry[0] >= cutoff}
+                    for host, entries in hosts.items()
+                }
+                hosts = {host: entries for host, entries in hosts.items() if entries}
+                addresses = {host: addresses[host] for host in hosts if host in addresses}
+                fd, tmp = tempfile.mkstemp(dir=os.path.dirname(self.path), suffix='.tmp')
+                with os.fdopen(fd, 'w') as f:
+                    json.dump({'hosts': hosts, 'addresses': addresses}, f)
+                os.replace(tmp, self.path)
+        except OSError as e:
+            logger.warning(f"Could not save port cache {self.path}: {e}")
+
+
+def resolve(host: str) -> Optional[List[str]]:
+    """Sorted addresses ``host`` resolves to; None if it does not resolve"""
+    try:
+        return sorted({info[4][0] for info in socket.getaddrinfo(host, None, proto=socket.IPPROTO_TCP)})
+    except OSError:
+        return None
+
+
+def _nmap_shard(host: str, ports: List[int], arguments: str) -> List[Dict]:
+    """Scan one shard with nmap; runs in a worker process"""
+    import nmap
+    nm = nmap.PortScanner()
+    nm.scan(host, _ranges(ports), arguments=arguments)
+    open_ports = []
+    for scanned in nm.all_hosts():
+        for proto in nm[scanned].all_protocols():
+            for port, info in nm[scanned][proto].items():
+                if info['state'] == 'open':
+                    open_ports.append({'port': port, 'service': info.get('name', 'unknown'), 'state': 'open'})
+    return open_ports
+
+
+def _service(port: int) -> str:
+    try:
+        return socket.getservbyport(port, 'tcp')
+    except OSError:
+        return 'unknown'
+
+
+async def connect_scan(host: str, ports: Sequence[int], report: Callable[[Dict], None],
+                       concurrency: int = DEFAULT_CONNECT_CONCURRENCY,
+                       timeout: float = DEFAULT_CONNECT_TIMEOUT) -> List[Dict]:
+    """TCP connect scan on the event loop, for hosts without an nmap binary"""
+    slots = asyncio.Semaphore(concurrency)
+    open_ports = []
+
+    async def probe(port: int):
+        async with slots:
+            try:
+                _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+            except (OSError, asyncio.TimeoutError):
+                return
+            writer.close()
+            result = {'port': port, 'service': _service(port), 'state': 'open'}
+            open_ports.append(result)
+            report(result)
+
+    await asyncio.gather(*(probe(port) for port in ports))
+    return open_ports
+
+
+class PortScanner:
+    """Sharded port scan that reports open ports as each shard finishes.
+
+    With nmap the port list is split into shards of ``shard_size`` ports
+    (by default spread evenly over the workers, see ``shard_size``), each
+    scanned by its own nmap run in a pool of ``workers`` processes.
+    Without nmap (or with ``scanner='connect'``) an asyncio TCP connect scan
+    is used instead. Open ports found earlier within the cache TTL, while
+    the host still resolves to the same addresses, are reported straight
+    away and only the remaining ports are scanned.
+    """
+
+    def __init__(self, scanner: str = 'auto', shard_size: Optional[int] = None,
+                 workers: Optional[int] = None, arguments: str = '-T4',
+                 cache: Optional[PortCache] = None):
+        if scanner not in SCANNERS:
+            raise ValueError(f'Unknown port scanner: {scanner}')
+        if scanner == 'auto':
+            scanner = 'nmap' if shutil.which('nmap') else 'connect'
+        self.scanner = scanner
+        self.shard_size = shard_size
+        self.workers = workers or min(os.cpu_count() or 1, 8)
+        self.arguments = arguments
+        self.cache = cache
+
+    def scan(self, host: str, ports: Sequence[int], report: Callable[[Dict], None]) -> List[Dict]:
+        """Scan ``ports`` on ``host``; returns every open port sorted by number"""
+        addresses = resolve(host) if self.cache else None
+        found, missing = self.cache.lookup(host, ports, addresses) if self.cache else ([], list(ports))
+        for result in found:
+            report(result)
+        if missing:
+            logger.info(f"Scanning {len(missing)} ports on {host} with {self.scanner} "
+                        f"({len(ports) - len(missing)} cached)")
+            if self.scanner == 'nmap':
+                found += self._scan_nmap(host, missing, report, addresses)
+            else:
+                found += self._scan_connect(host, missing, report, addresses)
+            if self.cache:
+                self.cache.save()
+        return sorted(found, key=lambda result: result['port'])
+
+    def _scan_nmap(self, host: str, ports: List[int], report: Callable[[Dict], None],
+                   addresses: Optional[List[str]] = None) -> List[Dict]:
+        found = []
+        # Spawned, not forked: the scan runs on a worker thread of a threaded process
+        context = multiprocessing.get_context('spawn')
+        with concurrent.futures.ProcessPoolExecutor(max_workers=self.workers, mp_context=context) as pool:
+            futures = {
+                pool.submit(_nmap_shard, host, ports_shard, self.arguments): ports_shard
+                for ports_shard in shard(ports, self.shard_size or shard_size(len(ports), self.workers))
+            }
+            for future in concurrent.futures.as_completed(futures):
+                try:
+                    open_ports = future.result()
+                except Exception as e:
+                    logger.error(f"nmap shard {_ranges(futures[future])} failed: {e}")
+                    continue
+                if self.cache:
+                    self.cache.store(host, futures[future], open_ports, addresses)
+                for result in open_ports:
+                    report(result)
+                found.extend(open_ports)
+        return found
+
+    def _scan_connect(self, host: str, ports: List[int], report: Callable[[Dict], None],
+                      addresses: Optional[List[str]] = None) -> List[Dict]:
+        found = []
+        # Shards keep the cache current as the scan progresses
+        for ports_shard in shard(ports, self.shard_size * 8 if self.shard_size else CONNECT_SHARD_SIZE):
+            open_ports = asyncio.run(connect_scan(host, ports_shard, report))
+            if self.cache:
+                self.cache.store(host, ports_shard, open_ports, addresses)
+            found.extend(open_ports)
+        return found
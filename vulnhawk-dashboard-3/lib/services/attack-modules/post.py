@@ -1,162 +1,124 @@
-import requests
-from typing import Dict, List
-import concurrent.futures
+from typing import Any, Dict, List, Optional
+from http_client import HttpClient
+from probes import STATUS_ONLY, Check, Probe
+from scheduler import ThreadScheduler, run_checks
+from soft404 import Baseline, exists
 from urllib.parse import urljoin
-import re
 
 class PostModule:
-    def __init__(self, target: str):
+    def __init__(self, target: str, client: HttpClient = None, baseline: Optional[Dict[str, Any]] = None):
         self.target = target
+        self.client = client or HttpClient()
+        # Soft-404 fingerprint of the host; path checks ignore 200s that match it
+        self.baseline = Baseline.from_dict(baseline) if baseline else None
         self.results = {
             "data_exfiltration": [],
             "lateral_movement": [],
             "persistence": [],
             "impact_assessment": []
         }
-        
-    def check_data_exfiltration(self) -> List[Dict]:
-        """Check for data exfiltration paths"""
-        try:
-            issues = []
-            
-            # Check for data export endpoints
-            export_paths = [
-                '/api/export',
-                '/api/download',
-                '/api/data',
-                '/api/backup'
-            ]
-            
-            for path in export_paths:
-                try:
-                    response = requests.get(
-                        urljoin(self.target, path),
-                        timeout=5
-                    )
-                    if response.status_code == 200:
-                        issues.append({
-                            'type': 'data_exfiltration',
-                            'description': 'Potential data exfiltration path',
-                            'details': f"Accessible export endpoint: {path}"
-                        })
-                except:
-                    continue
-                    
-            return issues
-        except Exception as e:
-            print(f"Data exfiltration check error: {str(e)}")
+
+    def _path_check(self, paths: List[str], finding_type: str, description: str, details: str) -> Check:
+        """Build a check that reports every path answering with 200 (other than the host's soft 404)"""
+        probes = [Probe('GET', urljoin(self.target, path), label=path, **STATUS_ONLY) for path in paths]
+        found = exists(self.baseline)
+
+        def evaluate(probe: Probe, response) -> List[Dict]:
+            if found(probe, response):
+                return [{
+                    'type': finding_type,
+                    'description': description,
+                    'details': f"{details}: {probe.label}"
+                }]
             return []
 
-    def check_lateral_movement(self) -> List[Dict]:
+        return Check(probes, evaluate)
+
+    def check_data_exfiltration(self) -> Check:
+        """Check for data exfiltration paths"""
+        # Check for data export endpoints
+        export_paths = [
+            '/api/export',
+            '/api/download',
+            '/api/data',
+            '/api/backup'
+        ]
+        return self._path_check(
+            export_paths,
+            'data_exfiltration',
+            'Potential data exfiltration path',
+            'Accessible export endpoint'
+        )
+
+    def check_lateral_movement(self) -> Check:
         """Check for lateral movement possibilities"""
-        try:
-            issues = []
-            
-            # Check for internal network access
-            internal_paths = [
-                '/api/internal',
-                '/admin/internal',
-                '/internal',
-                '/network'
-            ]
-            
-            for path in internal_paths:
-                try:
-                    response = requests.get(
-                        urljoin(self.target, path),
-                        timeout=5
-                    )
-                    if response.status_code == 200:
-                        issues.append({
-                            'type': 'lateral_movement',
-                            'description': 'Potential lateral movement path',
-                            'details': f"Accessible internal endpoint: {path}"
-                        })
-                except:
-                    continue
-                    
-            return issues
-        except Exception as e:
-            print(f"Lateral movement check error: {str(e)}")
-            return []
+        # Check for internal network access
+        internal_paths = [
+            '/api/internal',
+            '/admin/internal',
+            '/internal',
+            '/network'
+        ]
+        return self._path_check(
+            internal_paths,
+            'lateral_movement',
+            'Potential lateral movement path',
+            'Accessible internal endpoint'
+        )
 
-    def check_persistence(self) -> List[Dict]:
+    def check_persistence(self) -> Check:
         """Check for persistence mechanisms"""
-        try:
-            issues = []
-            
-            # Check for persistence mechanisms
-            persistence_paths = [
-                '/api/cron',
-                '/api/scheduled',
-                '/api/tasks',
-                '/admin/settings'
-            ]
-            
-            for path in persistence_paths:
-                try:
-                    response = requests.get(
-                        urljoin(self.target, path),
-                        timeout=5
-                    )
-                    if response.status_code == 200:
-                        issues.append({
-                            'type': 'persistence',
-                            'description': 'Potential persistence mechanism',
-                            'details': f"Accessible persistence endpoint: {path}"
-                        })
-                except:
-                    continue
-                    
-            return issues
-        except Exception as e:
-            print(f"Persistence check error: {str(e)}")
-            return []
+        # Check for persistence mechanisms
+        persistence_paths = [
+            '/api/cron',
+            '/api/scheduled',
+            '/api/tasks',
+            '/admin/settings'
+        ]
+        return self._path_check(
+            persistence_paths,
+            'persistence',
+            'Potential persistence mechanism',
+            'Accessible persistence endpoint'
+        )
 
-    def assess_impact(self) -> List[Dict]:
+    def assess_impact(self) -> Check:
         """Assess potential impact of successful exploits"""
-        try:
-            issues = []
-            
-            # Check for sensitive operations
-            sensitive_paths = [
-                ('/api/users', 'User management'),
-                ('/api/data', 'Data access'),
-                ('/api/settings', 'System settings'),
-                ('/api/admin', 'Admin functions')
-            ]
-            
-            for path, description in sensitive_paths:
-                try:
-                    response = requests.get(
-                        urljoin(self.target, path),
-                        timeout=5
-                    )
-                    if response.status_code == 200:
-                        issues.append({
-                            'type': 'impact_assessment',
-                            'description': 'Potential high-impact access',
-                            'details': f"Accessible {description} endpoint: {path}"
-                        })
-                except:
-                    continue
-                    
-            return issues
-        except Exception as e:
-            print(f"Impact assessment error: {str(e)}")
+        # Check for sensitive operations
+        sensitive_paths = [
+            ('/api/users', 'User management'),
+            ('/api/data', 'Data access'),
+            ('/api/settings', 'System settings'),
+            ('/api/admin', 'Admin functions')
+        ]
+        probes = [
+            Probe('GET', urljoin(self.target, path), label=(path, description), **STATUS_ONLY)
+            for path, description in sensitive_paths
+        ]
+        found = exists(self.baseline)
+
+        def evaluate(probe: Probe, response) -> List[Dict]:
+            if found(probe, response):
+                path, description = probe.label
+                return [{
+                    'type': 'impact_assessment',
+                    'description': 'Potential high-impact access',
+                    'details': f"Accessible {description} endpoint: {path}"
+                }]
             return []
 
-    def run(self) -> Dict:
+        return Check(probes, evaluate)
+
+    def checks(self) -> Dict[str, Check]:
+        """All post-exploitation checks keyed by result field"""
+        return {
+            'data_exfiltration': self.check_data_exfiltration(),
+            'lateral_movement': self.check_lateral_movement(),
+            'persistence': self.check_persistence(),
+            'impact_assessment': self.assess_impact()
+        }
+
+    def run(self, scheduler: ThreadScheduler = None) -> Dict:
         """Run all post-exploitation checks"""
-        with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
-            exfiltration_future = executor.submit(self.check_data_exfiltration)
-            lateral_future = executor.submit(self.check_lateral_movement)
-            persistence_future = executor.submit(self.check_persistence)
-            impact_future = executor.submit(self.assess_impact)
-            
-            self.results['data_exfiltration'] = exfiltration_future.result()
-            self.results['lateral_movement'] = lateral_future.result()
-            self.results['persistence'] = persistence_future.result()
-            self.results['impact_assessment'] = impact_future.result()
-            
-        return self.results 
\ No newline at end of file
+        self.results.update(run_checks(self.client, self.checks(), scheduler, workers=4))
+        return self.results
@@ -0,0 +1,484 @@
+import itertools
+import logging
+import threading
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Set, Tuple, Union
+
+from deadline import Deadline
+from journal import CheckJournal
+from metrics import CheckMetrics
+from signatures import literals
+
+logger = logging.getLogger('probes')
+
+# Probe options for checks that only look at the status: try HEAD first and
+# never read the body of the GET fallback
+STATUS_ONLY = {'head_first': True, 'max_body': 0}
+
+
+class Probe:
+    """One HTTP request issued by a check.
+
+    ``group`` ties related probes together (usually the parameter under
+    test) for the ``'group'`` stop policy, ``label`` is free-form data the
+    check's evaluator can read back, and the remaining keyword arguments
+    (``data``, ``json``, ``files``, ``headers``, ``timeout``, ``max_body``,
+    ``head_first``) are passed to the HTTP client unchanged.
+    """
+
+    def __init__(self, method: str, url: str, group: Any = None, label: Any = None, **kwargs):
+        self.method = method
+        self.url = url
+        self.group = group
+        self.label = label
+        self.kwargs = kwargs
+
+    def __repr__(self):
+        return f"Probe({self.method} {self.url})"
+
+
+class Check:
+    """A check described as probes plus the rule that turns responses into findings.
+
+    ``evaluate(probe, response)`` returns the findings for one response.
+    ``stop`` decides what happens once a probe produced findings: ``None``
+    runs every probe, ``'group'`` skips the rest of that probe's group and
+    ``'check'`` skips everything left in the check. Checks that are not
+    HTTP probes (port scans, DNS lookups) pass a blocking ``func`` instead.
+    With ``stream`` the func is called with a ``report(finding)`` callback
+    so findings are reported while it is still running.
+    ``split(probe, response)``, when given, returns follow-up probes the
+    engine sends after that response, e.g. the halves of a batch that
+    matched without saying which parameter did.
+    """
+
+    def __init__(self, probes: Sequence[Probe] = (),
+                 evaluate: Optional[Callable[[Probe, Any], List]] = None,
+                 stop: Optional[str] = None,
+                 func: Optional[Callable[..., List]] = None,
+                 stream: bool = False,
+                 split: Optional[Callable[[Probe, Any], Sequence[Probe]]] = None):
+        if stop not in (None, 'group', 'check'):
+            raise ValueError(f'Unknown stop policy: {stop}')
+        self.probes = list(probes)
+        self.evaluate = evaluate
+        self.stop = stop
+        self.func = func
+        self.stream = stream
+        self.split = split
+
+
+class _Batched(NamedTuple):
+    """Label of a probe carrying one payload in several parameters"""
+    params: Tuple[str, ...]
+    payload: str
+
+
+class ProbeMatrix:
+    """A check written as parameters x payloads x match rules.
+
+    Every payload is sent in every parameter, either in the query string
+    of ``url`` or as a form or JSON body (``location``). A response that
+    satisfies any rule in ``match`` yields one finding built from the
+    ``finding`` template, whose values may use ``{param}`` and
+    ``{payload}``. Probes are grouped by parameter, so the default ``stop``
+    of ``'group'`` stops testing a parameter at its first hit; use
+    ``'check'`` to stop the whole matrix or ``None`` to run everything.
+
+    With ``batch`` each request carries a payload in up to that many
+    parameters at once, each copy behind a marker of its own. A batch that
+    matches is narrowed to the parameters whose marked copy the rules pick
+    out (reflection rules can tell them apart) or, when the rules cannot
+    tell, split in halves until single parameters remain. Either way the
+    finding comes from a request with the plain payload in one parameter.
+    A clean batch costs one request however many parameters it holds.
+    Parameters that change how the others are handled can hide each
+    other's hits in a batch, so thorough scans leave batching off.
+    """
+
+    def __init__(self, url: str, params: Sequence[str], payloads: Sequence[str],
+                 match: Union[Callable[[Probe, Any], bool], Sequence[Callable[[Probe, Any], bool]]],
+                 finding: Dict[str, str], method: str = 'GET', location: str = 'query',
+                 stop: Optional[str] = 'group', batch: Optional[int] = None, **kwargs):
+        if location not in ('query', 'form', 'json'):
+            raise ValueError(f'Unknown payload location: {location}')
+        self.url = url
+        self.params = list(params)
+        self.payloads = list(payloads)
+        self.match = [match] if callable(match) else list(match)
+        self.finding = finding
+        self.method = method
+        self.location = location
+        self.stop = stop
+        self.batch = batch if batch and batch > 1 else None
+        self.kwargs = kwargs
+        self._markers = {param: f'vh{index}z' for index, param in enumerate(self.params)}
+        # Parameters with a finding; later batches that match are not blamed on them again
+        self._found: Set[str] = set()
+
+    def _request(self, values: Dict[str, str], group: Any, label: Any) -> Probe:
+        if self.location == 'query':
+            separator = '&' if '?' in self.url else '?'
+            query = '&'.join(f'{param}={value}' for param, value in values.items())
+            return Probe(self.method, f'{self.url}{separator}{query}', group=group, label=label, **self.kwargs)
+        body = {'data' if self.location == 'form' else 'json': values}
+        return Probe(self.method, self.url, group=group, label=label, **body, **self.kwargs)
+
+    def probe(self, param: str, payload: str) -> Probe:
+        return self._request({param: payload}, param, payload)
+
+    def batch_probe(self, params: Sequence[str], payload: str) -> Probe:
+        """One probe with ``payload`` in every one of ``params``; a single parameter gets the plain probe"""
+        if len(params) == 1:
+            return self.probe(params[0], payload)
+        values = {param: f'{self._markers[param]}{payload}' for param in params}
+        return self._request(values, None, _Batched(tuple(params), payload))
+
+    def probes(self) -> List[Probe]:
+        if self.batch is None:
+            return [self.probe(param, payload) for param in self.params for payload in self.payloads]
+        chunks = [self.params[start:start + self.batch] for start in range(0, len(self.params), self.batch)]
+        return [self.batch_probe(chunk, payload) for chunk in chunks for payload in self.payloads]
+
+    def matches(self, probe: Probe, response) -> bool:
+        return any(rule(probe, response) for rule in self.match)
+
+    def evaluate(self, probe: Probe, response) -> List[Dict[str, str]]:
+        if isinstance(probe.label, _Batched) or not self.matches(probe, response):
+            return []
+        if self.stop is not None:
+            self._found.add(probe.group)
+        return [{
+            key: value.format(param=probe.group, payload=probe.label)
+            for key, value in self.finding.items()
+        }]
+
+    def split(self, probe: Probe, response) -> List[Probe]:
+        """Follow-ups of a batch probe: its matching parameters, or its halves when the rules cannot tell"""
+        if not isinstance(probe.label, _Batched):
+            return []
+        params, payload = probe.label
+        params = [param for param in params if param not in self._found]
+        # Each marked copy on its own, as if it had been sent alone
+        hits = [
+            param for param in params
+            if self.matches(Probe(probe.method, probe.url, group=param, label=f'{self._markers[param]}{payload}'),
+                            response)
+        ]
+        if not hits:
+            return []
+        if len(hits) < len(params) or len(params) == 1:
+            return [self.probe(param, payload) for param in hits]
+        half = len(params) // 2
+        return [self.batch_probe(params[:half], payload), self.batch_probe(params[half:], payload)]
+
+    def check(self) -> Check:
+        return Check(self.probes(), self.evaluate, stop=self.stop, split=self.split if self.batch else None)
+
+
+def merge_checks(checks: Sequence[Check]) -> Check:
+    """Run several probe checks with the same stop policy as one.
+
+    Groups stay apart per check, so ``'group'`` stops one check's parameter
+    without touching another's parameter of the same name.
+    """
+    stops = {check.stop for check in checks}
+    if len(stops) != 1 or any(check.func is not None for check in checks):
+        raise ValueError('Only probe checks with one stop policy can be merged')
+    origin = {}
+
+    def wrap(index: int, check: Check, probe: Probe) -> Probe:
+        merged = Probe(probe.method, probe.url, group=(index, probe.group), label=probe.label, **probe.kwargs)
+        origin[id(merged)] = (index, check, probe)
+        return merged
+
+    def evaluate(probe: Probe, response) -> List:
+        _, check, original = origin[id(probe)]
+        return check.evaluate(original, response)
+
+    def split(probe: Probe, response) -> List[Probe]:
+        index, check, original = origin[id(probe)]
+        if check.split is None:
+            return []
+        return [wrap(index, check, follow_up) for follow_up in check.split(original, response)]
+
+    probes = [wrap(index, check, probe) for index, check in enumerate(checks) for probe in check.probes]
+    splits = any(check.split is not None for check in checks)
+    return Check(probes, evaluate, stop=stops.pop(), split=split if splits else None)
+
+
+def body_contains(*needles: str, ignore_case: bool = False) -> Callable[[Probe, Any], bool]:
+    """Match rule: the response body contains any of ``needles``"""
+    pack = literals(*needles, ignore_case=ignore_case)
+    return lambda probe, response: pack.search(response.text)
+
+
+def reflects_payload(probe: Probe, response) -> bool:
+    """Match rule: the payload comes back verbatim in the response body"""
+    return probe.label in response.text
+
+
+def status_is(*codes: int) -> Callable[[Probe, Any], bool]:
+    """Match rule: the response has one of the given status codes"""
+    return lambda probe, response: response.status_code in codes
+
+
+class CheckState:
+    """Tracks which probes of a check are still wanted and the findings so far.
+
+    Engines may finish probes out of order; findings are kept with their
+    probe index so the result reads the same as a serial run. Under the
+    ``'group'`` and ``'check'`` stop policies a hit only closes its group
+    (or the check) to the probes after it: probes ahead of it still run,
+    and a hit among them replaces it, so the hit that stands is the first
+    in probe order. ``on_finding`` is called for every accepted finding as
+    soon as it is recorded, and ``on_retract`` for each one later replaced.
+    Engines that can abort a request register it with ``track``; once a
+    finding closes its group or the check, the requests after it still in
+    flight are cancelled. Work the ``deadline`` cut short is listed in
+    ``skipped``. Probe outcomes and skips go to ``metrics`` when given.
+    With a ``journal`` every completed probe is journaled, and ``replay``
+    restores the probes an earlier run already completed. Follow-up probes
+    from the check's ``split`` are indexed under their parent (``(3, 0)``,
+    ``(3, 1)`` after probe 3) so their findings keep a serial run's order.
+    """
+
+    def __init__(self, check: Check, on_finding: Optional[Callable[[Any], None]] = None,
+                 on_retract: Optional[Callable[[Any], None]] = None,
+                 deadline: Optional[Deadline] = None, metrics: Optional[CheckMetrics] = None,
+                 journal: Optional[CheckJournal] = None):
+        self.check = check
+        self.on_finding = on_finding
+        self.on_retract = on_retract
+        self.deadline = deadline
+        self.metrics = metrics
+        self.journal = journal
+        # Probe indices (None for the func) restored from the journal
+        self.replayed: Set[Optional[int]] = set()
+        self.skipped: List[str] = []
+        self.done = False
+        # Per group (or None for the whole check) the index of the probe whose hit closed it
+        self._closers: Dict[Any, Tuple[int, ...]] = {}
+        self._findings = []
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def wanted(self, probe: Optional[Probe], index=None) -> bool:
+        """Whether the probe at ``index`` still needs to run under the check's stop policy"""
+        if self.done:
+            return False
+        if self.check.stop not in ('group', 'check'):
+            return True
+        closer = self._closers.get(self._scope(probe))
+        return closer is None or (index is not None and _order(index) < closer)
+
+    def _scope(self, probe: Optional[Probe]):
+        return probe.group if self.check.stop == 'group' else None
+
+    def expired(self) -> bool:
+        return self.deadline is not None and self.deadline.expired
+
+    def skip(self, what: str, url: Optional[str] = None):
+        """Note work that was not done because the deadline passed"""
+        with self._lock:
+            self.skipped.append(what)
+        if self.metrics is not None:
+            self.metrics.skip(url)
+
+    def observe(self, probe: Probe, response):
+        """Report one probe's outcome (``response`` None if it failed) to the metrics"""
+        if self.metrics is None:
+            return
+        if response is None:
+            self.metrics.probe(probe.url, None, None)
+            return
+        # A head_first probe answered by its GET sent the HEAD for nothing
+        retries = int(bool(probe.kwargs.get('head_first')) and response.method == 'GET')
+        self.metrics.probe(probe.url, response.status_code, response.elapsed, len(response.content), retries,
+                           response.wait, response.cached)
+
+    def record(self, index: int, probe: Optional[Probe], findings: List) -> bool:
+        """Store findings for a probe; returns True if this closed a group or the check"""
+        if not findings:
+            return False
+        with self._lock:
+            if not self.wanted(probe, index):
+                return False
+            closed = self.check.stop in ('group', 'check')
+            retracted = []
+            if closed:
+                scope = self._scope(probe)
+                # A hit from a probe ahead of the one that closed the scope takes its place
+                replaced = self._closers.get(scope)
+                if replaced is not None:
+                    retracted = [finding for other, finding in self._findings if _order(other) == replaced]
+                    self._findings = [item for item in self._findings if _order(item[0]) != replaced]
+                self._closers[scope] = _order(index)
+            self._findings.extend((index, finding) for finding in findings)
+            cancels = [
+                cancel for other_index, other, cancel in self._inflight.values()
+                if not self.wanted(other, other_index)
+            ]
+        for cancel in cancels:
+            cancel()
+        if self.on_retract is not None:
+            for finding in retracted:
+                self.on_retract(finding)
+        if self.on_finding is not None:
+            for finding in findings:
+                self.on_finding(finding)
+        return closed
+
+    def complete(self, index, probe: Probe, findings: List, follow_ups: Sequence = ()):
+        """Record the findings of a probe whose response was evaluated, journaling it.
+
+        Probes that asked for follow-ups, and the follow-ups themselves, are
+        not journaled: the journal cannot hold probes made up at run time, so
+        a resumed scan sends the parent again and splits it anew.
+        """
+        if self.journal is not None and isinstance(index, int) and not follow_ups:
+            self.journal.probe(index, probe, findings)
+        self.record(index, probe, findings)
+
+    def follow_ups(self, index, probe: Probe, response) -> List[Tuple[Tuple[int, ...], Probe]]:
+        """The still wanted follow-ups the check's ``split`` asks for, with their indices"""
+        if self.check.split is None:
+            return []
+        parent = index if isinstance(index, tuple) else (index,)
+        return [
+            (parent + (position,), follow_up)
+            for position, follow_up in enumerate(self.check.split(probe, response))
+            if self.wanted(follow_up, parent + (position,))
+        ]
+
+    def replay(self):
+        """Restore the probes (or func) the journal has as completed, in journal order"""
+        if self.journal is None:
+            return
+        for entry in self.journal.entries:
+            index = entry['index']
+            if index is None:
+                if self.check.func is not None:
+                    self.replayed.add(None)
+                    for reported, finding in enumerate(entry['findings']):
+                        self.record(reported, None, [finding])
+                continue
+            probe = self.check.probes[index] if 0 <= index < len(self.check.probes) else None
+            if probe is None or entry['probe'] != f'{probe.method} {probe.url}':
+                logger.debug(f"Journal entry {entry} no longer matches the check, running it again")
+                continue
+            self.replayed.add(index)
+            self.record(index, probe, entry['findings'])
+
+    def track(self, index, probe: Probe, cancel: Callable[[], Any]) -> Callable[[], None]:
+        """Register an in-flight request; returns the callback that unregisters it"""
+        token = object()
+        with self._lock:
+            self._inflight[token] = (index, probe, cancel)
+        return lambda: self._untrack(token)
+
+    def _untrack(self, token: object):
+        with self._lock:
+            self._inflight.pop(token, None)
+
+    def settle(self, findings: List):
+        """Replace the recorded findings with a func's final result"""
+        with self._lock:
+            if not self.done and not self._closers:
+                self._findings = list(enumerate(findings))
+
+    def result(self) -> List:
+        return [finding for _, finding in sorted(self._findings, key=lambda item: _order(item[0]))]
+
+
+def _order(index) -> Tuple[int, ...]:
+    return index if isinstance(index, tuple) else (index,)
+
+
+def execute_probe(client, state: CheckState, index, probe: Probe,
+                  spawn: Optional[Callable[[Any, Probe], None]] = None):
+    """Send one probe through the shared client and record its findings.
+
+    Follow-ups the check asks for are handed to ``spawn(index, probe)`` to
+    be queued, or sent right here without it.
+    """
+    if not state.wanted(probe, index):
+        return
+    if state.expired():
+        state.skip(f"{probe.method} {probe.url}", probe.url)
+        return
+    try:
+        response = client.request(probe.method, probe.url, deadline=state.deadline, **probe.kwargs)
+    except Exception as e:
+        fail_probe(state, probe, e)
+        return
+    state.observe(probe, response)
+    try:
+        findings = state.check.evaluate(probe, response)
+        follow_ups = state.follow_ups(index, probe, response)
+    except Exception as e:
+        logger.debug(f"{probe} failed: {e}")
+        return
+    state.complete(index, probe, findings, follow_ups)
+    for follow_index, follow_up in follow_ups:
+        if spawn is not None:
+            spawn(follow_index, follow_up)
+        else:
+            execute_probe(client, state, follow_index, follow_up)
+
+
+def fail_probe(state: CheckState, probe: Probe, error: Exception):
+    """Account for a probe whose request failed: skipped at the deadline, an error otherwise"""
+    if state.expired():
+        state.skip(f"{probe.method} {probe.url}", probe.url)
+        return
+    state.observe(probe, None)
+    logger.debug(f"{probe} failed: {error}")
+
+
+def execute_func(state: CheckState):
+    """Run a check's blocking ``func``, recording its findings in ``state``.
+
+    With a deadline the func runs on its own daemon thread and is abandoned
+    once the deadline passes; whatever it reported by then is kept and
+    anything it reports later is dropped.
+    """
+    check = state.check
+    name = getattr(check.func, '__name__', 'func')
+    if state.expired():
+        state.skip(name)
+        return
+    if state.deadline is None:
+        _call_func(state)
+        return
+    thread = threading.Thread(target=_call_func, args=(state,), name=f'check-{name}', daemon=True)
+    thread.start()
+    thread.join(state.deadline.remaining())
+    if thread.is_alive():
+        logger.warning(f"Check {name} still running at the deadline, abandoning it")
+        state.skip(name)
+        state.done = True
+
+
+def _call_func(state: CheckState):
+    check = state.check
+    reported = itertools.count()
+
+    def report(finding):
+        state.record(next(reported), None, [finding])
+
+    try:
+        if check.stream:
+            result = check.func(report)
+        else:
+            result = check.func()
+    except Exception as e:
+        logger.error(f"Check failed: {e}")
+        return
+    if state.journal is not None:
+        state.journal.func(result)
+    if check.stream:
+        # Keep the func's own ordering of everything it reported
+        state.settle(result)
+    else:
+        for finding in result:
+            report(finding)
@@ -0,0 +1,144 @@
+import contextlib
+import cProfile
+import io
+import logging
+import os
+import pstats
+import sys
+import threading
+from collections import Counter
+from typing import Iterator, List, Optional, TextIO, Tuple
+
+logger = logging.getLogger('profiling')
+
+PROFILE_MODES = ('sample', 'cprofile')
+DEFAULT_INTERVAL = 0.005
+DEFAULT_TOP = 25
+
+
+class SamplingProfiler:
+    """Samples the stacks of every thread at a fixed interval.
+
+    Cheap enough to leave on for a whole production scan: the scan's own
+    threads run untouched and one background thread reads
+    ``sys._current_frames`` every ``interval`` seconds. Time spent waiting
+    (on sockets, locks, the rate limiter) shows up as well, so the profile
+    reads as wall-clock time per function. ``write`` saves the samples as collapsed stacks
+    (``outer;inner count`` per line), the input format of flamegraph.pl
+    and speedscope.
+    """
+
+    def __init__(self, interval: float = DEFAULT_INTERVAL):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._sample, name='profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+
+    def _sample(self):
+        own = threading.get_ident()
+        while not self._stopped.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_function(frame.f_code))
+                    frame = frame.f_back
+                self.stacks[tuple(reversed(stack))] += 1
+            self.samples += 1
+
+    def write(self, path: str):
+        with open(path, 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{';'.join(stack)} {count}\n")
+
+    def top(self, n: int = DEFAULT_TOP) -> List[Tuple[str, int, int]]:
+        """``(function, self samples, total samples)`` for the ``n`` busiest functions"""
+        own, total = Counter(), Counter()
+        for stack, count in self.stacks.items():
+            own[stack[-1]] += count
+            for function in set(stack):
+                total[function] += count
+        return [(function, own[function], count) for function, count in total.most_common(n)]
+
+    def summary(self, n: int = DEFAULT_TOP) -> str:
+        lines = [f'{self.samples} samples every {self.interval * 1000:g} ms, across all threads',
+                 f"{'self':>8} {'total':>8}  function"]
+        lines += [f'{own:>8} {total:>8}  {function}' for function, own, total in self.top(n)]
+        return '\n'.join(lines)
+
+
+class DeterministicProfiler:
+    """cProfile over every thread the run starts, merged into one profile.
+
+    Counts every call exactly, at a cost of several times the scan's own
+    CPU time; use it on a test target rather than in production. ``write``
+    saves a pstats file for ``python -m pstats`` or snakeviz.
+    """
+
+    def __init__(self):
+        self.profiles: List[cProfile.Profile] = []
+        self._lock = threading.Lock()
+        self.stats: Optional[pstats.Stats] = None
+
+    def start(self):
+        if sys.version_info < (3, 12):
+            # Until 3.12 cProfile only sees the thread that enabled it, so every
+            # thread started from now on gets its own profile from its first call
+            threading.setprofile(self._profile_thread)
+        self._profile_thread()
+
+    def _profile_thread(self, *args):
+        profile = cProfile.Profile()
+        with self._lock:
+            self.profiles.append(profile)
+        profile.enable()
+
+    def stop(self):
+        threading.setprofile(None)
+        with self._lock:
+            profiles = list(self.profiles)
+        self.stats = pstats.Stats(*profiles, stream=io.StringIO())
+
+    def write(self, path: str):
+        self.stats.dump_stats(path)
+
+    def summary(self, n: int = DEFAULT_TOP) -> str:
+        out = io.StringIO()
+        self.stats.stream = out
+        self.stats.sort_stats('cumulative').print_stats(n)
+        return out.getvalue().strip()
+
+
+def _function(code) -> str:
+    return f"{os.path.basename(code.co_filename)}:{getattr(code, 'co_qualname', code.co_name)}"
+
+
+@contextlib.contextmanager
+def profiled(path: Optional[str], mode: str = 'sample', top: int = DEFAULT_TOP,
+             out: TextIO = sys.stderr) -> Iterator[None]:
+    """Profile the block into ``path`` and print the ``top`` functions to ``out``; no-op without a path"""
+    if not path:
+        yield
+        return
+    if mode not in PROFILE_MODES:
+        raise ValueError(f'Unknown profile mode: {mode}')
+    profiler = SamplingProfiler() if mode == 'sample' else DeterministicProfiler()
+    profiler.start()
+    try:
+        yield
+    finally:
+        profiler.stop()
+        profiler.write(path)
+        logger.info(f"Profile written to {path}")
+        out.write(f'Profile ({mode}) written to {path}\n{profiler.summary(top)}\n')
+        out.flush()
@@ -0,0 +1,166 @@
+import asyncio
+import email.utils
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+logger = logging.getLogger('rate_limiter')
+
+DEFAULT_RATE = 20.0
+DEFAULT_MIN_RATE = 0.5
+DEFAULT_MAX_RATE = 200.0
+# Cap on how long a single Retry-After may pause a host
+MAX_RETRY_AFTER = 60.0
+# Latencies below this are noise, not a sign of an overloaded target
+LATENCY_FLOOR = 0.05
+
+
+class _HostState:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.last_decrease = 0.0
+        self.latency: Optional[float] = None
+        self.baseline: Optional[float] = None
+        self.throttled = 0
+        self.requests = 0
+
+
+class HostRateLimiter:
+    """Per-host token bucket whose rate adapts to how the target copes (AIMD).
+
+    Each host starts at ``rate`` requests per second with a bucket of
+    ``burst`` tokens. Callers take a token before sending: the threaded
+    engine sleeps in ``acquire`` and the asyncio engine awaits
+    ``aacquire``, both on the same bookkeeping. After every response ``feedback``
+    adjusts the host's rate: a 429/503, a ``Retry-After`` header, a timeout
+    or a latency average well above the host's baseline halves it (at most
+    once per round-trip), and ``Retry-After`` also pauses the host. Healthy
+    responses raise the rate by ``increase`` each until the host first
+    pushes back, then by about ``increase`` requests per second for each
+    second of healthy traffic.
+    """
+
+    def __init__(self, rate: float = DEFAULT_RATE, min_rate: float = DEFAULT_MIN_RATE,
+                 max_rate: float = DEFAULT_MAX_RATE, burst: Optional[float] = None,
+                 increase: float = 1.0, decrease: float = 0.5, latency_factor: float = 2.0):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max(max_rate, rate)
+        self.burst = burst or rate
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_factor = latency_factor
+        self._hosts: Dict[str, _HostState] = {}
+        self._lock = threading.Lock()
+
+    def _host(self, url: str) -> _HostState:
+        netloc = urlparse(url).netloc
+        state = self._hosts.get(netloc)
+        if state is None:
+            state = self._hosts[netloc] = _HostState(self.rate, self.burst)
+        return state
+
+    def reserve(self, url: str) -> Tuple[bool, float]:
+        """Try to take a token for the URL's host.
+
+        Returns ``(True, delay)`` when a token was taken and the request may
+        go out after ``delay`` seconds, or ``(False, delay)`` when the host
+        already has a full bucket's worth of requests queued and the caller
+        should try again after ``delay``. Capping the queue keeps waiting
+        requests from locking in a rate that has since changed.
+        """
+        with self._lock:
+            state = self._host(url)
+            now = time.monotonic()
+            state.tokens = min(self.burst, state.tokens + (now - state.updated) * state.rate)
+            state.updated = now
+            paused = max(state.paused_until - now, 0.0)
+            if state.tokens - 1 < -self.burst:
+                return False, max((-self.burst + 1 - state.tokens) / state.rate, paused)
+            # Tokens may go negative: each caller queues behind earlier reservations
+            state.tokens -= 1
+            state.requests += 1
+            return True, max(-state.tokens / state.rate, paused)
+
+    def acquire(self, url: str):
+        """Wait for a token; used by the threaded engine"""
+        while True:
+            granted, delay = self.reserve(url)
+            if delay > 0:
+                time.sleep(delay)
+            if granted:
+                return
+
+    async def aacquire(self, url: str):
+        """Coroutine form of ``acquire`` for the asyncio engine"""
+        while True:
+            granted, delay = self.reserve(url)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if granted:
+                return
+
+    def feedback(self, url: str, status: Optional[int], elapsed: float,
+                 retry_after: Optional[str] = None):
+        """Adapt the host's rate to one response; ``status`` is None for a timeout or error"""
+        with self._lock:
+            state = self._host(url)
+            now = time.monotonic()
+            if status is not None:
+                state.latency = elapsed if state.latency is None else 0.8 * state.latency + 0.2 * elapsed
+                if state.baseline is None or state.latency < state.baseline:
+                    state.baseline = state.latency
+                else:
+                    # Let the baseline follow a lasting change in the target's speed
+                    state.baseline += (state.latency - state.baseline) * 0.01
+
+            pause = _parse_retry_after(retry_after) if retry_after else None
+            if pause:
+                state.paused_until = max(state.paused_until, now + min(pause, MAX_RETRY_AFTER))
+            slow = (
+                state.latency is not None
+                and state.latency > self.latency_factor * max(state.baseline, LATENCY_FLOOR)
+            )
+            if status in (429, 503) or status is None or pause or slow:
+                self._back_off(url, state, now)
+            elif state.throttled:
+                state.rate = min(self.max_rate, state.rate + self.increase / state.rate)
+            else:
+                # Slow start: until the host first pushes back, ramp up quickly
+                state.rate = min(self.max_rate, state.rate + self.increase)
+
+    def _back_off(self, url: str, state: _HostState, now: float):
+        # Responses already in flight report the same congestion; react once per round-trip
+        if now - state.last_decrease < max(state.latency or 0.0, 1.0 / state.rate):
+            return
+        state.last_decrease = now
+        state.throttled += 1
+        state.rate = max(self.min_rate, state.rate * self.decrease)
+        logger.info(f"Backing off {urlparse(url).netloc} to {state.rate:.1f} req/s")
+
+    def stats(self, netloc: str) -> Dict[str, Any]:
+        state = self._hosts.get(netloc)
+        if state is None:
+            return {}
+        return {
+            'rate': round(state.rate, 2),
+            'requests': state.requests,
+            'throttled': state.throttled
+        }
+
+
+def _parse_retry_after(value: str) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP-date)"""
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(email.utils.parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
@@ -1,14 +1,38 @@
-import nmap
+import ipaddress
 import socket
-import requests
+import sys
 from urllib.parse import urlparse
-import dns.resolver
-import concurrent.futures
-from typing import Dict, List
+from dns_enum import SubdomainEnumerator, read_wordlist
+from port_scan import DEFAULT_CACHE_PATH, DEFAULT_CACHE_TTL, PortCache, PortScanner, parse_ports
+from http_client import HttpClient
+from probes import Check, Probe
+from scheduler import ThreadScheduler, run_checks
+from signatures import literals
+from typing import Callable, Dict, List, Optional
+
+# Tried when no wordlist is given
+COMMON_PREFIXES = ['www', 'mail', 'ftp', 'admin', 'blog', 'dev', 'test', 'api']
+
+# Common information disclosure patterns, matched in one pass over the body
+INFO_DISCLOSURE_PATTERNS = [
+    ('error', 'Error messages'),
+    ('stack trace', 'Stack traces'),
+    ('debug', 'Debug information'),
+    ('version', 'Version information')
+]
+INFO_DISCLOSURE = literals(*(pattern for pattern, _ in INFO_DISCLOSURE_PATTERNS), ignore_case=True)
 
 class ReconModule:
-    def __init__(self, target: str):
+    def __init__(self, target: str, client: HttpClient = None, wordlist: Optional[str] = None,
+                 dns_server: Optional[str] = None, ports: str = 'top100', port_scanner: str = 'auto',
+                 port_cache_ttl: float = DEFAULT_CACHE_TTL):
         self.target = target
+        self.client = client or HttpClient()
+        self.wordlist = wordlist
+        self.dns_server = dns_server
+        self.ports = ports
+        self.port_scanner = port_scanner
+        self.port_cache_ttl = port_cache_ttl
         self.results = {
             "open_ports": [],
             "subdomains": [],
@@ -16,124 +40,86 @@ class ReconModule:
             "info_disclosure": []
         }
         
-    def scan_ports(self) -> List[Dict]:
-        """Scan for open ports using nmap"""
+    def scan_ports(self, report: Callable[[Dict], None]) -> List[Dict]:
+        """Scan for open ports, reporting each as its shard completes"""
         try:
-            nm = nmap.PortScanner()
-            nm.scan(self.target, arguments='-F -T4')  # Fast scan of common ports
-            
-            open_ports = []
-            for host in nm.all_hosts():
-                for proto in nm[host].all_protocols():
-                    ports = nm[host][proto].keys()
-                    for port in ports:
-                        state = nm[host][proto][port]['state']
-                        if state == 'open':
-                            service = nm[host][proto][port].get('name', 'unknown')
-                            open_ports.append({
-                                'port': port,
-                                'service': service,
-                                'state': state
-                            })
-            return open_ports
+            host = urlparse(self.target).hostname or self.target
+            cache = PortCache(self.port_cache_ttl, DEFAULT_CACHE_PATH) if self.port_cache_ttl > 0 else None
+            scanner = PortScanner(self.port_scanner, cache=cache)
+            return scanner.scan(host, parse_ports(self.ports), report)
         except Exception as e:
-            print(f"Port scan error: {str(e)}")
+            print(f"Port scan error: {str(e)}", file=sys.stderr)
             return []
 
     def find_subdomains(self) -> List[str]:
         """Find subdomains using DNS enumeration"""
         try:
-            domain = urlparse(self.target).netloc
-            subdomains = set()
-            
-            # Common subdomain prefixes
-            prefixes = ['www', 'mail', 'ftp', 'admin', 'blog', 'dev', 'test', 'api']
-            
-            for prefix in prefixes:
-                try:
-                    subdomain = f"{prefix}.{domain}"
-                    answers = dns.resolver.resolve(subdomain, 'A')
-                    if answers:
-                        subdomains.add(subdomain)
-                except:
-                    continue
-                    
-            return list(subdomains)
+            domain = urlparse(self.target).hostname
+            try:
+                ipaddress.ip_address(domain)
+                return []  # No names to enumerate under a bare IP
+            except ValueError:
+                pass
+            nameservers, port = None, 53
+            if self.dns_server:
+                host, _, dns_port = self.dns_server.partition(':')
+                nameservers, port = [host], int(dns_port or 53)
+            enumerator = SubdomainEnumerator(nameservers=nameservers, port=port)
+            words = read_wordlist(self.wordlist) if self.wordlist else COMMON_PREFIXES
+            return enumerator.enumerate(domain, words)
         except Exception as e:
-            print(f"Subdomain enumeration error: {str(e)}")
+            print(f"Subdomain enumeration error: {str(e)}", file=sys.stderr)
             return []
 
-    def detect_technologies(self) -> List[Dict]:
+    def detect_technologies(self) -> Check:
         """Detect technologies used by the target"""
-        try:
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-            }
-            response = requests.get(self.target, headers=headers, timeout=10)
-            
+        def evaluate(probe: Probe, response) -> List[Dict]:
             technologies = []
-            
+
             # Check for common headers
             if 'X-Powered-By' in response.headers:
                 technologies.append({
                     'type': 'framework',
                     'name': response.headers['X-Powered-By']
                 })
-                
+
             # Check for common server headers
             if 'Server' in response.headers:
                 technologies.append({
                     'type': 'server',
                     'name': response.headers['Server']
                 })
-                
+
             return technologies
-        except Exception as e:
-            print(f"Technology detection error: {str(e)}")
-            return []
 
-    def check_info_disclosure(self) -> List[Dict]:
+        return Check([Probe('GET', self.target, timeout=10)], evaluate)
+
+    def check_info_disclosure(self) -> Check:
         """Check for information disclosure"""
-        try:
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-            }
-            response = requests.get(self.target, headers=headers, timeout=10)
-            
-            disclosures = []
-            
-            # Check for common information disclosure patterns
-            patterns = [
-                ('error', 'Error messages'),
-                ('stack trace', 'Stack traces'),
-                ('debug', 'Debug information'),
-                ('version', 'Version information')
+        def evaluate(probe: Probe, response) -> List[Dict]:
+            found = INFO_DISCLOSURE.found(response.text)
+            return [
+                {
+                    'type': 'information_disclosure',
+                    'description': description,
+                    'details': f"Found {pattern} in response"
+                }
+                for pattern, description in INFO_DISCLOSURE_PATTERNS
+                if pattern in found
             ]
-            
-            for pattern, description in patterns:
-                if pattern in response.text.lower():
-                    disclosures.append({
-                        'type': 'information_disclosure',
-                        'description': description,
-                        'details': f"Found {pattern} in response"
-                    })
-                    
-            return disclosures
-        except Exception as e:
-            print(f"Information disclosure check error: {str(e)}")
-            return []
 
-    def run(self) -> Dict:
+        return Check([Probe('GET', self.target, timeout=10)], evaluate)
+
+    def checks(self) -> Dict[str, Check]:
+        """All reconnaissance checks keyed by result field"""
+        return {
+            'open_ports': Check(func=self.scan_ports, stream=True),
+            'subdomains': Check(func=self.find_subdomains),
+            'technologies': self.detect_technologies(),
+            'info_disclosure': self.check_info_disclosure()
+        }
+
+    def run(self, scheduler: ThreadScheduler = None) -> Dict:
         """Run all reconnaissance checks"""
-        with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
-            port_future = executor.submit(self.scan_ports)
-            subdomain_future = executor.submit(self.find_subdomains)
-            tech_future = executor.submit(self.detect_technologies)
-            disclosure_future = executor.submit(self.check_info_disclosure)
-            
-            self.results['open_ports'] = port_future.result()
-            self.results['subdomains'] = subdomain_future.result()
-            self.results['technologies'] = tech_future.result()
-            self.results['info_disclosure'] = disclosure_future.result()
-            
-        return self.results 
\ No newline at end of file
+        self.results.update(run_checks(self.client, self.checks(), scheduler, workers=4))
+        return self.results
@@ -0,0 +1,157 @@
+"""Attack module registry backed by the ``modules.json`` manifest; modules are imported only once a scan selects them.
+
+    python registry.py --list
+    python registry.py --import-times [--budget-ms 150] [module ...]
+"""
+import argparse
+import importlib
+import json
+import logging
+import os
+import subprocess
+import sys
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger('registry')
+
+MODULE_DIR = os.path.dirname(os.path.abspath(__file__))
+MANIFEST_PATH = os.path.join(MODULE_DIR, 'modules.json')
+
+# Imported by every scan whatever modules are selected
+CORE_MODULES = ('http_client', 'probes', 'scheduler', 'events')
+
+
+class ModuleRegistry:
+    """Resolves module names to classes, importing each on first use"""
+
+    def __init__(self, manifest: str = MANIFEST_PATH):
+        self.manifest = manifest
+        with open(manifest) as f:
+            self._specs: Dict[str, Dict[str, Any]] = json.load(f)
+        self._classes: Dict[str, type] = {}
+        self._lock = threading.Lock()
+
+    def names(self) -> List[str]:
+        return list(self._specs)
+
+    def spec(self, name: str) -> Dict[str, Any]:
+        try:
+            return self._specs[name]
+        except KeyError:
+            raise ImportError(f'Unknown module: {name}') from None
+
+    def wants(self, name: str, feature: str) -> bool:
+        """Whether the manifest flags the module for a scan-wide input: 'crawl' endpoints or a 'soft404' baseline"""
+        return bool(self._specs.get(name, {}).get(feature))
+
+    def load(self, name: str) -> type:
+        """Import the module behind ``name`` and return its class"""
+        spec = self.spec(name)
+        with self._lock:
+            if name not in self._classes:
+                module = importlib.import_module(spec['module'])
+                self._classes[name] = getattr(module, spec['class'])
+            return self._classes[name]
+
+    def create(self, name: str, target: str, **kwargs):
+        return self.load(name)(target, **kwargs)
+
+    def describe(self) -> Dict[str, Dict[str, Any]]:
+        """Manifest entries plus whether each module is imported yet"""
+        return {
+            name: {**spec, 'loaded': name in self._classes}
+            for name, spec in self._specs.items()
+        }
+
+
+registry = ModuleRegistry()
+
+
+def _parse_importtime(stderr: str) -> List[Tuple[int, str, int]]:
+    """Parse ``-X importtime`` output into (depth, module, cumulative us)"""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|', 2)
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        entries.append((depth, name.strip(), int(cumulative)))
+    return entries
+
+
+def _cold_import(names: List[str]) -> List[Tuple[int, str, int]]:
+    """Import ``names`` in order in a fresh interpreter and return its import log"""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [MODULE_DIR, os.environ.get('PYTHONPATH')])))
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', '; '.join(f'import {name}' for name in names)],
+        capture_output=True, text=True, cwd=MODULE_DIR, env=env
+    )
+    if proc.returncode != 0:
+        raise ImportError(proc.stderr.strip().splitlines()[-1])
+    return _parse_importtime(proc.stderr)
+
+
+def _cost(entries: List[Tuple[int, str, int]], name: str, heaviest: int = 3) -> Dict[str, Any]:
+    """Cumulative cost of the top-level import ``name`` and its heaviest children"""
+    # -X importtime logs a module after its children, so the children are
+    # the deeper entries directly before it
+    end = max(i for i, (depth, module, _) in enumerate(entries) if depth == 0 and module == name)
+    start = end
+    while start > 0 and entries[start - 1][0] > 0:
+        start -= 1
+    children = sorted(
+        ((module, us) for depth, module, us in entries[start:end] if depth == 1),
+        key=lambda child: child[1], reverse=True
+    )
+    return {
+        'ms': round(entries[end][2] / 1000, 1),
+        'heaviest': [[module, round(us / 1000, 1)] for module, us in children[:heaviest]]
+    }
+
+
+def measure_imports(names: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Cold import cost per module, measured beyond the shared core.
+
+    Each module is imported in its own interpreter after ``CORE_MODULES``
+    so its number is what selecting it adds to a scan's start-up.
+    """
+    report: Dict[str, Any] = {}
+    entries = _cold_import(list(CORE_MODULES))
+    report['core'] = {'ms': round(sum(us for depth, _, us in entries if depth == 0) / 1000, 1)}
+    report['modules'] = {}
+    for name in names or registry.names():
+        spec = registry.spec(name)
+        try:
+            entries = _cold_import([*CORE_MODULES, spec['module']])
+            report['modules'][name] = _cost(entries, spec['module'])
+        except ImportError as e:
+            report['modules'][name] = {'error': str(e)}
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='registry.py', description='Inspect the attack module registry')
+    parser.add_argument('modules', nargs='*', help='modules to measure (default: all)')
+    parser.add_argument('--list', action='store_true', help='print the registered modules')
+    parser.add_argument('--import-times', action='store_true',
+                        help='report the cold import cost of each module')
+    parser.add_argument('--budget-ms', type=float,
+                        help='with --import-times: exit 1 when a module imports slower than this')
+    args = parser.parse_args()
+
+    if args.import_times:
+        report = measure_imports(args.modules)
+        if args.budget_ms is not None:
+            report['budget_ms'] = args.budget_ms
+            report['over_budget'] = [
+                name for name, cost in report['modules'].items()
+                if 'error' in cost or cost['ms'] > args.budget_ms
+            ]
+        print(json.dumps(report, indent=2))
+        sys.exit(1 if report.get('over_budget') else 0)
+    print(json.dumps(registry.describe(), indent=2))
+
+
+if __name__ == '__main__':
+    main()
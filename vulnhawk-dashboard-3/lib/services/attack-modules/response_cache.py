@@ -0,0 +1,132 @@
+import asyncio
+import concurrent.futures
+import json
+import logging
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+from urllib.parse import urlparse
+
+logger = logging.getLogger('response_cache')
+
+CACHEABLE_METHODS = ('GET', 'HEAD')
+
+
+class _Abandoned(Exception):
+    """The request owning a cache entry was cancelled before it finished"""
+
+
+class ResponseCache:
+    """Per-run response cache with in-flight request coalescing.
+
+    Entries are keyed by method, URL and request body. The first caller for
+    a key performs the request; concurrent callers for the same key wait on
+    its future instead of sending their own, so checks that fetch the same
+    page share one round-trip. Only safe methods are cached: repeated POSTs
+    are often the point of a check (the brute-force test sends ten identical
+    logins on purpose). Failed requests are not kept. Runs sharing the
+    cache (batch, worker) ``open_host`` their target when they start and
+    ``close_host`` it when they end; a host's entries are dropped once the
+    last run on it has closed it.
+    """
+
+    def __init__(self, methods=CACHEABLE_METHODS):
+        self.methods = tuple(method.upper() for method in methods)
+        self._entries: Dict[Hashable, concurrent.futures.Future] = {}
+        self._lock = threading.Lock()
+        # Runs in progress per host
+        self._runs: Dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(method: str, url: str, **kwargs) -> Tuple:
+        """Cache key for a request; the timeout does not change the response"""
+        body = {
+            name: kwargs[name]
+            for name in ('params', 'data', 'json', 'headers', 'allow_redirects', 'max_body')
+            if kwargs.get(name) is not None
+        }
+        return method.upper(), url, json.dumps(body, sort_keys=True, default=str)
+
+    def cacheable(self, method: str, **kwargs) -> bool:
+        return method.upper() in self.methods and not kwargs.get('files')
+
+    def _claim(self, key: Hashable) -> Tuple[concurrent.futures.Future, bool]:
+        """Return the future for a key and whether the caller must fill it"""
+        with self._lock:
+            future = self._entries.get(key)
+            if future is not None:
+                self.hits += 1
+                return future, False
+            future = self._entries[key] = concurrent.futures.Future()
+            self.misses += 1
+            return future, True
+
+    def _fail(self, key: Hashable, future: concurrent.futures.Future, error: BaseException):
+        with self._lock:
+            if self._entries.get(key) is future:
+                del self._entries[key]
+        # A cancelled owner says nothing about the request, so waiters retry
+        # instead of inheriting the cancellation
+        future.set_exception(error if isinstance(error, Exception) else _Abandoned())
+
+    def fetch(self, key: Hashable, send: Callable[[], Any]) -> Any:
+        """Return the cached response for a key, sending the request at most once"""
+        future, owner = self._claim(key)
+        if not owner:
+            try:
+                return future.result()
+            except _Abandoned:
+                return self.fetch(key, send)
+        try:
+            response = send()
+        except BaseException as e:
+            self._fail(key, future, e)
+            raise
+        future.set_result(response)
+        return response
+
+    async def afetch(self, key: Hashable, send: Callable[[], Awaitable[Any]]) -> Any:
+        """Coroutine counterpart of ``fetch`` for the asyncio engine"""
+        future, owner = self._claim(key)
+        if not owner:
+            try:
+                # Shielded so a cancelled waiter does not cancel the shared entry
+                return await asyncio.shield(asyncio.wrap_future(future))
+            except _Abandoned:
+                return await self.afetch(key, send)
+        try:
+            response = await send()
+        except BaseException as e:
+            self._fail(key, future, e)
+            raise
+        future.set_result(response)
+        return response
+
+    def open_host(self, netloc: str):
+        """Note a run on one host starting; its entries are kept until every such run has ended"""
+        with self._lock:
+            self._runs[netloc] = self._runs.get(netloc, 0) + 1
+
+    def close_host(self, netloc: str):
+        """Note a run on one host ending, dropping the host's entries if it was the last"""
+        with self._lock:
+            runs = self._runs.get(netloc, 0) - 1
+            if runs > 0:
+                self._runs[netloc] = runs
+                return
+            self._runs.pop(netloc, None)
+        self.discard_host(netloc)
+
+    def discard_host(self, netloc: str):
+        """Drop every entry for one host"""
+        with self._lock:
+            for key in [key for key in self._entries if urlparse(key[1]).netloc == netloc]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._entries)}
@@ -0,0 +1,241 @@
+import functools
+import itertools
+import logging
+import threading
+from collections import OrderedDict, deque
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+from deadline import Deadline
+from events import EventSink
+from journal import CheckJournal, ScanJournal
+from metrics import CheckMetrics, ScanMetrics
+from probes import Check, CheckState, Probe, execute_func, execute_probe
+
+logger = logging.getLogger('scheduler')
+
+DEFAULT_WORKERS = 16
+
+
+class FairQueue:
+    """Round-robin queue over per-key FIFOs.
+
+    Each ``get`` takes the next item from the key that has waited longest,
+    so a module with hundreds of queued probes cannot starve one with a
+    handful. Not thread-safe on its own; callers hold their own lock.
+    """
+
+    def __init__(self):
+        self._queues = OrderedDict()
+
+    def put(self, key: Hashable, item: Any):
+        queue = self._queues.get(key)
+        if queue is None:
+            queue = self._queues[key] = deque()
+        queue.append(item)
+
+    def get(self) -> Any:
+        key, queue = next(iter(self._queues.items()))
+        item = queue.popleft()
+        del self._queues[key]
+        if queue:
+            self._queues[key] = queue
+        return item
+
+    def __len__(self):
+        return sum(len(queue) for queue in self._queues.values())
+
+    def __bool__(self):
+        return bool(self._queues)
+
+
+class _Batch:
+    """Outstanding work for one ``ThreadScheduler.run`` call.
+
+    Starts with one pending slot held by the submitter, so the batch cannot
+    complete while its probes are still being queued. ``on_done`` runs once
+    the last task has finished.
+    """
+
+    def __init__(self, on_done: Optional[Callable[[], None]] = None):
+        self.pending = 1
+        self.on_done = on_done
+        self.done = threading.Event()
+
+
+class ThreadScheduler:
+    """Runner-owned worker pool shared by every module of a run.
+
+    Replaces the per-module thread pools: all probes are queued per module
+    on a ``FairQueue`` and a fixed number of worker threads serve them in
+    round-robin order. The per-host connection cap of the ``HttpClient``
+    still applies underneath, so more workers never means more connections
+    to one host than ``pool_maxsize``.
+    """
+
+    def __init__(self, client, workers: int = DEFAULT_WORKERS):
+        self.client = client
+        self.workers = workers
+        self._queue = FairQueue()
+        self._cond = threading.Condition()
+        self._threads: List[threading.Thread] = []
+        self._batch_ids = itertools.count()
+        self._closed = False
+
+    def submit(self, key: Hashable, batch: _Batch, fn: Callable[[], None]):
+        with self._cond:
+            if self._closed:
+                raise RuntimeError('Scheduler is closed')
+            batch.pending += 1
+            self._queue.put(key, (batch, fn))
+            if len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._work, name=f'scheduler-{len(self._threads)}', daemon=True)
+                self._threads.append(thread)
+                thread.start()
+            self._cond.notify()
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._closed:
+                    self._cond.wait()
+                if not self._queue:
+                    return
+                batch, fn = self._queue.get()
+            try:
+                fn()
+            except Exception as e:
+                logger.error(f"Scheduled task failed: {e}")
+            finally:
+                self._release(batch)
+
+    def _release(self, batch: _Batch):
+        with self._cond:
+            batch.pending -= 1
+            finished = batch.pending == 0
+        if finished:
+            if batch.on_done is not None:
+                batch.on_done()
+            batch.done.set()
+
+    def run(self, modules: Dict[str, Dict[str, Check]], parallel: bool = True,
+            events: Optional[EventSink] = None, deadline: Optional[Deadline] = None,
+            module_timeout: Optional[float] = None, metrics: Optional[ScanMetrics] = None,
+            journal: Optional[ScanJournal] = None) -> Dict[str, Dict[str, Any]]:
+        """Run the checks of each module; returns findings per module and check.
+
+        With ``parallel`` every module is queued at once and modules share
+        the workers fairly; otherwise modules run one after another.
+        Progress is reported to ``events`` as it happens. Each module must
+        finish within ``module_timeout`` seconds of its start and by the
+        scan's ``deadline``; probes left at that point are skipped. Every
+        probe is measured into ``metrics`` when given. With a ``journal``
+        completed probes are journaled and those it already holds are
+        replayed instead of sent.
+        """
+        events = events or EventSink()
+        if not parallel:
+            results = {}
+            for module_name, checks in modules.items():
+                results.update(self.run({module_name: checks}, events=events, deadline=deadline,
+                                        module_timeout=module_timeout, metrics=metrics, journal=journal))
+            return results
+
+        batch_id = next(self._batch_ids)
+        batches = []
+        states = {}
+        for module_name, checks in modules.items():
+            module_events = events.bind(module=module_name)
+            module_events.emit('module_started', checks=list(checks))
+            batch = _Batch()
+            states[module_name] = self._queue_checks(
+                (batch_id, module_name), batch, checks, module_events, Deadline.child(deadline, module_timeout),
+                metrics.for_check if metrics else None, journal.for_check if journal else None, module_name
+            )
+            batch.on_done = functools.partial(module_finished, module_events, states[module_name])
+            batches.append(batch)
+            self._release(batch)
+        for batch in batches:
+            batch.done.wait()
+        return {module_name: module_results(module_states) for module_name, module_states in states.items()}
+
+    def run_module(self, checks: Dict[str, Check], key: Hashable = None,
+                   events: Optional[EventSink] = None) -> Dict[str, List]:
+        return self.run({key: checks}, events=events)[key]
+
+    def _queue_checks(self, key: Hashable, batch: _Batch, checks: Dict[str, Check],
+                      events: EventSink, deadline: Optional[Deadline],
+                      metrics: Optional[Callable[[str, str], CheckMetrics]] = None,
+                      journal: Optional[Callable[[str, str], CheckJournal]] = None,
+                      module_name: Optional[str] = None) -> Dict[str, CheckState]:
+        """Queue every probe of the given checks the journal has not seen; returns the state of each check"""
+        states = {}
+        for name, check in checks.items():
+            check_events = events.bind(check=name)
+            state = states[name] = CheckState(check, on_finding=finding_reporter(check_events),
+                                              on_retract=retraction_reporter(check_events),
+                                              deadline=deadline,
+                                              metrics=metrics(module_name, name) if metrics else None,
+                                              journal=journal(module_name, name) if journal else None)
+            state.replay()
+            if check.func is not None:
+                if None not in state.replayed:
+                    self.submit(key, batch, functools.partial(execute_func, state))
+                continue
+            for index, probe in enumerate(check.probes):
+                if index not in state.replayed:
+                    self._submit_probe(key, batch, state, index, probe)
+        return states
+
+    def _submit_probe(self, key: Hashable, batch: _Batch, state: CheckState, index, probe: Probe):
+        # Follow-ups the probe asks for join the same batch, so it cannot finish before them
+        spawn = functools.partial(self._submit_probe, key, batch, state)
+        self.submit(key, batch, functools.partial(execute_probe, self.client, state, index, probe, spawn))
+
+    def close(self):
+        """Stop the workers once the queue has drained"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def finding_reporter(events: EventSink) -> Callable[[Any], None]:
+    """Callback that reports each finding of a check as a 'finding' event"""
+    return lambda finding: events.emit('finding', finding=finding)
+
+
+def retraction_reporter(events: EventSink) -> Callable[[Any], None]:
+    """Callback that reports a finding an earlier probe's replaced as a 'finding_retracted' event"""
+    return lambda finding: events.emit('finding_retracted', finding=finding)
+
+
+def module_finished(events: EventSink, states: Dict[str, CheckState]):
+    """Report that every check of a module has completed"""
+    skipped = {name: state.skipped for name, state in states.items() if state.skipped}
+    events.emit('module_finished', findings=sum(len(state.result()) for state in states.values()),
+                **({'skipped': skipped} if skipped else {}))
+
+
+def module_results(states: Dict[str, CheckState]) -> Dict[str, Any]:
+    """Findings per check, plus a '_skipped' section naming the work a deadline cut off"""
+    results: Dict[str, Any] = {name: state.result() for name, state in states.items()}
+    skipped = {name: state.skipped for name, state in states.items() if state.skipped}
+    if skipped:
+        results['_skipped'] = skipped
+    return results
+
+
+def run_checks(client, checks: Dict[str, Check], scheduler: Optional[ThreadScheduler] = None,
+               workers: int = DEFAULT_WORKERS) -> Dict[str, List]:
+    """Run a module's checks on the shared scheduler, or on a private one"""
+    if scheduler is not None:
+        return scheduler.run_module(checks)
+    with ThreadScheduler(client, workers=workers) as private:
+        return private.run_module(checks)
@@ -0,0 +1,176 @@
+import functools
+import logging
+import re
+from collections import defaultdict
+from typing import Dict, Iterable, List, NamedTuple, Optional, Pattern, Sequence, Set, Tuple
+
+logger = logging.getLogger('signatures')
+
+DEFAULT_PACK_CACHE_SIZE = 256
+
+
+class Signature(NamedTuple):
+    """One thing to look for in a response body.
+
+    ``pattern`` is a literal string unless ``regex`` is set. Regex patterns
+    may use groups but not numbered backreferences, since they are embedded
+    in a larger expression.
+    """
+    name: str
+    pattern: str
+    ignore_case: bool = False
+    regex: bool = False
+
+
+class Hit(NamedTuple):
+    """A signature match: the signature name and the matched span of the body"""
+    signature: str
+    start: int
+    end: int
+    text: str
+
+
+class _Expression(NamedTuple):
+    """The compiled signatures of one case mode"""
+    expression: Pattern
+    # Group name of each alternative to its signature name
+    groups: Dict[str, str]
+    # For each literal, the other literals inside it as (name, offset, length)
+    contained: Dict[str, List[Tuple[str, int, int]]]
+    # For each literal, the literals that can start inside its hit and run past it, as (name, offset)
+    overlapping: Dict[str, List[Tuple[str, int]]]
+    # Each signature on its own, to look for the hits the combined expression steps over
+    patterns: Dict[str, Pattern]
+    regexes: Tuple[str, ...]
+
+
+class SignaturePack:
+    """A set of signatures compiled into one expression per case mode.
+
+    Case-sensitive signatures are matched against the body as is, the
+    case-insensitive ones against a single lowercased copy, so a body is
+    read at most twice however many signatures the pack holds. Literals are
+    tried longest first. The single pass steps over hits that start inside
+    one already found, so those are looked for around each hit: literals
+    inside a longer literal's hit (such as 'sql' inside 'mysql') or running
+    on past it (such as 'error' after 'stack trace' in 'stack tracerror')
+    at the offsets worked out when the pack is built, and regex signatures
+    at every offset of the hit. Build packs with ``compile_pack`` so equal
+    definitions share one compiled pack.
+
+    A pack holds the signatures of one check, not of a whole run: each
+    probe's body is only evaluated by the check that sent it.
+    """
+
+    def __init__(self, signatures: Sequence[Signature]):
+        self.signatures = tuple(signatures)
+        if len({signature.name for signature in self.signatures}) != len(self.signatures):
+            raise ValueError('Signature names must be unique')
+        self._exact = self._compile([s for s in self.signatures if not s.ignore_case], 0)
+        self._folded = self._compile([s for s in self.signatures if s.ignore_case], 0)
+        # Used instead of _folded when lowercasing changes the body's length,
+        # which would shift every offset
+        self._folded_fallback = self._compile([s for s in self.signatures if s.ignore_case], re.IGNORECASE)
+
+    @staticmethod
+    def _compile(signatures: List[Signature], flags: int) -> Optional[_Expression]:
+        """Combined expression and overlap tables for one case mode"""
+        if not signatures:
+            return None
+        literals = sorted((s for s in signatures if not s.regex), key=lambda s: len(s.pattern), reverse=True)
+        regexes = [s for s in signatures if s.regex]
+        groups: Dict[str, str] = {}
+        patterns = {}
+        alternatives = []
+        for index, signature in enumerate(literals + regexes):
+            group = f'_s{index}'
+            groups[group] = signature.name
+            if signature.regex:
+                body = f'(?i:{signature.pattern})' if signature.ignore_case else signature.pattern
+            else:
+                body = re.escape(signature.pattern.lower() if signature.ignore_case else signature.pattern)
+            alternatives.append(f'(?P<{group}>{body})')
+            patterns[signature.name] = re.compile(body, flags)
+
+        contained: Dict[str, List[Tuple[str, int, int]]] = defaultdict(list)
+        overlapping: Dict[str, List[Tuple[str, int]]] = defaultdict(list)
+        for outer in literals:
+            outer_text = outer.pattern.lower() if outer.ignore_case else outer.pattern
+            for inner in literals:
+                inner_text = inner.pattern.lower() if inner.ignore_case else inner.pattern
+                if inner is outer:
+                    continue
+                offset = outer_text.find(inner_text)
+                while offset != -1:
+                    contained[outer.name].append((inner.name, offset, len(inner_text)))
+                    offset = outer_text.find(inner_text, offset + 1)
+                for offset in range(1, len(outer_text)):
+                    if len(outer_text) - offset < len(inner_text) and inner_text.startswith(outer_text[offset:]):
+                        overlapping[outer.name].append((inner.name, offset))
+        return _Expression(re.compile('|'.join(alternatives), flags), groups, dict(contained), dict(overlapping),
+                           patterns, tuple(s.name for s in regexes))
+
+    @staticmethod
+    def _matches(compiled: _Expression, text: str, source: str) -> Iterable[Hit]:
+        expression, groups, contained, overlapping, patterns, regexes = compiled
+        for match in expression.finditer(text):
+            name = groups[match.lastgroup]
+            start, end = match.span()
+            yield Hit(name, start, end, source[start:end])
+            for inner, offset, length in contained.get(name, ()):
+                inner_start, inner_end = start + offset, start + offset + length
+                yield Hit(inner, inner_start, inner_end, source[inner_start:inner_end])
+            if not regexes and name not in overlapping:
+                continue
+            if name in regexes:
+                others = [other for other in patterns if other != name]
+                candidates = [(other, offset) for offset in range(start, end) for other in others]
+            else:
+                candidates = [(inner, start + offset) for inner, offset in overlapping.get(name, ())]
+                candidates.extend((other, offset) for offset in range(start, end) for other in regexes)
+            for other, offset in candidates:
+                found = patterns[other].match(text, offset)
+                if found and found.end() > offset:
+                    yield Hit(other, offset, found.end(), source[offset:found.end()])
+
+    def _folded_input(self, text: str) -> Tuple[_Expression, str]:
+        """Expression and subject for the case-insensitive signatures"""
+        folded = text.lower()
+        if len(folded) == len(text):
+            return self._folded, folded
+        return self._folded_fallback, text
+
+    def scan(self, text: str) -> List[Hit]:
+        """Every hit in ``text``, ordered by offset"""
+        hits = []
+        if self._exact:
+            hits.extend(self._matches(self._exact, text, text))
+        if self._folded:
+            compiled, subject = self._folded_input(text)
+            hits.extend(self._matches(compiled, subject, text))
+        hits.sort(key=lambda hit: (hit.start, -hit.end))
+        return hits
+
+    def found(self, text: str) -> Set[str]:
+        """Names of the signatures present in ``text``"""
+        return {hit.signature for hit in self.scan(text)}
+
+    def search(self, text: str) -> bool:
+        """Whether any signature is present, stopping at the first hit"""
+        if self._exact and self._exact.expression.search(text):
+            return True
+        if self._folded:
+            compiled, subject = self._folded_input(text)
+            return compiled.expression.search(subject) is not None
+        return False
+
+@functools.lru_cache(maxsize=DEFAULT_PACK_CACHE_SIZE)
+def compile_pack(signatures: Tuple[Signature, ...]) -> SignaturePack:
+    """Compiled pack for a tuple of signatures, shared by every run in the process"""
+    logger.debug(f"Compiling signature pack of {len(signatures)} signatures")
+    return SignaturePack(signatures)
+
+
+def literals(*needles: str, ignore_case: bool = False) -> SignaturePack:
+    """Pack of literal signatures, each named after its text"""
+    return compile_pack(tuple(Signature(needle, needle, ignore_case) for needle in dict.fromkeys(needles)))
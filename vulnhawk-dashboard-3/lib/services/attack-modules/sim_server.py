@@ -0,0 +1,254 @@
+"""Simulated vulnerable target for benchmarks and manual runs.
+
+    python sim_server.py --port 8080 --latency 0.05 --rate-limit 100
+"""
+import argparse
+import hashlib
+import json
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlparse
+
+DEFAULT_BODY_SIZE = 4096
+DEFAULT_LARGE_BODY_SIZE = 64 * 1024 * 1024
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Paths the path-based checks look for, answered with 200
+EXPOSED_PATHS = {
+    '/.git/config', '/.env', '/config.php', '/database.sql',
+    '/admin', '/dashboard', '/user/profile', '/api/user',
+    '/api/export', '/api/download', '/api/data', '/api/backup',
+    '/api/internal', '/admin/internal', '/internal', '/network',
+    '/api/cron', '/api/scheduled', '/api/tasks', '/admin/settings',
+    '/api/users', '/api/settings', '/api/admin'
+}
+# Served as a large streamed download, to exercise body size caps
+LARGE_PATHS = {'/backup.zip'}
+# Links and forms for the crawler, leading to the vulnerable endpoints
+HOME_PAGE = (
+    '<a href="/?q=home">Home</a> <a href="/?search=latest#top">Latest</a> <a href="/docs/guide.pdf">Guide</a>'
+    '<form action="/submit" method="post"><input name="name"><input name="email" type="email">'
+    '<input type="submit" name="send"></form>'
+    '<form action="/upload" method="post" enctype="multipart/form-data"><input type="file" name="file"></form>'
+    '<p>debug mode, version 1.0</p>'
+)
+SPA_SHELL = '<html><head><script src="/app.js"></script></head><body><div id="app"></div></body></html>'
+SQL_ERROR = "You have an error in your SQL syntax; check the manual that corresponds to your MySQL server"
+COMMAND_OUTPUT = "uid=0(root) gid=0(root) groups=0(root)\nroot:x:0:0:root:/root:/bin/bash"
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Scanners drop connections mid-body on purpose (capped reads)
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class _TokenBucket:
+    """Global request budget behind the simulated 429 responses"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+class SimulatedTarget:
+    """Vulnerable stand-in web application on a local port.
+
+    ``latency`` (plus up to ``jitter``) seconds pass before each answer,
+    pages are padded to ``body_size`` bytes, and with ``rate_limit`` set
+    requests over that many per second (after a burst of ``burst``) get a
+    429 with a ``Retry-After`` of ``retry_after`` seconds. With
+    ``catch_all`` unknown paths get a small single-page-app shell with 200
+    instead of a 404, as SPA hosts do. With ``etag`` pages carry an
+    ``ETag`` and conditional requests for unchanged pages get a 304, as
+    for cacheable content. Request counts by status are kept
+    in ``stats``. Use as a context manager; the server
+    runs on a daemon thread.
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency: float = 0.0, jitter: float = 0.0,
+                 body_size: int = DEFAULT_BODY_SIZE, large_body_size: int = DEFAULT_LARGE_BODY_SIZE,
+                 rate_limit: Optional[float] = None, burst: Optional[float] = None, retry_after: int = 1,
+                 catch_all: bool = False, etag: bool = False):
+        self.latency = latency
+        self.jitter = jitter
+        self.body_size = body_size
+        self.large_body_size = large_body_size
+        self.retry_after = retry_after
+        self.catch_all = catch_all
+        self.etag = etag
+        self.bucket = _TokenBucket(rate_limit, burst or rate_limit) if rate_limit else None
+        self.stats: Counter = Counter()
+        self._stats_lock = threading.Lock()
+        self._server = _Server((host, port), self._handler())
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def start(self) -> 'SimulatedTarget':
+        self._thread = threading.Thread(target=self.serve_forever, name='sim-server', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def count(self, status: int):
+        with self._stats_lock:
+            self.stats['requests'] += 1
+            self.stats[str(status)] += 1
+
+    def page(self, text: str) -> str:
+        padding = max(0, self.body_size - len(text) - 30)
+        return f'<html><body>{text}<!-- {"x" * padding} --></body></html>'
+
+    def respond(self, method: str, path: str, query: Dict, body: bytes) -> Tuple[int, Dict[str, str], str]:
+        """Status, headers and body for one request"""
+        if path == '/' and method in ('GET', 'HEAD'):
+            if 'q' in query:
+                return 200, {}, self.page(query['q'][0])
+            if 'search' in query:
+                return 500, {}, self.page(SQL_ERROR)
+            headers = {'Set-Cookie': 'session=abc123; Path=/', 'Server': 'Apache/2.4.41', 'X-Powered-By': 'PHP/7.4.3'}
+            return 200, headers, self.page(HOME_PAGE)
+        if path == '/login' and method == 'POST':
+            form = parse_qs(body.decode('utf-8', 'replace'))
+            if form.get('username') == ['admin'] and form.get('password') == ['admin']:
+                return 200, {}, self.page('Welcome admin')
+            return 401, {}, self.page('Invalid credentials')
+        if path == '/api/search' and method == 'POST':
+            return 200, {'Content-Type': 'application/json'}, json.dumps([{'id': 1, 'user': 'admin'}])
+        if path == '/api/execute':
+            return 200, {}, COMMAND_OUTPUT
+        if path in ('/upload', '/submit') and method == 'POST':
+            return 200, {}, self.page('Saved')
+        if path in EXPOSED_PATHS:
+            return 200, {}, self.page('secret=hunter2')
+        if self.catch_all:
+            return 200, {}, SPA_SHELL
+        return 404, {}, self.page('Not found')
+
+    def _handler(self):
+        target = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def _serve(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                if target.latency or target.jitter:
+                    time.sleep(target.latency + random.uniform(0, target.jitter))
+                if target.bucket is not None and not target.bucket.take():
+                    return self._send(429, {'Retry-After': str(target.retry_after)}, 'Too many requests')
+                url = urlparse(self.path)
+                path = unquote(url.path)
+                if path in LARGE_PATHS:
+                    return self._stream(target.large_body_size)
+                query = parse_qs(url.query, keep_blank_values=True)
+                status, headers, text = target.respond(self.command, path, query, body)
+                if target.etag and status == 200 and self.command in ('GET', 'HEAD'):
+                    headers['ETag'] = f'"{hashlib.sha1(text.encode()).hexdigest()[:16]}"'
+                    if self.headers.get('If-None-Match') == headers['ETag']:
+                        return self._send(304, {'ETag': headers['ETag']}, '')
+                self._send(status, headers, text)
+
+            def _send(self, status: int, headers: Dict[str, str], text: str):
+                data = text.encode()
+                target.count(status)
+                self.send_response(status)
+                headers.setdefault('Content-Type', 'text/html; charset=utf-8')
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                if self.command != 'HEAD':
+                    self.wfile.write(data)
+
+            def _stream(self, size: int):
+                target.count(200)
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/zip')
+                self.send_header('Content-Length', str(size))
+                self.end_headers()
+                if self.command == 'HEAD':
+                    return
+                chunk = b'\0' * STREAM_CHUNK_SIZE
+                try:
+                    for offset in range(0, size, STREAM_CHUNK_SIZE):
+                        self.wfile.write(chunk[:size - offset])
+                except OSError:
+                    # The client stopped reading, as a capped scan should
+                    self.close_connection = True
+
+            do_GET = do_HEAD = do_POST = _serve
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='sim_server.py', description='Simulated vulnerable scan target')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds before each answer')
+    parser.add_argument('--jitter', type=float, default=0.0, help='extra random latency, up to this many seconds')
+    parser.add_argument('--body-size', type=int, default=DEFAULT_BODY_SIZE, help='page size in bytes')
+    parser.add_argument('--large-body-size', type=int, default=DEFAULT_LARGE_BODY_SIZE,
+                        help='size of the large downloads in bytes')
+    parser.add_argument('--rate-limit', type=float, help='requests per second before answering 429')
+    parser.add_argument('--burst', type=float, help='requests allowed at once before the rate limit applies')
+    parser.add_argument('--catch-all', action='store_true', help='answer unknown paths with 200, like an SPA host')
+    parser.add_argument('--etag', action='store_true', help='tag pages with an ETag and answer 304 to unchanged ones')
+    args = parser.parse_args()
+
+    target = SimulatedTarget(args.host, args.port, latency=args.latency, jitter=args.jitter,
+                             body_size=args.body_size, large_body_size=args.large_body_size,
+                             rate_limit=args.rate_limit, burst=args.burst, catch_all=args.catch_all,
+                             etag=args.etag)
+    print(f'Serving simulated target on {target.url}', flush=True)
+    try:
+        target.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        target.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+import hashlib
+import logging
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+from urllib.parse import urljoin, urlparse
+
+from http_client import HttpClient
+
+logger = logging.getLogger('soft404')
+
+DEFAULT_TTL = 15 * 60
+# Enough of a page to fingerprint it; catch-all pages are rarely larger
+SAMPLE_MAX_BODY = 64 * 1024
+# Bits two simhashes may differ in and still be the same page
+SIMHASH_DISTANCE = 6
+# Bytes a page may grow per character of path it echoes
+ECHO_SLACK = 2
+LENGTH_SLACK = 16
+
+_WORDS = re.compile(r'\w+')
+
+
+class Fingerprint(NamedTuple):
+    """What a response looks like, without its body"""
+    status: int
+    type: str
+    length: Optional[int]
+    path_length: int
+    hash: Optional[str]
+    simhash: Optional[int]
+
+
+def simhash(text: str) -> int:
+    """64-bit simhash of the words of ``text``; similar pages differ in few bits"""
+    weights = [0] * 64
+    for word in _WORDS.findall(text.lower()):
+        value = int.from_bytes(hashlib.blake2b(word.encode(), digest_size=8).digest(), 'little')
+        for bit in range(64):
+            weights[bit] += 1 if value >> bit & 1 else -1
+    return sum(1 << bit for bit in range(64) if weights[bit] > 0)
+
+
+def fingerprint(url: str, response) -> Fingerprint:
+    """Fingerprint of a response; body hashes only when the body was read in full"""
+    content_type = response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+    length = response.headers.get('Content-Length')
+    body = response.method != 'HEAD' and bool(response.content) and not response.truncated
+    if body:
+        length = len(response.content)
+    return Fingerprint(
+        response.status_code,
+        content_type,
+        int(length) if length is not None and str(length).isdigit() else None,
+        len(urlparse(url).path),
+        hashlib.sha1(response.content).hexdigest() if body else None,
+        simhash(response.text) if body else None
+    )
+
+
+class Baseline:
+    """How a host answers paths that do not exist.
+
+    Built from a few requests for random paths. ``matches`` tells whether a
+    response looks like those answers (a soft 404: a catch-all or SPA page
+    served with 200) by comparing fingerprints only, so classifying a probe
+    costs no request. Bodies are compared by hash and simhash when both
+    were read; status-only probes fall back to status, content type and a
+    length that may grow with the echoed path; an answer of unknown length
+    does not match. Without samples nothing matches. Travels as ``to_dict`` output, like crawled endpoints.
+    """
+
+    def __init__(self, samples: List[Fingerprint]):
+        self.samples = samples
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Baseline':
+        return cls([Fingerprint(*sample) for sample in data.get('samples', [])])
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'samples': [list(sample) for sample in self.samples]}
+
+    def matches(self, url: str, response) -> bool:
+        probe = fingerprint(url, response)
+        return any(self._same(sample, probe) for sample in self.samples)
+
+    @staticmethod
+    def _same(sample: Fingerprint, probe: Fingerprint) -> bool:
+        if sample.status != probe.status or sample.type != probe.type:
+            return False
+        if sample.hash is not None and probe.hash is not None:
+            return (sample.hash == probe.hash
+                    or bin(sample.simhash ^ probe.simhash).count('1') <= SIMHASH_DISTANCE)
+        if sample.length is None or probe.length is None:
+            # Same status and type and nothing else to go on: report it rather than drop a real page
+            return False
+        slack = LENGTH_SLACK + ECHO_SLACK * abs(sample.path_length - probe.path_length)
+        return abs(sample.length - probe.length) <= slack
+
+
+class BaselineCache:
+    """Per-host baselines, fetched on first use and reused for ``ttl`` seconds.
+
+    One process-wide instance (``baselines``) serves every run, so a batch
+    or worker fetches each host's baseline once per TTL. Concurrent runs
+    against the same host wait for the first fetch instead of repeating it.
+    """
+
+    def __init__(self, ttl: float = DEFAULT_TTL):
+        self.ttl = ttl
+        self._baselines: Dict[str, tuple] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def get(self, client: HttpClient, target: str) -> Baseline:
+        parsed = urlparse(target)
+        host = f'{parsed.scheme}://{parsed.netloc}'
+        with self._lock:
+            lock = self._locks.setdefault(host, threading.Lock())
+        with lock:
+            cached = self._baselines.get(host)
+            if cached is not None and time.monotonic() - cached[0] < self.ttl:
+                return cached[1]
+            baseline = Baseline(self._sample(client, host))
+            self._baselines[host] = (time.monotonic(), baseline)
+            logger.info(f"Baseline for {host}: {[sample.status for sample in baseline.samples]}")
+            return baseline
+
+    @staticmethod
+    def _sample(client: HttpClient, host: str) -> List[Fingerprint]:
+        # Made up but the same for a host on every scan, so a replayed scan asks for the same paths
+        token = hashlib.sha1(f'soft404 {host}'.encode()).hexdigest()[:12]
+        # A bare name, a nested path and a script, which catch-all rules often treat differently
+        paths = [f'/{token}', f'/{token}/{token[:6]}', f'/{token}.php']
+        samples = []
+        for path in paths:
+            url = urljoin(host, path)
+            try:
+                samples.append(fingerprint(url, client.get(url, max_body=SAMPLE_MAX_BODY)))
+            except Exception as e:
+                logger.debug(f"Baseline request {url} failed: {e}")
+        return samples
+
+    def clear(self):
+        with self._lock:
+            self._baselines.clear()
+
+
+baselines = BaselineCache()
+
+
+def exists(baseline: Optional[Baseline]) -> Callable[[Any, Any], bool]:
+    """Match rule: the path answered 200 and the answer is not the host's soft 404"""
+    def rule(probe, response) -> bool:
+        if response.status_code != 200:
+            return False
+        return baseline is None or not baseline.matches(probe.url, response)
+    return rule
@@ -0,0 +1,48 @@
+# Run from the module directory or this one: python -m pytest -q
+import importlib
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+MODULE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The scanner modules import each other by bare name, as when run from their directory
+sys.path.insert(0, MODULE_DIR)
+
+# pytest imports the module directory's __init__.py as a top-level '__init__' module, since
+# 'attack-modules' is not a valid package name, and its relative imports then fail. Hand it
+# the package imported under its directory name instead.
+sys.path.insert(1, os.path.dirname(MODULE_DIR))
+sys.modules.setdefault('__init__', importlib.import_module(os.path.basename(MODULE_DIR)))
+
+
+class _Target(BaseHTTPRequestHandler):
+    """Answers ``?body=...&status=...&delay=...`` with that body and status after that delay"""
+
+    def do_GET(self):
+        query = {name: values[0] for name, values in parse_qs(urlparse(self.path).query).items()}
+        time.sleep(float(query.get('delay', 0)))
+        body = query.get('body', 'ok').encode()
+        self.send_response(int(query.get('status', 200)))
+        self.send_header('Content-Type', 'text/plain')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def target():
+    """Base URL of a local HTTP server answering as its query string asks"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _Target)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,62 @@
+import pytest
+import requests
+
+from archive import ArchiveReader, ArchiveWriter, request_key
+from http_client import HttpClient, HttpResponse
+
+
+def record(archive: str, target: str, max_body=None, *paths: str):
+    with HttpClient(max_body=max_body, recorder=ArchiveWriter(archive)) as client:
+        return [client.get(f'{target}{path}') for path in paths]
+
+
+def test_a_replay_answers_as_the_recording_did(target, tmp_path):
+    path = str(tmp_path / 'scan.vharc')
+    recorded = record(path, target, None, '/?body=one', '/?body=two&status=404')
+    with HttpClient(replay=ArchiveReader(path)) as client:
+        replayed = [client.get(f'{target}/?body=one'), client.get(f'{target}/?body=two&status=404')]
+        with pytest.raises(requests.ConnectionError):
+            client.get(f'{target}/?body=three')
+        assert client.replay.misses == 1
+    assert [(r.status_code, r.text) for r in replayed] == [(r.status_code, r.text) for r in recorded]
+
+
+def test_a_replay_with_a_smaller_cap_cuts_the_recorded_body(target, tmp_path):
+    path = str(tmp_path / 'scan.vharc')
+    record(path, target, 1024, '/?body=0123456789')
+    with HttpClient(max_body=4, replay=ArchiveReader(path)) as client:
+        response = client.get(f'{target}/?body=0123456789')
+    assert response.content == b'0123'
+    assert response.truncated
+    with HttpClient(max_body=None, replay=ArchiveReader(path)) as client:
+        response = client.get(f'{target}/?body=0123456789')
+    assert response.content == b'0123456789'
+    assert not response.truncated
+
+
+def test_a_request_of_its_own_cap_keeps_its_own_answer():
+    assert request_key('GET', 'http://a.test/', {}) == request_key('get', 'http://a.test/', {'timeout': 5})
+    assert request_key('GET', 'http://a.test/', {}) != request_key('GET', 'http://a.test/', {'max_body': 0})
+
+
+def test_repeated_requests_are_answered_in_order_then_repeat_the_last(tmp_path):
+    path = str(tmp_path / 'scan.vharc')
+    with ArchiveWriter(path) as writer:
+        writer.add('login', 'POST', 'http://a.test/login', error=ConnectionError('refused'))
+        writer.add('login', 'POST', 'http://a.test/login', error=TimeoutError('slow'))
+    with ArchiveReader(path) as reader:
+        answers = [reader.get('login')[0]['error'] for _ in range(3)]
+    assert answers == ['ConnectionError: refused', 'TimeoutError: slow', 'TimeoutError: slow']
+
+
+def test_an_unfinished_recording_is_still_readable(tmp_path):
+    path = str(tmp_path / 'scan.vharc')
+    writer = ArchiveWriter(path)
+    response = HttpResponse(200, {'Content-Type': 'text/plain'}, b'kept', 'http://a.test/')
+    writer.add('page', 'GET', 'http://a.test/', response)
+    # The process died before close: the records are on disk, the index is not
+    writer._file.flush()
+    with ArchiveReader(path) as reader:
+        assert len(reader) == 1
+        meta, body = reader.get('page')
+    assert (meta['status'], meta['headers'], body) == (200, {'Content-Type': 'text/plain'}, b'kept')
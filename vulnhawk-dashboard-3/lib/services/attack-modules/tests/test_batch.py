@@ -0,0 +1,13 @@
+import io
+import json
+
+from batch import BatchRunner
+from http_client import HttpClient
+
+
+def test_an_unreachable_target_fails_the_batch():
+    out = io.StringIO()
+    with HttpClient(timeout=2) as client:
+        failed = BatchRunner(['http://127.0.0.1:1'], ['auth'], client, out=out, soft404=False).run()
+    assert failed == 1
+    assert 'All' in json.loads(out.getvalue())['results']['error']
@@ -0,0 +1,8 @@
+from attack_runner import history_options, module_options
+from distributed import build_parser
+
+
+def test_coordinator_options_build_module_options():
+    args = build_parser().parse_args(['coordinator', '--queue', 'q.db', 'http://h', 'auth'])
+    assert history_options(args) is None
+    assert 'recon' in module_options(args)
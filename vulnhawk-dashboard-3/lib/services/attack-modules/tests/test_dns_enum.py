@@ -0,0 +1,65 @@
+import socketserver
+import threading
+
+import dns.message
+import dns.rcode
+import dns.rrset
+import pytest
+
+from dns_enum import DnsCache, SubdomainEnumerator
+
+# What the stub name server knows; '*.wild.example.test' answers any label under that zone
+RECORDS = {
+    'www.example.test.': '10.0.0.1',
+    'mail.example.test.': '10.0.0.2',
+    'app.wild.example.test.': '10.0.0.3',
+}
+WILDCARD_ZONE = '.wild.example.test.'
+WILDCARD_ADDRESS = '10.9.9.9'
+
+
+class _StubDns(socketserver.BaseRequestHandler):
+    def handle(self):
+        data, sock = self.request
+        query = dns.message.from_wire(data)
+        response = dns.message.make_response(query)
+        name = query.question[0].name.to_text().lower()
+        address = RECORDS.get(name) or (WILDCARD_ADDRESS if name.endswith(WILDCARD_ZONE) else None)
+        if address is None:
+            response.set_rcode(dns.rcode.NXDOMAIN)
+            response.authority.append(dns.rrset.from_text(
+                'example.test.', 300, 'IN', 'SOA', 'ns.example.test. admin.example.test. 1 3600 600 86400 60'
+            ))
+        else:
+            response.answer.append(dns.rrset.from_text(name, 300, 'IN', 'A', address))
+        sock.sendto(response.to_wire(), self.client_address)
+
+
+@pytest.fixture
+def stub_dns():
+    server = socketserver.ThreadingUDPServer(('127.0.0.1', 0), _StubDns)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server.server_address[1]
+    server.shutdown()
+    server.server_close()
+
+
+def enumerator(port: int) -> SubdomainEnumerator:
+    return SubdomainEnumerator(nameservers=['127.0.0.1'], port=port, window=4, cache=DnsCache())
+
+
+def test_names_that_resolve_are_found(stub_dns):
+    found = enumerator(stub_dns).enumerate('example.test', ['www', 'mail', 'ftp', 'vpn'])
+    assert found == ['mail.example.test', 'www.example.test']
+
+
+def test_names_resolving_to_the_wildcard_only_are_dropped(stub_dns):
+    found = enumerator(stub_dns).enumerate('wild.example.test', ['app', 'anything', 'nothing-here'])
+    assert found == ['app.wild.example.test']
+
+
+def test_answers_are_cached(stub_dns):
+    scanner = enumerator(stub_dns)
+    scanner.enumerate('example.test', ['www', 'ftp'])
+    scanner.enumerate('example.test', ['www', 'ftp'])
+    assert scanner.stats()['cache_hits'] == 2
@@ -0,0 +1,40 @@
+import pytest
+
+from async_engine import AsyncEngine
+from http_client import HttpClient
+from probes import Check, Probe
+from scheduler import ThreadScheduler
+
+
+def run(engine: str, check: Check):
+    with HttpClient() as client:
+        if engine == 'asyncio':
+            return AsyncEngine(client, concurrency=8).run({'m': {'c': check}})['m']['c']
+        with ThreadScheduler(client, workers=8) as scheduler:
+            return scheduler.run({'m': {'c': check}})['m']['c']
+
+
+def hits(target: str, stop):
+    # The first hit answers last, so a concurrent engine sees the later hit first
+    probes = [
+        Probe('GET', f'{target}/?body=hit-0&delay=0.3', group='g'),
+        Probe('GET', f'{target}/?body=miss-1', group='g'),
+        Probe('GET', f'{target}/?body=hit-2', group='g'),
+        Probe('GET', f'{target}/?body=hit-3', group='h')
+    ]
+    return Check(probes, lambda probe, response: [response.text] if 'hit' in response.text else [], stop=stop)
+
+
+@pytest.mark.parametrize('engine', ['thread', 'asyncio'])
+def test_every_hit_is_kept_without_a_stop_policy(target, engine):
+    assert run(engine, hits(target, None)) == ['hit-0', 'hit-2', 'hit-3']
+
+
+@pytest.mark.parametrize('engine', ['thread', 'asyncio'])
+def test_each_group_keeps_its_first_hit_in_probe_order(target, engine):
+    assert run(engine, hits(target, 'group')) == ['hit-0', 'hit-3']
+
+
+@pytest.mark.parametrize('engine', ['thread', 'asyncio'])
+def test_the_check_keeps_its_first_hit_in_probe_order(target, engine):
+    assert run(engine, hits(target, 'check')) == ['hit-0']
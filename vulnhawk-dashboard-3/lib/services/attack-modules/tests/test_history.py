@@ -0,0 +1,68 @@
+from history import ScanHistory
+from http_client import HttpResponse
+from probes import Check, Probe
+
+
+def response(status=200, body=b'<html>page</html>', **headers) -> HttpResponse:
+    return HttpResponse(status, {'ETag': '"v1"', **headers}, body, 'http://h/', method='GET')
+
+
+def frame_check() -> Check:
+    def evaluate(probe, response):
+        return [] if 'X-Frame-Options' in response.headers else [{'type': 'clickjacking'}]
+    return Check([Probe('GET', 'http://h/')], evaluate)
+
+
+def body_check() -> Check:
+    return Check([Probe('GET', 'http://h/')], lambda probe, response: [{'type': 'page'}] if b'page' in response.content
+                 else [])
+
+
+def scan(history: ScanHistory, check: Check, answer: HttpResponse):
+    wrapped = history.wrap('client', 'check', check, 'context')
+    probe = wrapped.probes[0]
+    return probe, wrapped.evaluate(probe, answer)
+
+
+def test_a_body_check_sends_a_conditional_request_and_reuses_its_verdict_on_304(tmp_path):
+    path = str(tmp_path / 'history.json')
+    history = ScanHistory(path, 'http://h/')
+    assert scan(history, body_check(), response())[1] == [{'type': 'page'}]
+    history.save()
+
+    rescan = ScanHistory(path, 'http://h/')
+    probe, findings = scan(rescan, body_check(), response(304, b''))
+    assert probe.kwargs['headers']['If-None-Match'] == '"v1"'
+    assert findings == [{'type': 'page'}]
+    assert rescan.stats()['revalidated'] == 1
+
+
+def test_a_header_check_is_evaluated_again_when_the_headers_it_read_change(tmp_path):
+    path = str(tmp_path / 'history.json')
+    history = ScanHistory(path, 'http://h/')
+    assert scan(history, frame_check(), response())[1] == [{'type': 'clickjacking'}]
+    history.save()
+
+    rescan = ScanHistory(path, 'http://h/')
+    probe, findings = scan(rescan, frame_check(), response(**{'X-Frame-Options': 'DENY'}))
+    assert 'headers' not in probe.kwargs
+    assert findings == []
+    assert rescan.stats()['reused'] == 0
+
+
+def test_a_header_check_reuses_its_verdict_while_the_headers_stay_the_same(tmp_path):
+    path = str(tmp_path / 'history.json')
+    history = ScanHistory(path, 'http://h/')
+    scan(history, frame_check(), response())
+    history.save()
+
+    rescan = ScanHistory(path, 'http://h/')
+    assert scan(rescan, frame_check(), response())[1] == [{'type': 'clickjacking'}]
+    assert rescan.stats()['reused'] == 1
+
+
+def test_a_changed_module_context_discards_the_stored_verdicts(tmp_path):
+    history = ScanHistory(str(tmp_path / 'history.json'), 'http://h/')
+    scan(history, body_check(), response())
+    wrapped = history.wrap('client', 'check', body_check(), 'other context')
+    assert 'headers' not in wrapped.probes[0].kwargs
@@ -0,0 +1,69 @@
+import json
+
+from http_client import HttpClient
+from journal import ScanJournal
+from probes import Check, Probe
+from scheduler import ThreadScheduler
+
+
+def scan(target: str, journal: ScanJournal, evaluated: list, stop=None):
+    def evaluate(probe, response):
+        evaluated.append(response.text)
+        return [response.text] if 'hit' in response.text else []
+
+    probes = [Probe('GET', f'{target}/?body={body}') for body in ('hit-0', 'miss-1', 'hit-2', 'miss-3')]
+    with HttpClient() as client, ThreadScheduler(client, workers=4) as scheduler:
+        results = scheduler.run({'m': {'c': Check(probes, evaluate, stop=stop)}}, journal=journal)
+    journal.close()
+    return results['m']['c']
+
+
+def test_a_resumed_scan_replays_its_findings_without_sending_probes(target, tmp_path):
+    path = str(tmp_path / 'scan.jsonl')
+    evaluated = []
+    assert scan(target, ScanJournal(path, target, ['m']), evaluated) == ['hit-0', 'hit-2']
+    assert len(evaluated) == 4
+
+    evaluated.clear()
+    journal = ScanJournal(path, target, ['m'], resume=True)
+    assert journal.replayed == 4
+    assert scan(target, journal, evaluated) == ['hit-0', 'hit-2']
+    assert evaluated == []
+
+
+def test_a_crash_resumes_with_the_probes_it_did_not_journal(target, tmp_path):
+    path = str(tmp_path / 'scan.jsonl')
+    scan(target, ScanJournal(path, target, ['m']), [])
+    with open(path) as f:
+        lines = f.read().splitlines()
+    entries = [json.loads(line) for line in lines[1:]]
+    kept = [line for line, entry in zip(lines[1:], entries) if entry['index'] in (0, 1)]
+    # Probes 0 and 1 completed, then the process died halfway through a line
+    with open(path, 'w') as f:
+        f.write('\n'.join([lines[0]] + kept) + '\n{"module": "m", "che')
+
+    evaluated = []
+    journal = ScanJournal(path, target, ['m'], resume=True)
+    assert journal.replayed == 2
+    assert scan(target, journal, evaluated) == ['hit-0', 'hit-2']
+    assert sorted(evaluated) == ['hit-2', 'miss-3']
+
+
+def test_a_replayed_hit_applies_the_stop_policy(target, tmp_path):
+    path = str(tmp_path / 'scan.jsonl')
+    assert scan(target, ScanJournal(path, target, ['m']), [], stop='check') == ['hit-0']
+
+    evaluated = []
+    assert scan(target, ScanJournal(path, target, ['m'], resume=True), evaluated, stop='check') == ['hit-0']
+    assert evaluated == []
+
+
+def test_another_scans_journal_is_started_over(target, tmp_path):
+    path = str(tmp_path / 'scan.jsonl')
+    scan(target, ScanJournal(path, target, ['m']), [])
+
+    evaluated = []
+    journal = ScanJournal(path, 'http://other.test', ['m'], resume=True)
+    assert journal.replayed == 0
+    assert scan(target, journal, evaluated) == ['hit-0', 'hit-2']
+    assert len(evaluated) == 4
@@ -0,0 +1,38 @@
+from port_scan import MIN_SHARD_SIZE, TOP_100_PORTS, PortCache, shard, shard_size
+
+
+def test_the_top_100_ports_are_spread_over_every_worker():
+    size = shard_size(len(TOP_100_PORTS), 8)
+    assert len(shard(TOP_100_PORTS, size)) == 8
+
+
+def test_small_scans_keep_a_minimum_shard_size():
+    assert shard_size(10, 8) == MIN_SHARD_SIZE
+
+
+def test_concurrent_saves_keep_each_others_entries(tmp_path):
+    path = str(tmp_path / 'port_scan.json')
+    first, second = PortCache(path=path), PortCache(path=path)
+    first.store('a.example', [22, 80], [{'port': 80, 'service': 'http'}], ['10.0.0.1'])
+    second.store('b.example', [443], [{'port': 443, 'service': 'https'}], ['10.0.0.2'])
+    second.store('a.example', [22], [{'port': 22, 'service': 'ssh'}], ['10.0.0.1'])
+    first.save()
+    second.save()
+
+    cache = PortCache(path=path)
+    assert cache.lookup('a.example', [22, 80], ['10.0.0.1']) == (
+        [{'port': 22, 'service': 'ssh', 'state': 'open'}, {'port': 80, 'service': 'http', 'state': 'open'}], []
+    )
+    assert cache.lookup('b.example', [443], ['10.0.0.2'])[0] == [{'port': 443, 'service': 'https', 'state': 'open'}]
+
+
+def test_a_host_that_moved_keeps_only_the_newer_scan(tmp_path):
+    path = str(tmp_path / 'port_scan.json')
+    old = PortCache(path=path)
+    old.store('a.example', [80], [{'port': 80, 'service': 'http'}], ['10.0.0.1'])
+    old.save()
+    new = PortCache(path=str(tmp_path / 'other.json'))
+    new.path = path
+    new.store('a.example', [22], [], ['10.0.0.9'])
+    new.save()
+    assert PortCache(path=path).lookup('a.example', [22, 80], ['10.0.0.9']) == ([], [80])
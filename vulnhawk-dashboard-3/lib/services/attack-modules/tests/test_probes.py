@@ -0,0 +1,74 @@
+from http_client import HttpResponse
+from probes import Check, CheckState, Probe, ProbeMatrix, _Batched, body_contains, reflects_payload
+
+
+def response(text: str) -> HttpResponse:
+    return HttpResponse(200, {}, text.encode(), 'http://h/', method='GET')
+
+
+def matrix(params, match) -> ProbeMatrix:
+    return ProbeMatrix('http://h/', params, ['y'], match, {'type': 'x', 'details': '{param}'}, batch=len(params))
+
+
+def follow_ups(probes):
+    return [(probe.url, probe.label) for probe in probes]
+
+
+def test_split_halves_a_batch_when_every_parameter_matches():
+    check = matrix(['a', 'b', 'c', 'd'], body_contains('sql'))
+    batch = check.probes()[0]
+    assert follow_ups(check.split(batch, response('sql error'))) == [
+        ('http://h/?a=vh0zy&b=vh1zy', _Batched(('a', 'b'), 'y')),
+        ('http://h/?c=vh2zy&d=vh3zy', _Batched(('c', 'd'), 'y'))
+    ]
+
+
+def test_split_narrows_a_batch_to_the_matching_parameters():
+    check = matrix(['a', 'b', 'c'], reflects_payload)
+    batch = check.probes()[0]
+    assert follow_ups(check.split(batch, response('vh1zy'))) == [('http://h/?b=y', 'y')]
+
+
+def test_split_sends_the_last_parameter_alone_once_the_others_are_found():
+    check = matrix(['c', 'd'], body_contains('sql'))
+    batch = check.probes()[0]
+    check.evaluate(check.probe('c', 'y'), response('sql error'))
+    assert follow_ups(check.split(batch, response('sql error'))) == [('http://h/?d=y', 'y')]
+
+
+def test_split_ignores_plain_probes():
+    check = matrix(['a', 'b'], body_contains('sql'))
+    assert check.split(check.probe('a', 'y'), response('sql error')) == []
+
+
+def group_state(stop: str) -> CheckState:
+    probes = [Probe('GET', f'http://h/{name}', group='g') for name in ('a', 'b', 'c')]
+    return CheckState(Check(probes, lambda probe, response: [], stop=stop))
+
+
+def test_an_earlier_hit_replaces_a_later_one_that_finished_first():
+    state = group_state('group')
+    probes = state.check.probes
+    state.record(2, probes[2], ['c'])
+    assert state.wanted(probes[0], 0) and not state.wanted(probes[2], 2)
+    state.record(0, probes[0], ['a'])
+    assert state.result() == ['a']
+    assert not state.wanted(probes[1], 1)
+
+
+def test_a_later_hit_is_dropped_once_an_earlier_one_stands():
+    state = group_state('check')
+    probes = state.check.probes
+    state.record(1, probes[1], ['b'])
+    state.record(2, probes[2], ['c'])
+    assert state.result() == ['b']
+
+
+def test_a_replaced_hit_is_retracted_after_it_was_reported():
+    reported, retracted = [], []
+    probes = [Probe('GET', f'http://h/{name}', group='g') for name in ('a', 'b')]
+    state = CheckState(Check(probes, lambda probe, response: [], stop='group'), on_finding=reported.append,
+                       on_retract=retracted.append)
+    state.record(1, probes[1], ['b'])
+    state.record(0, probes[0], ['a'])
+    assert reported == ['b', 'a'] and retracted == ['b']
@@ -0,0 +1,50 @@
+import time
+
+from rate_limiter import HostRateLimiter
+
+URL = 'http://example.test/'
+
+
+def test_healthy_responses_ramp_up_until_the_host_pushes_back():
+    limiter = HostRateLimiter(rate=10, increase=1)
+    for _ in range(5):
+        limiter.feedback(URL, 200, 0.01)
+    assert limiter.stats('example.test')['rate'] == 15
+    limiter.feedback(URL, 429, 0.01)
+    assert limiter.stats('example.test') == {'rate': 7.5, 'requests': 0, 'throttled': 1}
+    limiter.feedback(URL, 200, 0.01)
+    assert limiter.stats('example.test')['rate'] == round(7.5 + 1 / 7.5, 2)
+
+
+def test_a_burst_of_throttled_responses_backs_off_once():
+    limiter = HostRateLimiter(rate=10, min_rate=1)
+    for _ in range(5):
+        limiter.feedback(URL, 503, 0.01)
+    assert limiter.stats('example.test')['rate'] == 5
+    assert limiter.stats('example.test')['throttled'] == 1
+
+
+def test_retry_after_pauses_the_host():
+    limiter = HostRateLimiter(rate=100)
+    limiter.feedback(URL, 200, 0.01, retry_after='2')
+    granted, delay = limiter.reserve(URL)
+    assert granted
+    assert 1.5 < delay <= 2
+    assert limiter.reserve('http://other.test/') == (True, 0.0)
+
+
+def test_callers_queue_behind_a_full_bucket():
+    limiter = HostRateLimiter(rate=10, burst=2)
+    delays = [limiter.reserve(URL) for _ in range(5)]
+    assert [granted for granted, _ in delays] == [True, True, True, True, False]
+    assert delays[1][1] == 0
+    assert 0.09 < delays[3][1] <= 0.2
+    assert limiter.stats('example.test')['requests'] == 4
+
+
+def test_acquire_spaces_requests_at_the_rate():
+    limiter = HostRateLimiter(rate=50, burst=1)
+    start = time.monotonic()
+    for _ in range(6):
+        limiter.acquire(URL)
+    assert time.monotonic() - start >= 0.09
@@ -0,0 +1,38 @@
+from signatures import Signature, SignaturePack, literals
+
+
+def spans(pack: SignaturePack, text: str):
+    return [(hit.signature, hit.start, hit.end) for hit in pack.scan(text)]
+
+
+def test_a_literal_inside_a_longer_hit_is_reported():
+    assert spans(literals('mysql', 'sql'), 'a mysql error') == [('mysql', 2, 7), ('sql', 4, 7)]
+
+
+def test_literals_partially_overlapping_a_hit_are_reported():
+    pack = literals('stack trace', 'error', 'err')
+    assert spans(pack, 'stack tracerror') == [('stack trace', 0, 11), ('error', 10, 15), ('err', 10, 13)]
+    assert pack.found('stack trace, then an error') == {'stack trace', 'error', 'err'}
+
+
+def test_overlapping_hits_are_found_across_case_modes():
+    pack = literals('Warning: mysql', 'SQL syntax', ignore_case=True)
+    assert spans(pack, 'warning: MySQL syntax') == [('Warning: mysql', 0, 14), ('SQL syntax', 11, 21)]
+
+
+def test_a_regex_starting_inside_or_at_another_hit_is_reported():
+    pack = SignaturePack([
+        Signature('path', '/var/www'),
+        Signature('php', r'www/\w+\.php', regex=True),
+        Signature('unix', r'/var/\w+', regex=True)
+    ])
+    assert spans(pack, 'in /var/www/index.php') == [('path', 3, 11), ('unix', 3, 11), ('php', 8, 21)]
+
+
+def test_a_literal_starting_inside_a_regex_hit_is_reported():
+    pack = SignaturePack([Signature('version', r'PHP/\d+\.\d+', regex=True), Signature('old', '5.6')])
+    assert spans(pack, 'X-Powered-By: PHP/5.6') == [('version', 14, 21), ('old', 18, 21)]
+
+
+def test_a_signature_does_not_overlap_itself():
+    assert spans(literals('aa'), 'aaaa') == [('aa', 0, 2), ('aa', 2, 4)]
@@ -0,0 +1,30 @@
+from http_client import HttpResponse
+from soft404 import Baseline, fingerprint
+
+CATCH_ALL = b'<html><body><div id="app"></div></body></html>'
+
+
+def baseline() -> Baseline:
+    url = 'http://h/3f2a9c'
+    return Baseline([fingerprint(url, HttpResponse(200, {'Content-Type': 'text/html'}, CATCH_ALL, url, method='GET'))])
+
+
+def head(url: str, **headers) -> HttpResponse:
+    return HttpResponse(200, {'Content-Type': 'text/html', **headers}, b'', url, method='HEAD')
+
+
+def test_a_head_answer_with_the_catch_all_length_matches():
+    assert baseline().matches('http://h/admin', head('http://h/admin', **{'Content-Length': str(len(CATCH_ALL))}))
+
+
+def test_a_head_answer_of_another_length_does_not_match():
+    assert not baseline().matches('http://h/admin', head('http://h/admin', **{'Content-Length': '5120'}))
+
+
+def test_a_head_answer_without_content_length_does_not_match():
+    assert not baseline().matches('http://h/admin', head('http://h/admin'))
+
+
+def test_a_full_body_matches_by_hash():
+    url = 'http://h/backup.zip'
+    assert baseline().matches(url, HttpResponse(200, {'Content-Type': 'text/html'}, CATCH_ALL, url, method='GET'))
@@ -0,0 +1,188 @@
+import abc
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, NamedTuple, Optional
+
+logger = logging.getLogger('work_queue')
+
+DEFAULT_LEASE = 60.0
+DEFAULT_MAX_ATTEMPTS = 3
+
+QUEUED, LEASED, DONE, FAILED = 'queued', 'leased', 'done', 'failed'
+
+
+class Shard(NamedTuple):
+    id: int
+    scan: str
+    seq: int
+    payload: Dict[str, Any]
+    attempts: int
+
+
+class WorkQueue(abc.ABC):
+    """Shards of scans, leased to workers until they report back.
+
+    A worker ``lease``s a shard for ``lease`` seconds and keeps it with
+    ``heartbeat`` while it works. A shard whose lease runs out (its worker
+    died or hung) goes back to the queue for another worker, up to
+    ``max_attempts`` leases, after which it fails. ``complete`` and
+    ``fail`` only count while the caller still holds the lease, so a
+    worker that lost its shard cannot overwrite the new holder's result.
+
+    Subclass it to put the queue on a shared service; ``SqliteQueue`` is
+    the local backend.
+    """
+
+    @abc.abstractmethod
+    def put(self, scan: str, payloads: List[Dict[str, Any]]):
+        ...
+
+    @abc.abstractmethod
+    def lease(self, worker: str) -> Optional[Shard]:
+        ...
+
+    @abc.abstractmethod
+    def heartbeat(self, shard: Shard, worker: str) -> bool:
+        """Extend a lease; False if the worker no longer holds it"""
+
+    @abc.abstractmethod
+    def complete(self, shard: Shard, worker: str, result: Any) -> bool:
+        ...
+
+    @abc.abstractmethod
+    def fail(self, shard: Shard, worker: str, error: str) -> bool:
+        """Give a shard back after an error; it is retried until its attempts run out"""
+
+    @abc.abstractmethod
+    def progress(self, scan: str) -> Dict[str, int]:
+        """Shard counts of a scan per state"""
+
+    @abc.abstractmethod
+    def results(self, scan: str) -> List[Dict[str, Any]]:
+        """Every shard of a scan in order, with its state, result and error"""
+
+    def close(self):
+        pass
+
+
+class SqliteQueue(WorkQueue):
+    """``WorkQueue`` in one SQLite file.
+
+    Workers on the same host (or on hosts sharing a file system with
+    working POSIX locks) open the same file. Each lease is one ``BEGIN
+    IMMEDIATE`` transaction, so two workers never get the same shard.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS shards (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            scan TEXT NOT NULL,
+            seq INTEGER NOT NULL,
+            payload TEXT NOT NULL,
+            state TEXT NOT NULL DEFAULT 'queued',
+            worker TEXT,
+            lease_until REAL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            result TEXT,
+            error TEXT
+        );
+        CREATE INDEX IF NOT EXISTS shards_state ON shards (state, id);
+        CREATE INDEX IF NOT EXISTS shards_scan ON shards (scan, seq);
+    """
+
+    def __init__(self, path: str, lease: float = DEFAULT_LEASE, max_attempts: int = DEFAULT_MAX_ATTEMPTS):
+        self.path = path
+        self.lease_seconds = lease
+        self.max_attempts = max_attempts
+        self._local = threading.local()
+        with self._connection() as db:
+            db.executescript(self.SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            # Autocommit; writes take explicit BEGIN IMMEDIATE transactions
+            db = self._local.db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.execute('PRAGMA journal_mode=WAL')
+        return db
+
+    def _transaction(self, fn, *args):
+        db = self._connection()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            result = fn(db, *args)
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        db.execute('COMMIT')
+        return result
+
+    def put(self, scan: str, payloads: List[Dict[str, Any]]):
+        rows = [(scan, seq, json.dumps(payload)) for seq, payload in enumerate(payloads)]
+        self._transaction(lambda db: db.executemany('INSERT INTO shards (scan, seq, payload) VALUES (?, ?, ?)', rows))
+
+    def lease(self, worker: str) -> Optional[Shard]:
+        return self._transaction(self._lease, worker)
+
+    def _lease(self, db: sqlite3.Connection, worker: str) -> Optional[Shard]:
+        now = time.time()
+        # Leases of workers that stopped heartbeating go back to the queue
+        db.execute("UPDATE shards SET state = ?, error = 'lease expired' WHERE state = ? AND attempts >= ? "
+                   "AND lease_until < ?", (FAILED, LEASED, self.max_attempts, now))
+        db.execute('UPDATE shards SET state = ?, worker = NULL WHERE state = ? AND lease_until < ?',
+                   (QUEUED, LEASED, now))
+        row = db.execute('SELECT id, scan, seq, payload, attempts FROM shards WHERE state = ? ORDER BY id LIMIT 1',
+                         (QUEUED,)).fetchone()
+        if row is None:
+            return None
+        db.execute('UPDATE shards SET state = ?, worker = ?, lease_until = ?, attempts = attempts + 1 WHERE id = ?',
+                   (LEASED, worker, now + self.lease_seconds, row[0]))
+        return Shard(row[0], row[1], row[2], json.loads(row[3]), row[4] + 1)
+
+    def _held(self, db: sqlite3.Connection, shard: Shard, worker: str, sql: str, *params) -> bool:
+        cursor = db.execute(f'{sql} WHERE id = ? AND state = ? AND worker = ?', (*params, shard.id, LEASED, worker))
+        return cursor.rowcount == 1
+
+    def heartbeat(self, shard: Shard, worker: str) -> bool:
+        return self._transaction(self._held, shard, worker, 'UPDATE shards SET lease_until = ?',
+                                 time.time() + self.lease_seconds)
+
+    def complete(self, shard: Shard, worker: str, result: Any) -> bool:
+        return self._transaction(self._held, shard, worker, 'UPDATE shards SET state = ?, result = ?, error = NULL',
+                                 DONE, json.dumps(result, default=str))
+
+    def fail(self, shard: Shard, worker: str, error: str) -> bool:
+        state = FAILED if shard.attempts >= self.max_attempts else QUEUED
+        return self._transaction(self._held, shard, worker, 'UPDATE shards SET state = ?, error = ?', state, error)
+
+    def progress(self, scan: str) -> Dict[str, int]:
+        rows = self._connection().execute('SELECT state, COUNT(*) FROM shards WHERE scan = ? GROUP BY state', (scan,))
+        return dict(rows.fetchall())
+
+    def results(self, scan: str) -> List[Dict[str, Any]]:
+        rows = self._connection().execute(
+            'SELECT payload, state, result, error FROM shards WHERE scan = ? ORDER BY seq', (scan,)
+        )
+        return [
+            {'payload': json.loads(payload), 'state': state,
+             'result': json.loads(result) if result is not None else None, 'error': error}
+            for payload, state, result, error in rows.fetchall()
+        ]
+
+    def close(self):
+        db = getattr(self._local, 'db', None)
+        if db is not None:
+            db.close()
+            self._local.db = None
+
+
+def open_queue(spec: str, **kwargs) -> WorkQueue:
+    """Queue backend for ``spec``: a ``sqlite:///path`` URL or a plain file path"""
+    if spec.startswith('sqlite://'):
+        return SqliteQueue(spec[len('sqlite://'):], **kwargs)
+    if '://' in spec:
+        raise ValueError(f'Unsupported queue backend: {spec}')
+    return SqliteQueue(spec, **kwargs)
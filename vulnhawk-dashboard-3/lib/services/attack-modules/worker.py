@@ -0,0 +1,260 @@
+"""Long-lived scan worker taking JSON-lines jobs and replying with NDJSON events.
+
+    python worker.py                      # jobs on stdin, events on stdout
+    python worker.py --socket /tmp/vh.sock
+
+    {"id": "42", "target": "https://example.com", "modules": ["recon", "auth"]}
+    {"id": "43", "op": "ping"}
+    {"id": "44", "op": "metrics"}
+    {"op": "shutdown"}
+"""
+import argparse
+import asyncio
+import concurrent.futures
+import json
+import logging
+import os
+import socketserver
+import sys
+import threading
+import traceback
+from typing import Any, Dict, Optional, TextIO
+
+from attack_runner import (AttackRunner, ENGINES, add_crawl_options, add_diagnostic_options, add_engine_options,
+                           add_module_options, build_client, crawl_options, history_options, journal_dir,
+                           module_options, setup_logging)
+from events import EventSink, NdjsonWriter
+from http_client import HttpClient
+from metrics import ScanMetrics, serve_metrics
+from profiling import profiled
+from scheduler import ThreadScheduler, DEFAULT_WORKERS
+
+logger = logging.getLogger('worker')
+
+DEFAULT_MAX_JOBS = 4
+
+
+class ScanWorker:
+    """Runs scan jobs concurrently on one shared client and engine"""
+
+    def __init__(self, client: HttpClient, engine: str = 'thread', concurrency: Optional[int] = None,
+                 parallel: bool = False, max_jobs: int = DEFAULT_MAX_JOBS,
+                 module_options: Optional[Dict[str, Dict[str, Any]]] = None,
+                 deadline: Optional[float] = None, module_timeout: Optional[float] = None,
+                 metrics: Optional[ScanMetrics] = None, journal_dir: Optional[str] = None,
+                 resume: bool = False, crawl: Optional[Dict[str, Any]] = None, soft404: bool = True,
+                 history: Optional[Dict[str, Any]] = None):
+        if engine not in ENGINES:
+            raise ValueError(f'Unknown engine: {engine}')
+        self.client = client
+        self.engine = engine
+        self.concurrency = concurrency
+        self.parallel = parallel
+        self.module_options = module_options
+        self.deadline = deadline
+        self.module_timeout = module_timeout
+        # Totals over every job this worker has run
+        self.metrics = metrics or ScanMetrics()
+        self.journal_dir = journal_dir
+        self.resume = resume
+        self.crawl = crawl
+        self.soft404 = soft404
+        self.history = history
+        self._jobs = concurrent.futures.ThreadPoolExecutor(max_workers=max_jobs, thread_name_prefix='job')
+        self._scheduler = None
+        self._loop = None
+        self._loop_thread = None
+        self._async_engine = None
+        self.stopped = threading.Event()
+
+    def start(self):
+        if self.engine == 'asyncio':
+            from async_engine import AsyncEngine, DEFAULT_CONCURRENCY
+            self._loop = asyncio.new_event_loop()
+            self._loop_thread = threading.Thread(target=self._loop.run_forever, name='worker-loop', daemon=True)
+            self._loop_thread.start()
+            self._async_engine = AsyncEngine(self.client, concurrency=self.concurrency or DEFAULT_CONCURRENCY)
+            asyncio.run_coroutine_threadsafe(self._async_engine.__aenter__(), self._loop).result()
+        else:
+            self._scheduler = ThreadScheduler(self.client, workers=self.concurrency or DEFAULT_WORKERS)
+        return self
+
+    def close(self):
+        self._jobs.shutdown(wait=True)
+        if self._async_engine is not None:
+            asyncio.run_coroutine_threadsafe(self._async_engine.__aexit__(None, None, None), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop_thread.join()
+        if self._scheduler is not None:
+            self._scheduler.close()
+
+    def handle(self, line: str, events: EventSink):
+        """Dispatch one request line; scan jobs run in the background"""
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            events.emit('error', error=f'Invalid request: {e}')
+            return
+        if not isinstance(request, dict):
+            events.emit('error', error='Invalid request: expected a JSON object')
+            return
+
+        op = request.get('op', 'scan')
+        job_events = events.bind(job=request.get('id'))
+        if op == 'ping':
+            job_events.emit('pong')
+        elif op == 'metrics':
+            job_events.emit('metrics', text=self.metrics.prometheus())
+        elif op == 'shutdown':
+            job_events.emit('shutting_down')
+            self.stopped.set()
+        elif op == 'scan':
+            target, modules = request.get('target'), request.get('modules')
+            if not target or not isinstance(modules, list) or not modules:
+                job_events.emit('job_finished', error='A target and a list of modules are required')
+                return
+            job_events.emit('job_accepted')
+            self._jobs.submit(self._run_job, request, job_events)
+        else:
+            job_events.emit('error', error=f'Unknown op: {op}')
+
+    def _run_job(self, request: Dict[str, Any], events: EventSink):
+        """Run one scan; "parallel", "deadline", "module_timeout", "resume" and "crawl" override the defaults"""
+        try:
+            runner = AttackRunner(
+                request['target'],
+                request['modules'],
+                client=self.client,
+                engine=self.engine,
+                concurrency=self.concurrency,
+                parallel=request.get('parallel', self.parallel),
+                scheduler=self._scheduler,
+                events=events,
+                module_options=self.module_options,
+                deadline=request.get('deadline', self.deadline),
+                module_timeout=request.get('module_timeout', self.module_timeout),
+                metrics=self.metrics,
+                journal_dir=self.journal_dir,
+                resume=request.get('resume', self.resume),
+                crawl=self._crawl(request),
+                soft404=self.soft404,
+                history=self.history
+            )
+            if self._async_engine is not None:
+                results = asyncio.run_coroutine_threadsafe(runner.run_on(self._async_engine), self._loop).result()
+            else:
+                results = runner.run()
+            events.emit('job_finished', results=results, error=results.get('error'))
+        except Exception as e:
+            logger.error(f"Job {request.get('id')} failed: {e}")
+            logger.error(traceback.format_exc())
+            events.emit('job_finished', error=str(e))
+
+    def _crawl(self, request: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Crawler options of a job: its own "crawl" setting over the worker's"""
+        crawl = request.get('crawl', self.crawl is not None)
+        if isinstance(crawl, dict):
+            return {**(self.crawl or {}), **crawl}
+        return {**(self.crawl or {})} if crawl else None
+
+    def serve_stream(self, inp: TextIO = sys.stdin, out: TextIO = sys.stdout):
+        """Serve requests from a line stream until EOF or shutdown"""
+        events = NdjsonWriter(out)
+        for line in inp:
+            if line.strip():
+                self.handle(line, events)
+            if self.stopped.is_set():
+                break
+
+    def serve_socket(self, path: str):
+        """Serve requests from any number of Unix socket connections"""
+        worker = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                events = NdjsonWriter(_SocketWriter(self.wfile))
+                for raw in self.rfile:
+                    line = raw.decode('utf-8', errors='replace')
+                    if line.strip():
+                        worker.handle(line, events)
+                    if worker.stopped.is_set():
+                        break
+
+        if os.path.exists(path):
+            os.unlink(path)
+        server = socketserver.ThreadingUnixStreamServer(path, Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name='worker-socket', daemon=True).start()
+        logger.info(f"Listening on {path}")
+        try:
+            self.stopped.wait()
+        finally:
+            server.shutdown()
+            server.server_close()
+            os.unlink(path)
+
+
+class _SocketWriter:
+    """Text adapter over a socket's binary write file; writes after disconnect are dropped"""
+
+    def __init__(self, wfile):
+        self.wfile = wfile
+
+    def write(self, text: str):
+        try:
+            self.wfile.write(text.encode('utf-8'))
+        except OSError:
+            pass
+
+    def flush(self):
+        try:
+            self.wfile.flush()
+        except OSError:
+            pass
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='worker.py', description='Long-lived scan worker (JSON lines)')
+    parser.add_argument('--socket', metavar='PATH',
+                        help='listen on a Unix socket instead of stdin/stdout')
+    parser.add_argument('--max-jobs', type=int, default=DEFAULT_MAX_JOBS,
+                        help='scan jobs run at the same time')
+    parser.add_argument('--metrics-port', type=int, metavar='PORT',
+                        help='serve Prometheus metrics on http://127.0.0.1:PORT/metrics')
+    add_engine_options(parser)
+    add_module_options(parser)
+    add_crawl_options(parser)
+    add_diagnostic_options(parser)
+    args = parser.parse_args()
+    if args.log_level:
+        setup_logging(args.log_level)
+
+    with profiled(args.profile, args.profile_mode, args.profile_top), build_client(args) as client:
+        worker = ScanWorker(
+            client,
+            engine=args.engine,
+            concurrency=args.concurrency,
+            parallel=args.parallel,
+            max_jobs=args.max_jobs,
+            module_options=module_options(args),
+            deadline=args.deadline,
+            module_timeout=args.module_timeout,
+            journal_dir=journal_dir(args),
+            resume=args.resume,
+            crawl=crawl_options(args),
+            soft404=not args.no_soft404,
+            history=history_options(args)
+        ).start()
+        if args.metrics_port is not None:
+            serve_metrics(worker.metrics, args.metrics_port)
+        try:
+            if args.socket:
+                worker.serve_socket(args.socket)
+            else:
+                worker.serve_stream()
+        finally:
+            worker.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -16,6 +16,61 @@ interface ScanResults {
   [moduleName: string]: ModuleResults;
 }
 
+// One line of attack_runner.py --output ndjson
+interface ScanEvent {
+  event: 'module_started' | 'finding' | 'finding_retracted' | 'module_finished' | 'stats';
+  module?: string;
+  check?: string;
+  checks?: string[];
+  finding?: ModuleResults[string][number];
+  error?: string;
+  findings?: number;
+  [key: string]: unknown;
+}
+
+interface ScanProgress {
+  reportId: string;
+  status: 'running' | 'completed' | 'error';
+  currentModule: string;
+  completedModules: number;
+  totalModules: number;
+  findings: number;
+}
+
+// Live progress of scans started by this server process, keyed by report id
+const scanProgress = new Map<string, ScanProgress>()
+
+function applyScanEvent(results: ScanResults, progress: ScanProgress, event: ScanEvent) {
+  switch (event.event) {
+    case 'module_started':
+      results[event.module!] = Object.fromEntries((event.checks || []).map((check) => [check, []]))
+      progress.currentModule = event.module!
+      break
+    case 'finding':
+      results[event.module!] ??= {}
+      results[event.module!][event.check!] ??= []
+      results[event.module!][event.check!].push(event.finding!)
+      progress.findings += 1
+      break
+    case 'finding_retracted': {
+      // A finding an earlier probe's replaced, streamed before the check settled
+      const findings = results[event.module!]?.[event.check!] || []
+      const index = findings.findIndex((finding) => JSON.stringify(finding) === JSON.stringify(event.finding))
+      if (index !== -1) {
+        findings.splice(index, 1)
+        progress.findings -= 1
+      }
+      break
+    }
+    case 'module_finished':
+      if (event.error) {
+        (results as Record<string, unknown>)[event.module!] = { error: event.error }
+      }
+      progress.completedModules += 1
+      break
+  }
+}
+
 export async function startAttack(target: string, modules: string[]) {
   try {
     console.log('Starting attack with params:', { target, modules })
@@ -45,7 +100,7 @@ export async function startAttack(target: string, modules: string[]) {
     console.log('Found Python script at:', pythonScript)
 
     // Start Python script with detailed error handling
-    const pythonProcess = spawn('python3', [pythonScript, target, ...modules], {
+    const pythonProcess = spawn('python3', [pythonScript, '--output', 'ndjson', target, ...modules], {
       cwd: workspaceRoot,
       env: { 
         ...process.env, 
@@ -54,13 +109,36 @@ export async function startAttack(target: string, modules: string[]) {
       }
     })
 
-    let output = ''
+    // Findings arrive one JSON line at a time, so only the partial last line is buffered
+    let pending = ''
+    let unparsed = ''
     let error = ''
+    const results: ScanResults = {}
+    const progress: ScanProgress = {
+      reportId: report.id,
+      status: 'running',
+      currentModule: '',
+      completedModules: 0,
+      totalModules: modules.length,
+      findings: 0
+    }
+    scanProgress.set(report.id, progress)
+
+    const handleLine = (line: string) => {
+      if (!line.trim()) return
+      try {
+        applyScanEvent(results, progress, JSON.parse(line))
+      } catch {
+        unparsed += line + '\n'
+        console.log('Python stdout:', line)
+      }
+    }
 
     pythonProcess.stdout.on('data', (data) => {
-      const str = data.toString()
-      output += str
-      console.log('Python stdout:', str)
+      pending += data.toString()
+      const lines = pending.split('\n')
+      pending = lines.pop() ?? ''
+      lines.forEach(handleLine)
     })
 
     pythonProcess.stderr.on('data', (data) => {
@@ -76,24 +154,16 @@ export async function startAttack(target: string, modules: string[]) {
       })
 
       pythonProcess.on('close', async (code) => {
+        handleLine(pending)
         console.log('Python process closed with code:', code)
-        console.log('Final output:', output)
-        console.log('Final error:', error)
+        // Keep finished scans around long enough for clients polling progress
+        setTimeout(() => scanProgress.delete(report.id), 5 * 60 * 1000)
 
         try {
           if (code !== 0) {
             throw new Error(`Python script exited with code ${code}: ${error}`)
           }
-
-          // Find the JSON output in the logs
-          const jsonMatch = output.match(/\{.*\}/s)
-          if (!jsonMatch) {
-            throw new Error('No JSON output found in Python script output')
-          }
-
-          // Parse the output
-          const results = JSON.parse(jsonMatch[0])
-          console.log('Parsed results:', results)
+          console.log('Scan results:', results)
 
           // Process findings and update report
           const findings = results.recon?.info_disclosure || []
@@ -148,9 +218,12 @@ export async function startAttack(target: string, modules: string[]) {
             // Continue even if AI processing fails
           }
 
+          progress.status = 'completed'
+          progress.currentModule = 'Completed'
           resolve(report)
         } catch (err) {
           console.error('Error processing attack results:', err)
+          progress.status = 'error'
           
           // Update report with error status
           await prisma.report.update({
@@ -159,7 +232,7 @@ export async function startAttack(target: string, modules: string[]) {
               status: 'error',
               rawOutput: { 
                 error: err instanceof Error ? err.message : 'Unknown error',
-                pythonOutput: output,
+                pythonOutput: unparsed,
                 pythonError: error
               }
             }
@@ -202,7 +275,36 @@ function determineSeverity(module: string, finding: { type: string; description:
   return severityMap[module]?.[finding.type] || 'low'
 }
 
+function progressPercent(progress: ScanProgress) {
+  if (progress.status === 'completed') return 100
+  if (!progress.totalModules) return 0
+  return Math.min(Math.round((progress.completedModules / progress.totalModules) * 100), 99)
+}
+
+function formatProgress(progress: ScanProgress) {
+  return {
+    status: progress.status,
+    progress: progressPercent(progress),
+    currentModule: progress.currentModule || 'Starting',
+    completedModules: progress.completedModules,
+    totalModules: progress.totalModules,
+    vulnerabilitiesFound: progress.findings,
+    reportId: progress.reportId,
+  }
+}
+
+// Progress of the most recently started scan that this process is tracking
+export function getLatestAttackProgress() {
+  const latest = Array.from(scanProgress.values()).pop()
+  return latest ? formatProgress(latest) : null
+}
+
 export async function getAttackProgress(reportId: string) {
+  const live = scanProgress.get(reportId)
+  if (live) {
+    return formatProgress(live)
+  }
+
   const report = await prisma.report.findUnique({
     where: { id: reportId },
     include: { vulnerabilitiesList: true },